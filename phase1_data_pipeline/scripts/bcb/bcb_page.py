@@ -0,0 +1,236 @@
+# bcb_page.py
+#
+# Single download of the BCB "ultimo.php" page per run, cached on disk
+# with its ETag / Last-Modified validators so that an unchanged page only
+# costs a 304, and a targeted parser that reads the publication date and
+# the official rate table from one lxml parse.
+
+import json
+import os
+import re
+
+import lxml.html
+import numpy as np
+import pandas as pd
+
+from common.atomic_write import write_json, write_text
+from common.http_client import get_client
+from common.raw_archive import archive_response
+from .paths_bcb import BCB_STATE_DIR
+
+
+# Overridable, e.g. to point at common/standin_server.py
+BCB_RATES_URL = os.environ.get(
+    "BCB_RATES_URL", "https://www.bcb.gob.bo/librerias/indicadores/otras/ultimo.php"
+)
+BCB_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Language": "es-ES,es;q=0.9",
+    "Referer": "https://www.bcb.gob.bo/",
+}
+
+PAGE_CACHE_HTML = os.path.join(BCB_STATE_DIR, "ultimo_page.html")
+PAGE_CACHE_META = os.path.join(BCB_STATE_DIR, "ultimo_page.json")
+
+RATE_COLUMNS = ["pais", "unidad_monetaria", "currency", "tipo_cambio_bs", "tipo_cambio_me"]
+RATE_TABLE_INDEX = 1  # second non-empty <table>, as pd.read_html(...)[1]
+
+MONTHS = {
+    "enero": "01", "febrero": "02", "marzo": "03", "abril": "04",
+    "mayo": "05", "junio": "06", "julio": "07", "agosto": "08",
+    "septiembre": "09", "setiembre": "09", "octubre": "10",
+    "noviembre": "11", "diciembre": "12"
+}
+
+DATE_RE = re.compile(r"(\d{1,2}) de ([A-Za-zÁÉÍÓÚáéíóú]+) (\d{4})")
+
+# Same cell text normalization as pandas.read_html
+_WHITESPACE_RE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+class BcbPage:
+    """
+    One download of the BCB page. `date` ('YYYY-MM-DD' or None) and
+    `rates` (raw table with RATE_COLUMNS) are parsed together, once, on
+    first access. `not_modified` is True when the server answered 304 and
+    the cached copy was used.
+    """
+
+    def __init__(self, html, not_modified=False):
+        self.html = html
+        self.not_modified = not_modified
+        self._parsed = None
+
+    def _parse(self):
+        if self._parsed is None:
+            self._parsed = parse_bcb_page(self.html)
+        return self._parsed
+
+    @property
+    def date(self):
+        return self._parse()[0]
+
+    @property
+    def rates(self):
+        return self._parse()[1].copy()
+
+
+_last_page = None
+
+
+def fetch_bcb_page():
+    """
+    Downloads the BCB page with a conditional GET against the on-disk
+    cache and returns a BcbPage. Call it once per run; later readers of
+    the same run use last_bcb_page(). A 304 without a cached copy to
+    reuse is answered by an unconditional GET. A downloaded (non-304) page
+    is also appended to the raw archive segment of the run, if one is open.
+    """
+    global _last_page
+    _last_page = None
+
+    cached_html, meta = _load_cache()
+
+    headers = dict(BCB_HEADERS)
+    if cached_html is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    # An error page is returned, not raised, as requests.get() did before
+    # the pooled client: it is never cached, and parsing it fails as it
+    # would for any page without the rate table.
+    response = get_client().get(BCB_RATES_URL, headers=headers, raise_for_status=False)
+
+    if response.status_code == 304 and cached_html is not None:
+        page = BcbPage(cached_html, not_modified=True)
+    else:
+        if response.status_code == 304:
+            response = get_client().get(BCB_RATES_URL, headers=BCB_HEADERS,
+                                        raise_for_status=False)
+        page = BcbPage(response.text)
+        archive_response("bcb", url=BCB_RATES_URL, status=response.status_code, body=page.html)
+        if response.ok:
+            _save_cache(page.html, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            })
+
+    _last_page = page
+    return page
+
+
+def last_bcb_page():
+    """
+    The page fetched by the last fetch_bcb_page() call: None before it,
+    after reset_bcb_page() or when that call failed.
+    """
+    return _last_page
+
+
+def reset_bcb_page():
+    """Forgets the last page, so that a new run never reports a previous one."""
+    global _last_page
+    _last_page = None
+
+
+def _load_cache():
+    if not (os.path.exists(PAGE_CACHE_HTML) and os.path.exists(PAGE_CACHE_META)):
+        return None, {}
+    try:
+        with open(PAGE_CACHE_META, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(PAGE_CACHE_HTML, "r", encoding="utf-8") as f:
+            return f.read(), meta
+    except (OSError, ValueError):
+        return None, {}
+
+
+def _save_cache(html, meta):
+    write_text(html, PAGE_CACHE_HTML)
+    write_json(meta, PAGE_CACHE_META)
+
+
+def parse_bcb_date(text):
+    """Official date displayed by the BCB ('7 de diciembre 2025') as 'YYYY-MM-DD'."""
+    match = DATE_RE.search(text)
+    if not match:
+        return None
+
+    day, month_text, year = match.groups()
+    month_num = MONTHS.get(month_text.lower())
+    if month_num is None:
+        return None
+
+    return f"{year}-{month_num}-{day.zfill(2)}"
+
+
+def parse_bcb_page(html):
+    """
+    Returns (date, rates). The document is parsed once; tables are walked
+    in document order and only the rate table is turned into rows, with
+    the same cell text, colspan/rowspan handling and empty-cell NaN as
+    pd.read_html(...)[1]. Cells are kept as text (clean_bcb_table does the
+    numeric conversion).
+    """
+    date = parse_bcb_date(html)
+
+    doc = lxml.html.fromstring(html)
+    found = -1
+    for table in doc.iter("table"):
+        if not table.text_content().strip():
+            continue
+        found += 1
+        if found == RATE_TABLE_INDEX:
+            return date, _table_to_df(table)
+
+    raise ValueError("BCB page: official rate table not found")
+
+
+def _cell_text(cell):
+    return _WHITESPACE_RE.sub(" ", cell.text_content().strip())
+
+
+def _table_to_df(table):
+    rows = []
+    spans = {}  # column -> (remaining rows, text) of pending rowspans
+
+    for tr in table.xpath(".//tr"):
+        cells = tr.xpath("./td|./th")
+        # Leading rows made only of <th> are the header: the columns are
+        # renamed to RATE_COLUMNS anyway
+        if not rows and cells and all(c.tag == "th" for c in cells):
+            continue
+
+        row = []
+        col = 0
+        queue = list(cells)
+        while queue or col in spans:
+            if col in spans:
+                remaining, text = spans[col]
+                row.append(text)
+                if remaining <= 1:
+                    del spans[col]
+                else:
+                    spans[col] = (remaining - 1, text)
+                col += 1
+                continue
+
+            cell = queue.pop(0)
+            text = _cell_text(cell)
+            colspan = int(cell.get("colspan", 1) or 1)
+            rowspan = int(cell.get("rowspan", 1) or 1)
+            for _ in range(colspan):
+                if rowspan > 1:
+                    spans[col] = (rowspan - 1, text)
+                row.append(text)
+                col += 1
+
+        if row:
+            rows.append(row)
+
+    width = max((len(r) for r in rows), default=0)
+    df = pd.DataFrame([r + [""] * (width - len(r)) for r in rows])
+    df.columns = RATE_COLUMNS
+    return df.replace("", np.nan)
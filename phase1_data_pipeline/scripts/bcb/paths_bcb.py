@@ -5,12 +5,20 @@ BCB_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPTS_DIR = os.path.dirname(BCB_DIR)
 PHASE1_DIR = os.path.dirname(SCRIPTS_DIR)
 
-DATA_DIR = os.path.join(PHASE1_DIR, "data")
+# PHASE1_DATA_DIR redirects all reads and writes (benchmarks, tests)
+DATA_DIR = os.environ.get("PHASE1_DATA_DIR", os.path.join(PHASE1_DIR, "data"))
 
 # Raw and processed folders for BCB
 DATA_RAW_BCB = os.path.join(DATA_DIR, "raw", "bcb")
 DATA_PROCESSED_BCB = os.path.join(DATA_DIR, "processed", "bcb")
 
+# Compressed archive of the downloaded pages (see common/raw_archive.py)
+RAW_ARCHIVE_BCB = os.path.join(DATA_DIR, "raw", "archive", "bcb")
+
+# Local state kept between runs but never committed with the data
+# (the page cache of bcb_page.py)
+BCB_STATE_DIR = os.path.join(DATA_DIR, "state", "bcb")
+
 # Metadata folder inside processed/bcb
 DATA_PROCESSED_BCB_METADATA = os.path.join(DATA_PROCESSED_BCB, "metadata")
 
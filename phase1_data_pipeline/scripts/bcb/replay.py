@@ -0,0 +1,56 @@
+# replay.py
+#
+# Offline replay of the raw BCB archive (see common/raw_archive.py): each
+# archived page is parsed and cleaned again and the BCB master is updated
+# once at the end, without any network access.
+
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from common.atomic_write import write_parquet
+from common.raw_archive import list_segments, read_segment
+from .bcb_page import BcbPage
+from .update_bcb import MASTER_PATH, build_bcb_rates
+from .paths_bcb import RAW_ARCHIVE_BCB
+
+
+def replay_bcb(rebuild=False, archive_dir=RAW_ARCHIVE_BCB):
+    """
+    Replays every archived BCB page. The last page of each date wins, as
+    in live runs. Dates found in the archive replace the same dates of the
+    master; with rebuild=True the current master is moved aside (renamed,
+    never deleted) and rebuilt from the archive alone.
+    Returns {"pages", "dates", "seconds"}.
+    """
+    start = time.time()
+    by_date = {}
+    pages = 0
+
+    for path in list_segments(archive_dir):
+        _, records = read_segment(path)
+        for record in records:
+            if record.get("status") != 200 or not record.get("body"):
+                continue
+            page = BcbPage(record["body"])
+            date_value = page.date or record["ts"][:10]
+            by_date[date_value] = build_bcb_rates(page.rates, date_value)
+            pages += 1
+
+    if rebuild and os.path.exists(MASTER_PATH):
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        os.replace(MASTER_PATH, f"{MASTER_PATH}.before-replay-{stamp}")
+
+    if by_date:
+        replayed = pd.concat(by_date.values(), ignore_index=True)
+        if os.path.exists(MASTER_PATH):
+            master = pd.read_parquet(MASTER_PATH)
+            master = master[~master["date"].isin(list(by_date))]
+            replayed = pd.concat([master, replayed], ignore_index=True)
+        write_parquet(replayed.sort_values("date", kind="stable"), MASTER_PATH, index=False)
+
+    summary = {"pages": pages, "dates": len(by_date), "seconds": round(time.time() - start, 2)}
+    print(f"[BCB] replayed {pages} page(s), {len(by_date)} date(s) in {summary['seconds']}s")
+    return summary
@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 import pandas as pd
 
+from common import metrics
+from common.atomic_write import write_parquet
 from .paths_bcb import DATA_RAW_BCB, DATA_PROCESSED_BCB
 
 
@@ -23,10 +25,12 @@ def save_bcb_raw(df_raw, table_date):
     filename = f"run_{run_ts}_TABLE-{table_date_str}_bcb.parquet"
     path = os.path.join(DATA_RAW_BCB, filename)
 
-    df_raw.to_parquet(path, index=False)
+    write_parquet(df_raw, path, index=False)
+    metrics.inc("rows_written_total", len(df_raw), source="bcb", dataset="raw")
+    metrics.inc("bytes_written_total", os.path.getsize(path), source="bcb", dataset="raw")
 
 
 def save_bcb_processed(df_clean):
     os.makedirs(DATA_PROCESSED_BCB, exist_ok=True)
     path = os.path.join(DATA_PROCESSED_BCB, "bcb_today.parquet")
-    df_clean.to_parquet(path, index=False)
\ No newline at end of file
+    write_parquet(df_clean, path, index=False)
\ No newline at end of file
@@ -1,51 +1,80 @@
 import os
 import json
+from datetime import datetime
+
 import pandas as pd
 
-from .scrape_bcb import scrape_bcb_official_rates, get_bcb_date
+from common import metrics
+from common.atomic_write import write_json, write_parquet
+from common.raw_archive import archive_run
+from .bcb_page import fetch_bcb_page, reset_bcb_page
 from .clean_bcb import clean_bcb_table
 from .extract_bcb import extract_official_rates
 from .save_bcb import save_bcb_raw, save_bcb_processed
-from .paths_bcb import DATA_PROCESSED_BCB, METADATA_BCB
+from .paths_bcb import DATA_PROCESSED_BCB, METADATA_BCB, RAW_ARCHIVE_BCB
 
 
 MASTER_PATH = os.path.join(DATA_PROCESSED_BCB, "bcb_master.parquet")
 
 
 def update_bcb():
-
-    extracted_date = get_bcb_date()
+    # One download per run: date and table come from the same page, and
+    # an unchanged page is revalidated with a 304 instead of re-sent. A
+    # downloaded page is archived verbatim (see replay.py).
+    # Every step is timed as a metrics span (source="bcb").
+    # last_bcb_page() only ever returns the page of the current run.
+    reset_bcb_page()
+    run_key = "run_" + datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    with archive_run(RAW_ARCHIVE_BCB, "bcb", run_key), metrics.span("fetch", source="bcb"):
+        page = fetch_bcb_page()
+    if page.not_modified:
+        print("[BCB] page not modified since last run")
+
+    with metrics.span("parse", source="bcb"):
+        extracted_date = page.date
+        df_raw = page.rates
     metadata_date = _load_metadata_date()
 
     if extracted_date is not None and metadata_date == extracted_date:
         print("[BCB] skip (already updated)")
         return None
 
-    df_raw = scrape_bcb_official_rates()
     date_value = extracted_date or pd.Timestamp.utcnow().strftime("%Y-%m-%d")
 
-    save_bcb_raw(df_raw, date_value)
+    with metrics.span("save_raw", source="bcb"):
+        save_bcb_raw(df_raw, date_value)
     print("[BCB] RAW saved")
 
-    df_clean = clean_bcb_table(df_raw)
-    df_fx = extract_official_rates(df_clean)
-
-    df_fx.insert(0, "date", date_value)
-    _add_date_fields(df_fx)
-    df_fx = _order_columns(df_fx)
+    with metrics.span("clean", source="bcb"):
+        df_fx = build_bcb_rates(df_raw, date_value)
 
-    save_bcb_processed(df_fx)
+    with metrics.span("save_processed", source="bcb"):
+        save_bcb_processed(df_fx)
     print("[BCB] today updated")
 
     if extracted_date is not None:
         _write_metadata_date(extracted_date)
 
-    _update_master(df_fx)
+    with metrics.span("store", source="bcb"):
+        _update_master(df_fx)
+    metrics.inc("rows_written_total", len(df_fx), source="bcb", dataset="master")
+    metrics.inc("bytes_written_total", os.path.getsize(MASTER_PATH), source="bcb", dataset="master")
     print("[BCB] master updated")
 
+    metrics.event("ingest", source="bcb", date=date_value, raw_rows=len(df_raw), stored_rows=len(df_fx))
     return df_fx
 
 
+def build_bcb_rates(df_raw, date_value):
+    """Cleans the raw rate table and returns the processed rates of one date."""
+    df_clean = clean_bcb_table(df_raw)
+    df_fx = extract_official_rates(df_clean)
+
+    df_fx.insert(0, "date", date_value)
+    _add_date_fields(df_fx)
+    return _order_columns(df_fx)
+
+
 def _add_date_fields(df_fx):
     df_fx["year"] = df_fx["date"].str.slice(0, 4)
     df_fx["month"] = df_fx["date"].str.slice(5, 7)
@@ -79,14 +108,12 @@ def _load_metadata_date():
 
 
 def _write_metadata_date(date_value):
-    os.makedirs(os.path.dirname(METADATA_BCB), exist_ok=True)
-    with open(METADATA_BCB, "w", encoding="utf-8") as f:
-        json.dump({"last_date": date_value}, f)
+    write_json({"last_date": date_value}, METADATA_BCB)
 
 
 def _update_master(df_fx):
     if not os.path.exists(MASTER_PATH):
-        df_fx.to_parquet(MASTER_PATH, index=False)
+        write_parquet(df_fx, MASTER_PATH, index=False)
         print("[BCB] master created")
         return
 
@@ -99,6 +126,6 @@ def _update_master(df_fx):
     master = master[master["date"] != new_date]
 
     updated = pd.concat([master, df_fx], ignore_index=True)
-    updated.to_parquet(MASTER_PATH, index=False)
+    write_parquet(updated, MASTER_PATH, index=False)
 
     print("[BCB] master updated")
\ No newline at end of file
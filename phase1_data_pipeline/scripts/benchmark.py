@@ -0,0 +1,202 @@
+# benchmark.py
+#
+# End-to-end throughput benchmark: runs update_binance / update_bcb
+# against the local stand-in server (common/standin_server.py) in a
+# throw-away data directory, with no network access, and reports runs/s,
+# requests/s, time per stage and peak RSS.
+#
+# Usage (from phase1_data_pipeline/scripts):
+#   python benchmark.py [--runs 10] [--mode batch|stream] [--latency 0.05]
+#       [--error-rate 0.0] [--depth 40] [--json results.json]
+#
+# Stage times are the stage_seconds metrics of the pipeline (see
+# common/metrics.py), summed over calls; fetch/decode run in many threads
+# and in stream mode the stages overlap, so they can add up to more than
+# the wall time.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_server(args):
+    """Starts the stand-in server in its own process; returns (process, base_url)."""
+    cmd = [
+        sys.executable, "-m", "common.standin_server", "--port", "0",
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--depth", str(args.depth),
+        "--seed", str(args.seed),
+    ]
+    if not args.bcb_static:
+        cmd.append("--bcb-rotate")
+
+    process = subprocess.Popen(cmd, cwd=SCRIPTS_DIR, stdout=subprocess.PIPE, text=True)
+    first_line = process.stdout.readline().strip()
+    if not first_line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError(f"stand-in server did not start: {first_line!r}")
+    return process, first_line[len("listening on "):]
+
+
+def server_counts(base_url):
+    with urllib.request.urlopen(base_url + "/__stats") as response:
+        return json.load(response)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_phase(name, fn, runs, base_url, verbose):
+    from common.http_client import get_client
+    from common.metrics import get_metrics
+
+    http_mark = get_client().mark()
+    stages_before = get_metrics().histogram_sums("stage_seconds", "stage", source=name)
+    before = server_counts(base_url)
+    errors = 0
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(sys.stdout if verbose else out):
+            try:
+                fn()
+            except Exception as e:
+                errors += 1
+                print(f"[{name}] run failed: {e}", file=sys.stderr)
+    wall = time.perf_counter() - start
+
+    after = server_counts(base_url)
+    stages = get_metrics().histogram_sums("stage_seconds", "stage", source=name)
+    served = {key: after[key] - before.get(key, 0) for key in after}
+    client = {"requests": 0, "retries": 0, "failures": 0}
+    for host in get_client().summary(since=http_mark).values():
+        for key in client:
+            client[key] += host[key]
+
+    return {
+        "runs": runs,
+        "failed_runs": errors,
+        "wall_s": round(wall, 3),
+        "runs_per_s": round(runs / wall, 3) if wall else None,
+        "requests": client["requests"],
+        "requests_per_s": round(client["requests"] / wall, 2) if wall else None,
+        "retries": client["retries"],
+        "failures": client["failures"],
+        "server": served,
+        "stages_s": {
+            stage: round(seconds - stages_before.get(stage, 0.0), 3)
+            for stage, seconds in stages.items()
+        },
+    }
+
+
+def print_phase(title, result):
+    print(title)
+    print(
+        f"  {result['runs']} runs in {result['wall_s']}s: {result['runs_per_s']} runs/s, "
+        f"{result['requests_per_s']} requests/s ({result['requests']} requests, "
+        f"{result['retries']} retries, {result['failures']} failures, "
+        f"{result['failed_runs']} failed runs)"
+    )
+    for stage, seconds in result["stages_s"].items():
+        print(f"  {stage:<14} {seconds:>9.3f}s total {1000 * seconds / result['runs']:>9.1f} ms/run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stand-in servers")
+    parser.add_argument("--runs", type=int, default=10, help="Binance runs")
+    parser.add_argument("--bcb-runs", type=int, default=None, help="BCB runs (default: --runs)")
+    parser.add_argument("--sources", default="binance,bcb", help="comma-separated: binance, bcb")
+    parser.add_argument("--mode", choices=["batch", "stream"], default="batch",
+                        help="update_binance batch or stream ingest")
+    parser.add_argument("--latency", type=float, default=0.05, help="server latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random server latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 answers")
+    parser.add_argument("--depth", type=int, default=40, help="ads per (fiat, side) book")
+    parser.add_argument("--bcb-static", action="store_true",
+                        help="serve the same BCB page every time (measures the 304/skip path)")
+    parser.add_argument("--rate", type=float, default=10.0, help="client requests/s on the Binance host")
+    parser.add_argument("--burst", type=int, default=32, help="client token bucket burst")
+    parser.add_argument("--max-workers", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None,
+                        help="data directory to use (default: a temporary one, removed afterwards)")
+    parser.add_argument("--json", default=None, help="also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline output")
+    args = parser.parse_args()
+
+    sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="phase1_bench_")
+    process, base_url = start_server(args)
+
+    # Must be set before the pipeline modules are imported
+    os.environ["PHASE1_DATA_DIR"] = data_dir
+    os.environ["BINANCE_P2P_URL"] = base_url + "/bapi/c2c/v2/friendly/c2c/adv/search"
+    os.environ["BCB_RATES_URL"] = base_url + "/librerias/indicadores/otras/ultimo.php"
+
+    import binance.update_binance as update_binance_module
+    import bcb.update_bcb as update_bcb_module
+
+    results = {
+        "settings": {
+            key: getattr(args, key)
+            for key in ["mode", "latency", "jitter", "error_rate", "depth", "rate", "burst", "max_workers"]
+        },
+    }
+    try:
+        if "binance" in sources:
+            results["binance"] = run_phase(
+                "binance",
+                lambda: update_binance_module.update_binance(
+                    max_workers=args.max_workers, rate=args.rate, burst=args.burst,
+                    stream=args.mode == "stream",
+                ),
+                args.runs, base_url, args.verbose,
+            )
+        if "bcb" in sources:
+            results["bcb"] = run_phase(
+                "bcb", update_bcb_module.update_bcb,
+                args.bcb_runs or args.runs, base_url, args.verbose,
+            )
+    finally:
+        process.terminate()
+        process.wait()
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    s = results["settings"]
+    print(
+        f"Stand-in: latency {s['latency']}s (+{s['jitter']}s), error rate {s['error_rate']}, "
+        f"depth {s['depth']} ads/book; client rate {s['rate']}/s burst {s['burst']}"
+    )
+    if "binance" in results:
+        print_phase(f"Binance ({args.mode})", results["binance"])
+    if "bcb" in results:
+        print_phase("BCB", results["bcb"])
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,44 @@
 # base_scraper.py
 
-import requests
+import os
+
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import time
 
+from common.http_client import get_client
+from common.raw_archive import archive_response
 
-def safe_request(url, payload, max_retries=3, delay=2):
-    """
-    Sends a POST request with retry attempts.
-    Returns the JSON response or None if all retries fail.
-    """
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except Exception:
-            if attempt < max_retries - 1:
-                time.sleep(delay)
-            else:
-                return None
+
+NAN = float("nan")
+# Overridable, e.g. to point at common/standin_server.py
+P2P_SEARCH_URL = os.environ.get(
+    "BINANCE_P2P_URL", "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search"
+)
 
 
-def extract_amount(value):
+def safe_request(url, payload, max_retries=2, delay=2, tags=None):
     """
-    Normalizes Binance amount fields into a clean string or None.
-    Handles cases where value may be:
-    - a string ("1000", "1,200.00")
-    - a number (100 or 100.0)
-    - a dict {"amount": "100"}
-    - a list ["100"]
-    - None or empty
-    Always returns something that can be safely converted to float later.
+    Sends a POST request through the shared pooled HTTP client.
+    Up to `max_retries` retries (max_retries + 1 attempts) use exponential
+    backoff with jitter starting at `delay` seconds and honour
+    Retry-After/429 signals from the server.
+    Returns the JSON response or None if every attempt fails.
+    The response body is also appended, verbatim, to the raw archive
+    segment of the current run (see common/raw_archive.py), if one is open.
     """
-
-    if value is None:
+    try:
+        response = get_client().post(
+            url, json=payload, max_retries=max_retries, backoff=delay, tags=tags
+        )
+        archive_response(
+            "binance", url=url, payload=payload, tags=tags,
+            status=response.status_code, body=response.text,
+        )
+        return response.json()
+    except Exception:
         return None
 
-    # Case: {"amount": "..."}
-    if isinstance(value, dict):
-        value = value.get("amount")
-
-    # Case: ["100"]
-    if isinstance(value, list) and len(value) > 0:
-        value = value[0]
-
-    # Convert everything to string
-    value = str(value)
-
-    # Remove commas and spaces
-    value = value.replace(",", "").strip()
-
-    # Remove invalid representations
-    if value in ["", "None", "nan", "{}", "[]"]:
-        return None
-
-    return value
-
 
 def p2p_query(asset="USDT", fiat="USD", side="BUY", page=1, rows=20):
     """
@@ -65,8 +46,6 @@ def p2p_query(asset="USDT", fiat="USD", side="BUY", page=1, rows=20):
     Returns JSON or None.
     """
 
-    url = "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search"
-
     payload = {
         "page": page,
         "rows": rows,
@@ -75,24 +54,80 @@ def p2p_query(asset="USDT", fiat="USD", side="BUY", page=1, rows=20):
         "fiat": fiat.upper()
     }
 
-    return safe_request(url, payload)
+    tags = {
+        "asset": payload["asset"], "fiat": payload["fiat"],
+        "side": payload["tradeType"], "page": page,
+    }
+    return safe_request(P2P_SEARCH_URL, payload, tags=tags)
 
 
-def p2p_to_df(json_data, side):
+def _to_float(value):
     """
-    Converts Binance P2P JSON data into a pandas DataFrame.
-    Ensures mandatory fields exist and extracts values safely.
+    Parses a Binance numeric field (string, number, {"amount": ...} or
+    ["..."]) straight to float. Returns NaN when missing or invalid.
+    """
+    if isinstance(value, dict):
+        value = value.get("amount")
+
+    if isinstance(value, list):
+        value = value[0] if len(value) > 0 else None
+
+    if value is None:
+        return NAN
+
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return NAN
+
+
+def _to_text(value):
+    return str(value).strip()
+
+
+P2P_COLUMNS = [
+    "timestamp_scraped",
+    "side",
+    "price",
+    "asset",
+    "fiat",
+    "min_amount",
+    "max_amount",
+    "merchant_id",
+    "merchant_name",
+    "finish_rate",
+    "positive_rate",
+    "payment_methods",
+]
+FLOAT_COLUMNS = ["price", "min_amount", "max_amount", "finish_rate", "positive_rate"]
+
+
+def p2p_to_columns(json_data, side, timestamp=None, columns=None):
     """
+    Decodes a Binance P2P response into column lists (one list per entry
+    of P2P_COLUMNS), appending to `columns` when given so that several
+    pages can be accumulated before building a single DataFrame.
+    Numeric fields are parsed once to float, text fields are normalized
+    (stripped, side/asset/fiat upper-cased) as clean_and_standardize would.
+    Ads without adv/advertiser or with an invalid price are skipped.
+    `timestamp` (ISO string) defaults to the current UTC second.
+    """
+    if columns is None:
+        columns = {col: [] for col in P2P_COLUMNS}
 
     if json_data is None:
-        return pd.DataFrame()
+        return columns
 
     entries = json_data.get("data", [])
     if not isinstance(entries, list) or len(entries) == 0:
-        return pd.DataFrame()
+        return columns
 
-    timestamp_value = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
-    rows = []
+    if timestamp is None:
+        timestamp = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    side = side.upper().strip()
 
     for item in entries:
 
@@ -102,36 +137,64 @@ def p2p_to_df(json_data, side):
         if adv is None or advertiser is None:
             continue
 
-        # Validate and convert price
         try:
             price_value = float(adv.get("price"))
         except Exception:
             continue
 
-        # Payment methods
         trade_methods = adv.get("tradeMethods", [])
         if isinstance(trade_methods, list):
-            payment_list = [m.get("identifier", "") for m in trade_methods]
+            methods = ",".join(m.get("identifier", "") for m in trade_methods)
         else:
-            payment_list = []
-
-        # Extract normalized min and max amounts
-        min_amt = extract_amount(adv.get("minSingleTransAmount"))
-        max_amt = extract_amount(adv.get("maxSingleTransAmount"))
-
-        rows.append({
-            "timestamp_scraped": timestamp_value,
-            "side": side,
-            "price": price_value,
-            "asset": adv.get("asset"),
-            "fiat": adv.get("fiatUnit"),
-            "min_amount": min_amt,
-            "max_amount": max_amt,
-            "merchant_id": advertiser.get("userNo"),
-            "merchant_name": advertiser.get("nickName"),
-            "finish_rate": advertiser.get("monthFinishRate"),
-            "positive_rate": advertiser.get("positiveRate"),
-            "payment_methods": ",".join(payment_list)
-        })
-
-    return pd.DataFrame(rows)
\ No newline at end of file
+            methods = ""
+
+        columns["timestamp_scraped"].append(timestamp)
+        columns["side"].append(side)
+        columns["price"].append(price_value)
+        columns["asset"].append(_to_text(adv.get("asset")).upper())
+        columns["fiat"].append(_to_text(adv.get("fiatUnit")).upper())
+        columns["min_amount"].append(_to_float(adv.get("minSingleTransAmount")))
+        columns["max_amount"].append(_to_float(adv.get("maxSingleTransAmount")))
+        columns["merchant_id"].append(_to_text(advertiser.get("userNo")))
+        columns["merchant_name"].append(_to_text(advertiser.get("nickName")))
+        columns["finish_rate"].append(_to_float(advertiser.get("monthFinishRate")))
+        columns["positive_rate"].append(_to_float(advertiser.get("positiveRate")))
+        columns["payment_methods"].append(methods.strip())
+
+    return columns
+
+
+def merge_columns(parts):
+    """Concatenates several p2p_to_columns() results, in order."""
+    merged = {col: [] for col in P2P_COLUMNS}
+    for part in parts:
+        for col in P2P_COLUMNS:
+            merged[col].extend(part[col])
+    return merged
+
+
+def columns_to_df(columns):
+    """
+    Builds the DataFrame with one allocation per column (float64 arrays
+    for the numeric fields). Its fields are already normalized: clean it
+    with clean_standardize.clean_decoded.
+    """
+    if columns is None or len(columns["price"]) == 0:
+        return pd.DataFrame()
+
+    data = {}
+    for col in P2P_COLUMNS:
+        if col in FLOAT_COLUMNS:
+            data[col] = np.array(columns[col], dtype="float64")
+        else:
+            data[col] = columns[col]
+
+    return pd.DataFrame(data)
+
+
+def p2p_to_df(json_data, side, timestamp=None):
+    """
+    Converts Binance P2P JSON data into a pandas DataFrame.
+    Ensures mandatory fields exist and extracts values safely.
+    """
+    return columns_to_df(p2p_to_columns(json_data, side, timestamp=timestamp))
@@ -0,0 +1,211 @@
+# bench_decode.py
+#
+# Micro-benchmark: row-by-row p2p_to_df (previous implementation, one
+# DataFrame per page) versus the columnar decoder (column lists per fiat,
+# one DataFrame per fiat), each followed by its cleaning step
+# (clean_and_standardize / clean_decoded).
+#
+# Usage (from phase1_data_pipeline/scripts):
+#   python -m binance.bench_decode [--runs 50] [--repeat 3]
+
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from .base_scraper import p2p_to_columns, columns_to_df
+from .clean_standardize import clean_and_standardize, clean_decoded
+from .paths_binance import DATA_RAW_BINANCE
+
+
+TIMESTAMP = "2025-12-07T10:30:45Z"
+
+
+def extract_amount(value):
+    """
+    Normalizes Binance amount fields into a clean string or None.
+    Handles cases where value may be:
+    - a string ("1000", "1,200.00")
+    - a number (100 or 100.0)
+    - a dict {"amount": "100"}
+    - a list ["100"]
+    - None or empty
+    Always returns something that can be safely converted to float later.
+    """
+
+    if value is None:
+        return None
+
+    # Case: {"amount": "..."}
+    if isinstance(value, dict):
+        value = value.get("amount")
+
+    # Case: ["100"]
+    if isinstance(value, list) and len(value) > 0:
+        value = value[0]
+
+    # Convert everything to string
+    value = str(value)
+
+    # Remove commas and spaces
+    value = value.replace(",", "").strip()
+
+    # Remove invalid representations
+    if value in ["", "None", "nan", "{}", "[]"]:
+        return None
+
+    return value
+
+
+def legacy_p2p_to_df(json_data, side, timestamp=TIMESTAMP):
+    """Previous p2p_to_df: one dict per ad, amounts kept as strings."""
+    if json_data is None:
+        return pd.DataFrame()
+
+    entries = json_data.get("data", [])
+    if not isinstance(entries, list) or len(entries) == 0:
+        return pd.DataFrame()
+
+    rows = []
+    for item in entries:
+        adv = item.get("adv")
+        advertiser = item.get("advertiser")
+        if adv is None or advertiser is None:
+            continue
+        try:
+            price_value = float(adv.get("price"))
+        except Exception:
+            continue
+        trade_methods = adv.get("tradeMethods", [])
+        if isinstance(trade_methods, list):
+            payment_list = [m.get("identifier", "") for m in trade_methods]
+        else:
+            payment_list = []
+        rows.append({
+            "timestamp_scraped": timestamp,
+            "side": side,
+            "price": price_value,
+            "asset": adv.get("asset"),
+            "fiat": adv.get("fiatUnit"),
+            "min_amount": extract_amount(adv.get("minSingleTransAmount")),
+            "max_amount": extract_amount(adv.get("maxSingleTransAmount")),
+            "merchant_id": advertiser.get("userNo"),
+            "merchant_name": advertiser.get("nickName"),
+            "finish_rate": advertiser.get("monthFinishRate"),
+            "positive_rate": advertiser.get("positiveRate"),
+            "payment_methods": ",".join(payment_list),
+        })
+    return pd.DataFrame(rows)
+
+
+def responses_from_raw(path, rows=20):
+    """
+    Rebuilds Binance-shaped search responses (one per fiat/side page)
+    from a raw run parquet, with numbers serialized as the API does.
+    """
+    df = pd.read_parquet(path)
+    responses = []
+
+    for (fiat, side), group in df.groupby(["fiat", "side"], sort=False):
+        records = group.to_dict("records")
+        for start in range(0, len(records), rows):
+            data = []
+            for r in records[start:start + rows]:
+                methods = str(r["payment_methods"] or "")
+                data.append({
+                    "adv": {
+                        "price": str(r["price"]),
+                        "asset": r["asset"],
+                        "fiatUnit": r["fiat"],
+                        "minSingleTransAmount": str(r["min_amount"]),
+                        "maxSingleTransAmount": str(r["max_amount"]),
+                        "tradeMethods": [
+                            {"identifier": m} for m in methods.split(",") if m
+                        ],
+                    },
+                    "advertiser": {
+                        "userNo": r["merchant_id"],
+                        "nickName": r["merchant_name"],
+                        "monthFinishRate": r["finish_rate"],
+                        "positiveRate": r["positive_rate"],
+                    },
+                })
+            responses.append((fiat, side, {"data": data, "total": len(records)}))
+
+    return responses
+
+
+def _legacy_parse(runs):
+    """Previous path: one DataFrame per page, concatenated per fiat."""
+    out = []
+    for responses in runs:
+        by_fiat = {}
+        for fiat, side, resp in responses:
+            by_fiat.setdefault(fiat, []).append(legacy_p2p_to_df(resp, side))
+        out.extend(pd.concat(frames, ignore_index=True) for frames in by_fiat.values())
+    return out
+
+
+def _columnar_parse(runs):
+    """Columnar path: pages decoded into column lists, one frame per fiat."""
+    out = []
+    for responses in runs:
+        by_fiat = {}
+        for fiat, side, resp in responses:
+            by_fiat[fiat] = p2p_to_columns(
+                resp, side, timestamp=TIMESTAMP, columns=by_fiat.get(fiat)
+            )
+        out.extend(columns_to_df(columns) for columns in by_fiat.values())
+    return out
+
+
+def _clean(frames, clean=clean_and_standardize):
+    return [clean(df) for df in frames]
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p2p_to_df decoding benchmark")
+    parser.add_argument("--raw-dir", default=DATA_RAW_BINANCE)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.raw_dir, "*.parquet")))[-args.runs:]
+    if not paths:
+        raise SystemExit(f"No raw runs found in {args.raw_dir}")
+
+    runs = [responses_from_raw(path) for path in paths]
+    responses = [r for run in runs for r in run]
+    n_ads = sum(len(resp["data"]) for _, _, resp in responses)
+
+    t_old_parse, _ = _best_of(lambda: _legacy_parse(runs), args.repeat)
+    t_new_parse, _ = _best_of(lambda: _columnar_parse(runs), args.repeat)
+    t_old, old = _best_of(lambda: _clean(_legacy_parse(runs)), args.repeat)
+    t_new, new = _best_of(lambda: _clean(_columnar_parse(runs), clean_decoded), args.repeat)
+
+    old_all = pd.concat(old, ignore_index=True)
+    new_all = pd.concat(new, ignore_index=True)
+    pd.testing.assert_frame_equal(old_all, new_all, check_dtype=False)
+
+    print(f"{len(paths)} runs, {len(responses)} responses, {n_ads} ads")
+    print(f"row-by-row parse:         {t_old_parse * 1000:8.1f} ms")
+    print(f"columnar   parse:         {t_new_parse * 1000:8.1f} ms")
+    print(f"row-by-row parse + clean: {t_old * 1000:8.1f} ms")
+    print(f"columnar   parse + clean: {t_new * 1000:8.1f} ms")
+    print(f"speed-up (parse + clean): {t_old / t_new:.2f}x (outputs identical)")
+
+
+if __name__ == "__main__":
+    main()
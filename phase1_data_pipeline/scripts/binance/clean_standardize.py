@@ -15,9 +15,10 @@ def clean_and_standardize(df):
     df = df.copy()
     df.columns = [col.strip().lower() for col in df.columns]
 
-    # Robust cleaning for amount fields
+    # Robust cleaning for amount fields given as strings (row-by-row
+    # frames, see bench_decode.legacy_p2p_to_df); floats are kept as is
     for col in ["min_amount", "max_amount"]:
-        if col in df.columns:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
             df[col] = (
                 df[col]
                 .astype(str)
@@ -34,7 +35,7 @@ def clean_and_standardize(df):
     numeric_fields = ["price", "min_amount", "max_amount",
                       "finish_rate", "positive_rate"]
     for col in numeric_fields:
-        if col in df.columns:
+        if col in df.columns and not pd.api.types.is_float_dtype(df[col]):
             df[col] = pd.to_numeric(df[col], errors="coerce")
 
     if "merchant_id" in df.columns:
@@ -51,12 +52,35 @@ def clean_and_standardize(df):
             df[col] = df[col].astype(str).str.upper().str.strip()
 
     if "timestamp_scraped" in df.columns:
-        df["timestamp_scraped"] = (
-            pd.to_datetime(df["timestamp_scraped"], errors="coerce")
+        # A run shares a handful of timestamps: format each one only once
+        raw_ts = pd.Series(df["timestamp_scraped"].unique())
+        formatted = (
+            pd.to_datetime(raw_ts, errors="coerce")
               .dt.strftime("%Y-%m-%dT%H:%M:%SZ")
         )
+        df["timestamp_scraped"] = df["timestamp_scraped"].map(
+            dict(zip(raw_ts, formatted))
+        )
+
+    return _finalize(df)
+
+
+def clean_decoded(df):
+    """
+    Cleaning of frames built by base_scraper.columns_to_df, whose fields
+    are already typed and normalized at decode: only duplicate removal
+    and the column order are left to do.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame()
+    return _finalize(df)
+
 
-    df = df.drop_duplicates()
+def _finalize(df):
+    if "row_key" in df.columns:
+        df = df.drop_duplicates(subset=["row_key"])
+    else:
+        df = df.drop_duplicates()
 
     expected_order = [
         "run_index",
@@ -71,7 +95,8 @@ def clean_and_standardize(df):
         "merchant_name",
         "finish_rate",
         "positive_rate",
-        "payment_methods"
+        "payment_methods",
+        "row_key",
     ]
 
     cols_present = [c for c in expected_order if c in df.columns]
@@ -0,0 +1,286 @@
+# manifest.py
+#
+# Versioned manifest of a partitioned dataset (see p2p_store.py): the set
+# of live files at every committed version.
+#
+#   <dataset_dir>/_manifest/v000000042.json              commit 42
+#       {"version": 42, "ts": ..., "add": [...], "remove": [...]}
+#   <dataset_dir>/_manifest/v000000040.checkpoint.json   files at version 40
+#
+# Writers first write their files (atomically, under new names) and then
+# publish them with commit(); a commit file is created with a hard link,
+# which fails if that version already exists, so concurrent committers
+# never overwrite each other. Readers load one snapshot and read exactly
+# its files: a write that happens meanwhile is not seen, even partly.
+# Files removed by a commit (e.g. fragments merged by compaction) stay on
+# disk for RETENTION_SECONDS so that pinned readers can finish; vacuum()
+# deletes them afterwards.
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from common.atomic_write import temp_path, write_json
+
+
+MANIFEST_DIR = "_manifest"
+CHECKPOINT_EVERY = 50
+RETENTION_SECONDS = 3600
+
+_ENTRY_RE = re.compile(r"^v(\d{9})(\.checkpoint)?\.json$")
+
+
+class SnapshotExpired(Exception):
+    """The requested version was vacuumed."""
+
+
+class Snapshot:
+    """Files (relative paths, '/'-separated) of one dataset version."""
+
+    def __init__(self, dataset_dir, version, files):
+        self.dataset_dir = dataset_dir
+        self.version = version
+        self.files = files
+
+    def paths(self):
+        return [os.path.join(self.dataset_dir, *rel.split("/")) for rel in self.files]
+
+
+def _manifest_dir(dataset_dir):
+    return os.path.join(dataset_dir, MANIFEST_DIR)
+
+
+def _entry_path(dataset_dir, version, checkpoint=False):
+    suffix = ".checkpoint.json" if checkpoint else ".json"
+    return os.path.join(_manifest_dir(dataset_dir), f"v{version:09d}{suffix}")
+
+
+def _entries(dataset_dir):
+    """(commits, checkpoints): sorted version numbers found on disk."""
+    commits, checkpoints = [], []
+    directory = _manifest_dir(dataset_dir)
+    if not os.path.isdir(directory):
+        return commits, checkpoints
+
+    for name in os.listdir(directory):
+        match = _ENTRY_RE.match(name)
+        if match:
+            (checkpoints if match.group(2) else commits).append(int(match.group(1)))
+    return sorted(commits), sorted(checkpoints)
+
+
+def has_manifest(dataset_dir):
+    commits, checkpoints = _entries(dataset_dir)
+    return bool(commits or checkpoints)
+
+
+def current_version(dataset_dir):
+    """Latest committed version, or None for a dataset without manifest."""
+    commits, checkpoints = _entries(dataset_dir)
+    if not (commits or checkpoints):
+        return None
+    return max(commits[-1:] + checkpoints[-1:])
+
+
+def relative_path(dataset_dir, path):
+    return os.path.relpath(path, dataset_dir).replace(os.sep, "/")
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Snapshots never change once committed: keep the last few in memory.
+# The key holds the manifest folder's inode, so a dataset moved aside and
+# recreated under the same path (replay --rebuild) never serves the
+# snapshots of the old one.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 8
+
+
+def load_snapshot(dataset_dir, version=None):
+    """
+    Snapshot of `version` (default: the latest), or None when the dataset
+    has no manifest yet. Raises SnapshotExpired for a vacuumed version.
+    """
+    commits, checkpoints = _entries(dataset_dir)
+    if not (commits or checkpoints):
+        return None
+
+    latest = max(commits[-1:] + checkpoints[-1:])
+    version = latest if version is None else int(version)
+    if version > latest:
+        raise ValueError(f"{dataset_dir}: version {version} does not exist (latest {latest})")
+
+    key = (os.path.abspath(dataset_dir), os.stat(_manifest_dir(dataset_dir)).st_ino, version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    base = max((c for c in checkpoints if c <= version), default=None)
+    if base is None:
+        raise SnapshotExpired(f"{dataset_dir}: version {version} is no longer available")
+
+    try:
+        files = set(_read(_entry_path(dataset_dir, base, checkpoint=True))["files"])
+        for v in range(base + 1, version + 1):
+            commit = _read(_entry_path(dataset_dir, v))
+            files.difference_update(commit["remove"])
+            files.update(commit["add"])
+    except FileNotFoundError:
+        raise SnapshotExpired(f"{dataset_dir}: version {version} is no longer available")
+
+    snapshot = Snapshot(dataset_dir, version, sorted(files, key=lambda rel: rel.split("/")))
+    with _cache_lock:
+        _cache[key] = snapshot
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return snapshot
+
+
+def commit_ts(dataset_dir, version):
+    """
+    Time of the commit (or checkpoint) of `version`: together with the
+    number it identifies a version across a rebuilt dataset. Raises
+    SnapshotExpired when neither entry is left.
+    """
+    for checkpoint in (False, True):
+        try:
+            return _read(_entry_path(dataset_dir, version, checkpoint))["ts"]
+        except FileNotFoundError:
+            continue
+    raise SnapshotExpired(f"{dataset_dir}: version {version} is no longer available")
+
+
+def changes(dataset_dir, since, version=None):
+    """
+    Files added and removed by the commits after version `since`, up to
+    `version` (default: the latest), as two sets of relative paths.
+    Raises SnapshotExpired when a commit in between was vacuumed.
+    """
+    latest = current_version(dataset_dir)
+    version = latest if version is None else int(version)
+    added, removed = set(), set()
+    try:
+        for v in range(int(since) + 1, version + 1):
+            commit = _read(_entry_path(dataset_dir, v))
+            added.update(commit["add"])
+            removed.update(commit["remove"])
+    except FileNotFoundError:
+        raise SnapshotExpired(f"{dataset_dir}: commits after {since} are no longer available")
+    return added, removed
+
+
+def _scan_files(dataset_dir):
+    """Parquet files present in the partition directories (bootstrap)."""
+    found = []
+    for root, dirs, files in os.walk(dataset_dir):
+        dirs[:] = sorted(d for d in dirs if d != MANIFEST_DIR)
+        if os.path.samefile(root, dataset_dir):
+            continue
+        for name in files:
+            if name.endswith(".parquet"):
+                found.append(relative_path(dataset_dir, os.path.join(root, name)))
+    return found
+
+
+def commit(dataset_dir, add=(), remove=()):
+    """
+    Publishes a new version: the previous files, minus `remove`, plus
+    `add` (relative paths or absolute paths inside dataset_dir). A dataset
+    without manifest is first registered as version 0 with the files
+    already on disk. Returns the new version.
+    """
+    add = [relative_path(dataset_dir, p) if os.path.isabs(p) else p for p in add]
+    remove = [relative_path(dataset_dir, p) if os.path.isabs(p) else p for p in remove]
+    os.makedirs(_manifest_dir(dataset_dir), exist_ok=True)
+
+    if not has_manifest(dataset_dir):
+        existing = [f for f in _scan_files(dataset_dir) if f not in set(add)]
+        write_json({"version": 0, "ts": time.time(), "files": existing},
+                   _entry_path(dataset_dir, 0, checkpoint=True))
+
+    while True:
+        version = current_version(dataset_dir) + 1
+        final = _entry_path(dataset_dir, version)
+        tmp = temp_path(final)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "ts": time.time(), "add": add, "remove": remove}, f)
+        try:
+            os.link(tmp, final)
+        except FileExistsError:
+            continue  # another writer took this version: retry on top of it
+        finally:
+            os.remove(tmp)
+        break
+
+    if version % CHECKPOINT_EVERY == 0:
+        snapshot = load_snapshot(dataset_dir, version)
+        write_json({"version": version, "ts": time.time(), "files": snapshot.files},
+                   _entry_path(dataset_dir, version, checkpoint=True))
+    return version
+
+
+def _remove_empty_dirs(dataset_dir, directory):
+    """Removes `directory` and its parents up to dataset_dir while they are empty."""
+    root = os.path.abspath(dataset_dir)
+    directory = os.path.abspath(directory)
+    while directory != root and directory.startswith(root + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return
+        directory = os.path.dirname(directory)
+
+
+def vacuum(dataset_dir, retention=RETENTION_SECONDS):
+    """
+    Deletes the files removed by commits older than `retention` seconds
+    (and the partition directories they leave empty) and the manifest
+    entries only needed to rebuild versions that old.
+    Returns the number of deleted data files.
+    """
+    commits, checkpoints = _entries(dataset_dir)
+    if not commits:
+        return 0
+
+    cutoff = time.time() - retention
+    live = set(load_snapshot(dataset_dir).files)
+    deleted = 0
+
+    for v in commits:
+        try:
+            entry = _read(_entry_path(dataset_dir, v))
+        except FileNotFoundError:
+            continue
+        if entry["ts"] >= cutoff:
+            break
+        for rel in entry["remove"]:
+            path = os.path.join(dataset_dir, *rel.split("/"))
+            if rel not in live and os.path.exists(path):
+                os.remove(path)
+                _remove_empty_dirs(dataset_dir, os.path.dirname(path))
+                deleted += 1
+
+    # Versions older than the retention window are no longer readable:
+    # drop the entries before the last checkpoint that is that old
+    old_checkpoints = [
+        c for c in checkpoints
+        if _read(_entry_path(dataset_dir, c, checkpoint=True))["ts"] < cutoff
+    ]
+    if old_checkpoints:
+        keep_from = old_checkpoints[-1]
+        for v in commits:
+            if v <= keep_from:
+                os.remove(_entry_path(dataset_dir, v))
+        for c in checkpoints:
+            if c < keep_from:
+                os.remove(_entry_path(dataset_dir, c, checkpoint=True))
+
+    return deleted
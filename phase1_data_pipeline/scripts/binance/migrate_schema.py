@@ -0,0 +1,81 @@
+# migrate_schema.py
+#
+# Migrates existing processed Binance data to the declared schema
+# (schema.py) and reports on-disk size, load time and in-memory size
+# before and after:
+#   - legacy single files (p2p_master.parquet or historical_fiat/*.parquet)
+#     are converted into the master dataset;
+#   - dataset fragments of the former string/int64 layout are rewritten.
+#
+# Usage (from phase1_data_pipeline/scripts):
+#   python -m binance.migrate_schema
+
+import glob
+import os
+import time
+
+import pandas as pd
+
+from .p2p_store import read_dataset, has_partitions
+from .read_processed import read_master
+from .snapshot_and_master import migrate_legacy_files, dataset_schema_version
+from .schema import SCHEMA_VERSION
+from .paths_binance import MASTER_DATASET_DIR, MASTER_PATH, HISTORICAL_FIAT_DIR
+
+
+def _size_mb(paths):
+    return sum(os.path.getsize(p) for p in paths) / 1e6
+
+
+def _dataset_files(dataset_dir):
+    return [
+        os.path.join(root, name)
+        for root, _, files in os.walk(dataset_dir)
+        for name in files if name.endswith(".parquet")
+    ]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    df = fn()
+    return time.perf_counter() - start, df
+
+
+def _report(label, size_mb, seconds, df):
+    memory_mb = df.memory_usage(deep=True).sum() / 1e6
+    print(
+        f"{label:<7} {size_mb:8.1f} MB on disk  {seconds:6.2f} s load  "
+        f"{memory_mb:8.1f} MB in memory  ({len(df)} rows)"
+    )
+
+
+def main():
+    if has_partitions(MASTER_DATASET_DIR):
+        if dataset_schema_version(MASTER_DATASET_DIR) >= SCHEMA_VERSION:
+            print(f"Master dataset already at schema v{SCHEMA_VERSION}")
+            return
+        before_files = _dataset_files(MASTER_DATASET_DIR)
+        load_before = lambda: read_dataset(MASTER_DATASET_DIR)
+    else:
+        if os.path.exists(MASTER_PATH):
+            before_files = [MASTER_PATH]
+        else:
+            before_files = sorted(glob.glob(os.path.join(HISTORICAL_FIAT_DIR, "*.parquet")))
+        if not before_files:
+            raise SystemExit("No processed Binance data to migrate")
+        load_before = lambda: pd.concat(
+            [pd.read_parquet(p) for p in before_files], ignore_index=True
+        )
+
+    seconds, df = _timed(load_before)
+    _report("before", _size_mb(before_files), seconds, df)
+    del df
+
+    migrate_legacy_files()
+
+    seconds, df = _timed(read_master)
+    _report("after", _size_mb(_dataset_files(MASTER_DATASET_DIR)), seconds, df)
+
+
+if __name__ == "__main__":
+    main()
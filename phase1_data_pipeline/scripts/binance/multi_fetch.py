@@ -1,35 +1,210 @@
 # multi_fetch.py
 
 import time
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .base_scraper import p2p_query, p2p_to_df
+from common import metrics
+from common.rate_limiter import configure_rate_limit, DEFAULT_RATE, DEFAULT_BURST
+from common.raw_archive import run_in_context
+from .row_key import add_row_key, drop_duplicate_keys
+from .base_scraper import (
+    p2p_query,
+    p2p_to_columns,
+    merge_columns,
+    columns_to_df,
+    P2P_COLUMNS,
+    P2P_SEARCH_URL,
+)
 
 
-def p2p_fetch(asset, fiat, run_index, pages=2, delay=0.5):
+SIDES = ["BUY", "SELL"]
+ROWS_PER_PAGE = 20
+
+
+def depth_reached(columns, stop_rule):
+    """
+    Checks the ads collected so far for one side (p2p_to_columns lists)
+    against a stop rule. stop_rule is a dict with any of:
+    - "max_ads": number of ads to collect
+    - "max_price_distance": relative distance from the best (first) ad,
+      e.g. 0.02 stops once the last ad is 2% away from the best price
+    - "max_volume": cumulative advertised volume (sum of max_amount)
+    Returns True as soon as one of the given limits is reached.
+    """
+    prices = columns["price"]
+    if len(prices) == 0 or not stop_rule:
+        return False
+
+    max_ads = stop_rule.get("max_ads")
+    if max_ads is not None and len(prices) >= max_ads:
+        return True
+
+    max_distance = stop_rule.get("max_price_distance")
+    if max_distance is not None:
+        best, last = prices[0], prices[-1]
+        if best and abs(last - best) / abs(best) >= max_distance:
+            return True
+
+    max_volume = stop_rule.get("max_volume")
+    if max_volume is not None:
+        volume = sum(v for v in columns["max_amount"] if v == v)  # skip NaN
+        if volume >= max_volume:
+            return True
+
+    return False
+
+
+def p2p_fetch_side(asset, fiat, side, stop_rule, max_pages=10, delay=0.0, on_page=None):
+    """
+    Adaptive pagination for one side of a fiat book.
+    Requests pages one by one and stops when the Binance `total` count
+    is exhausted, a page comes back short or empty, max_pages is hit,
+    or depth_reached() says the stop rule is satisfied. Page length and
+    `total` are compared with the ads the server sent, so ads skipped
+    by the decoder never end the walk early.
+    Returns the collected ads as p2p_to_columns lists.
+    With on_page, each non-empty page is handed over as soon as it is
+    decoded, on_page(page, page_columns), and only the columns needed by
+    the stop rule (price, max_amount) are kept and returned.
+    """
+    kept = P2P_COLUMNS if on_page is None else ["price", "max_amount"]
+    columns = {col: [] for col in kept}
+    max_ads = (stop_rule or {}).get("max_ads")
+    served = 0
+
+    for page in range(1, max_pages + 1):
+        json_response = p2p_query(asset, fiat, side, page=page, rows=ROWS_PER_PAGE)
+        with metrics.span("decode", log=False, source="binance", asset=asset, fiat=fiat):
+            page_columns = p2p_to_columns(json_response, side)
+        entries = (json_response or {}).get("data")
+        page_rows = len(entries) if isinstance(entries, list) else 0
+        served += page_rows
+
+        if max_ads is not None:
+            room = max(max_ads - len(columns["price"]), 0)
+            page_columns = {col: values[:room] for col, values in page_columns.items()}
+
+        for col in kept:
+            columns[col].extend(page_columns[col])
+        if on_page is not None and len(page_columns["price"]) > 0:
+            on_page(page, page_columns)
+
+        if delay:
+            time.sleep(delay)
+
+        if page_rows == 0 or depth_reached(columns, stop_rule):
+            break
+
+        total = (json_response or {}).get("total")
+        if page_rows < ROWS_PER_PAGE or (total is not None and served >= total):
+            break
+
+    return columns
+
+
+def fetch_page(asset, fiat, side, page):
+    json_response = p2p_query(asset, fiat, side, page=page)
+    with metrics.span("decode", log=False, source="binance", asset=asset, fiat=fiat):
+        return p2p_to_columns(json_response, side)
+
+
+def to_frame(parts, run_index):
+    df = columns_to_df(merge_columns(parts))
+    if df.empty:
+        return df
+
+    df["run_index"] = run_index
+    return drop_duplicate_keys(add_row_key(df))
+
+
+def p2p_fetch(asset, fiat, run_index, pages=2, delay=0.5, stop_rule=None):
     """
     Fetches BUY and SELL data for a given asset and fiat currency.
     Iterates through multiple pages, applies rate-limit delays,
     and combines all results into a single DataFrame.
+    With a stop_rule, pages are walked adaptively (see p2p_fetch_side)
+    and `pages` becomes the maximum number of pages per side.
     """
-    sides = ["BUY", "SELL"]
-    all_rows = []
+    parts = []
 
-    for side in sides:
-        for page in range(1, pages + 1):
-            json_response = p2p_query(asset, fiat, side, page=page)
-            df = p2p_to_df(json_response, side)
+    for side in SIDES:
+        if stop_rule:
+            parts.append(
+                p2p_fetch_side(asset, fiat, side, stop_rule, max_pages=pages, delay=delay)
+            )
+            continue
 
+        for page in range(1, pages + 1):
+            parts.append(fetch_page(asset, fiat, side, page))
             time.sleep(delay)
 
-            if df.empty:
-                continue
+    return to_frame(parts, run_index)
+
+
+def markets(assets, fiats):
+    """(asset, fiat) pairs scraped by a run: every asset against every fiat."""
+    return [(asset, fiat) for asset in assets for fiat in fiats]
+
+
+def p2p_fetch_markets(market_list, run_index, pages=2, max_workers=16,
+                      rate=DEFAULT_RATE, burst=DEFAULT_BURST, stop_rule=None):
+    """
+    Concurrent counterpart of p2p_fetch for several (asset, fiat) markets.
+    All (asset, fiat, side, page) requests are submitted at once to a
+    bounded thread pool; the Binance host token bucket (rate requests/s,
+    burst requests back to back) is the only throttle, so the run scales
+    with the number of markets at that rate.
+    With a stop_rule, each (asset, fiat, side) book is one task that walks
+    its pages adaptively, up to `pages` pages.
+    Returns {(asset, fiat): DataFrame}, each frame equal to what p2p_fetch
+    returns.
+    """
+    configure_rate_limit(P2P_SEARCH_URL, rate=rate, burst=burst)
+
+    if stop_rule:
+        page_keys = [None]
+    else:
+        page_keys = list(range(1, pages + 1))
+
+    tasks = [
+        (asset, fiat, side, page)
+        for asset, fiat in market_list
+        for side in SIDES
+        for page in page_keys
+    ]
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks)))) as pool:
+        futures = {}
+        for asset, fiat, side, page in tasks:
+            # Workers archive their responses in the caller's run segment
+            if page is None:
+                future = pool.submit(
+                    run_in_context(p2p_fetch_side), asset, fiat, side, stop_rule,
+                    max_pages=pages,
+                )
+            else:
+                future = pool.submit(run_in_context(fetch_page), asset, fiat, side, page)
+            futures[future] = (asset, fiat, side, page)
+
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
 
-            df["run_index"] = run_index
-            all_rows.append(df)
+    # Reassemble in the same side/page order as the sequential fetch
+    return {
+        (asset, fiat): to_frame(
+            [results[(asset, fiat, side, page)] for side in SIDES for page in page_keys],
+            run_index,
+        )
+        for asset, fiat in market_list
+    }
 
-    if len(all_rows) == 0:
-        return pd.DataFrame()
 
-    final_df = pd.concat(all_rows, ignore_index=True).drop_duplicates()
-    return final_df
+def p2p_fetch_concurrent(asset, fiats, run_index, pages=2, max_workers=16,
+                         rate=DEFAULT_RATE, burst=DEFAULT_BURST, stop_rule=None):
+    """p2p_fetch_markets for one asset. Returns {fiat: DataFrame}."""
+    by_market = p2p_fetch_markets(
+        markets([asset], fiats), run_index, pages=pages, max_workers=max_workers,
+        rate=rate, burst=burst, stop_rule=stop_rule,
+    )
+    return {fiat: df for (_, fiat), df in by_market.items()}
@@ -0,0 +1,279 @@
+# p2p_store.py
+#
+# Append-only, hive-partitioned parquet datasets for processed Binance data:
+#
+#   <dataset_dir>/currency=USD/date=2025-12-07/run_002270.parquet
+#
+# Each ingest run writes one small fragment per partition it touches and
+# never rewrites history. Partition values live in the directory names and
+# are added back as columns by the readers.
+#
+# Files are written atomically and published through the dataset manifest
+# (see manifest.py); readers list the files of one manifest version, so a
+# read never sees a write in progress. Datasets without a manifest are
+# listed from the directories.
+
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.atomic_write import atomic_path
+from . import manifest
+
+
+PARTITION_DIR_RE = re.compile(r"^([A-Za-z_]+)=(.+)$")
+FRAGMENT_PART_RE = re.compile(r"^run_\d+_(\d+)\.parquet$")
+
+# Parquet codec of the typed fragments and compacted files
+COMPRESSION = "zstd"
+
+
+def fragment_name(run_index, part=0):
+    """run_000123.parquet, or run_000123_002.parquet for later parts of a run."""
+    if part:
+        return f"run_{int(run_index):06d}_{int(part):03d}.parquet"
+    return f"run_{int(run_index):06d}.parquet"
+
+
+def fragment_part(path):
+    """Part number of a run fragment named by fragment_name; 0 for other files."""
+    match = FRAGMENT_PART_RE.match(os.path.basename(path))
+    return int(match.group(1)) if match else 0
+
+
+def partition_dir(dataset_dir, partition_cols, values):
+    parts = [f"{col}={val}" for col, val in zip(partition_cols, values)]
+    return os.path.join(dataset_dir, *parts)
+
+
+def write_fragments(df, dataset_dir, partition_cols, file_name, schema=None):
+    """
+    Writes `df` as one file named `file_name` in each partition directory
+    it spans. Partition columns are dropped from the files (they are in the
+    path). With an Arrow `schema`, files are written with exactly those
+    columns and types. All the files are published by one manifest commit.
+    Returns the list of written paths.
+    """
+    if df is None or df.empty:
+        return []
+
+    partition_cols = list(partition_cols)
+    written = []
+
+    for values, part in df.groupby(partition_cols, sort=False):
+        if not isinstance(values, tuple):
+            values = (values,)
+
+        target_dir = partition_dir(dataset_dir, partition_cols, values)
+        os.makedirs(target_dir, exist_ok=True)
+
+        path = os.path.join(target_dir, file_name)
+        part = part.drop(columns=partition_cols)
+        with atomic_path(path) as tmp:
+            if schema is None:
+                part.to_parquet(tmp, index=False)
+            else:
+                table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+                pq.write_table(table, tmp, compression=COMPRESSION)
+        written.append(path)
+
+    manifest.commit(dataset_dir, add=written)
+    return written
+
+
+def append_run(df, dataset_dir, run_index, partition_cols=("currency", "date"),
+               schema=None, part=0):
+    """
+    Writes the rows of one run as new fragments, one per partition.
+    A run written in several batches (streaming ingest) uses one `part`
+    number per batch. Writing the same run/part again replaces its
+    fragments, so a retried run never duplicates rows. Returns the list
+    of written paths.
+    """
+    return write_fragments(
+        df, dataset_dir, partition_cols, fragment_name(run_index, part), schema=schema
+    )
+
+
+def has_partitions(dataset_dir):
+    """True when dataset_dir already holds key=value partition folders."""
+    if not os.path.isdir(dataset_dir):
+        return False
+    return any(PARTITION_DIR_RE.match(name) for name in os.listdir(dataset_dir))
+
+
+def partition_values(rel_path):
+    """{column: value} of the key=value directories of a relative path."""
+    values = {}
+    for segment in rel_path.split("/")[:-1]:
+        match = PARTITION_DIR_RE.match(segment)
+        if match:
+            values[match.group(1)] = match.group(2)
+    return values
+
+
+def list_fragments(dataset_dir, filters=None, version=None, files=None):
+    """
+    Lists (path, partition_values) for every fragment under dataset_dir.
+    filters: {column: value | list of values | (start, end)} applied on the
+    partition values only, so pruned partitions are never opened.
+    files: relative paths the listing is restricted to (e.g. the files
+    added by recent commits, see manifest.changes).
+    Files that are not inside a key=value directory are ignored.
+    With a manifest, the files of `version` (default: the latest) are
+    listed; without one, the directories are walked.
+    """
+    fragments = []
+    if not os.path.isdir(dataset_dir):
+        return fragments
+
+    snapshot = manifest.load_snapshot(dataset_dir, version)
+    if snapshot is not None:
+        for rel, path in zip(snapshot.files, snapshot.paths()):
+            if files is not None and rel not in files:
+                continue
+            values = partition_values(rel)
+            if values and _keep(values, filters):
+                fragments.append((path, values))
+        return fragments
+
+    for root, dirs, names in os.walk(dataset_dir):
+        dirs.sort()
+        rel = os.path.relpath(root, dataset_dir)
+        if rel == ".":
+            continue
+
+        values = {}
+        for segment in rel.split(os.sep):
+            match = PARTITION_DIR_RE.match(segment)
+            if match:
+                values[match.group(1)] = match.group(2)
+
+        if not _keep(values, filters):
+            dirs[:] = []  # prune the whole subtree
+            continue
+        if not values:
+            continue
+
+        for name in sorted(names):
+            if files is not None and f"{rel.replace(os.sep, '/')}/{name}" not in files:
+                continue
+            if name.endswith(".parquet"):
+                fragments.append((os.path.join(root, name), values))
+
+    return fragments
+
+
+def _keep(values, filters):
+    if not filters:
+        return True
+
+    for col, wanted in filters.items():
+        if col not in values or wanted is None:
+            continue
+        value = values[col]
+
+        if isinstance(wanted, tuple):
+            start, end = wanted
+            if start is not None and value < str(start):
+                return False
+            if end is not None and value > str(end):
+                return False
+        elif isinstance(wanted, (list, set)):
+            if value not in {str(w) for w in wanted}:
+                return False
+        elif value != str(wanted):
+            return False
+
+    return True
+
+
+def read_dataset(dataset_dir, filters=None, columns=None, version=None, where=None, files=None):
+    """
+    Reads the fragments that pass `filters` into one DataFrame.
+    `columns` projects the file columns (partition columns are always
+    available and can be requested too, and come back as categoricals).
+    `where` is a pyarrow expression over file columns, evaluated while
+    each fragment is scanned (row groups its statistics rule out are not
+    decoded); its columns need not be among `columns`.
+    `version` pins a manifest version (default: the latest); `files`
+    restricts the read to some fragments (see list_fragments).
+    Rows are returned in ingest order (by run_index).
+    """
+    fragments = list_fragments(dataset_dir, filters, version=version, files=files)
+    if len(fragments) == 0:
+        return pd.DataFrame(columns=columns or [])
+
+    tables = []
+    for path, values in fragments:
+        try:
+            file_cols = None
+            if columns is not None:
+                names = pq.read_schema(path).names
+                file_cols = [c for c in columns if c in names]
+            table = pq.read_table(path, columns=file_cols, filters=where)
+        except FileNotFoundError as e:
+            if version is None:
+                raise
+            raise manifest.SnapshotExpired(f"{dataset_dir}: version {version} was vacuumed") from e
+        for col, value in values.items():
+            if columns is None or col in columns:
+                table = table.append_column(col, _constant_column(value, table.num_rows))
+        tables.append(table)
+
+    df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+
+    if "run_index" in df.columns:
+        df = df.sort_values("run_index", kind="stable").reset_index(drop=True)
+
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+
+    return df
+
+
+def _constant_column(value, num_rows):
+    """Partition value repeated over a fragment, as a one-entry dictionary array."""
+    indices = pa.array(np.zeros(num_rows, dtype=np.int32))
+    return pa.DictionaryArray.from_arrays(indices, pa.array([value], pa.string()))
+
+
+def compact_partitions(dataset_dir, before_date, date_col="date"):
+    """
+    Merges the per-run fragments of closed partitions (date < before_date)
+    into a single file, keeping the number of files per day at one once
+    the day is over. Only partitions with more than one fragment are
+    touched. The merged file gets a new name and replaces the fragments
+    in one manifest commit; the fragments themselves are only deleted by
+    manifest.vacuum() once no pinned reader can still need them.
+    Returns the number of compacted partitions.
+    """
+    by_dir = {}
+    for path, values in list_fragments(dataset_dir, {date_col: (None, str(before_date))}):
+        if date_col in values and values[date_col] < str(before_date):
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    add, remove = [], []
+    for target_dir, paths in by_dir.items():
+        if len(paths) < 2:
+            continue
+
+        tables = [pq.read_table(p) for p in paths]
+        merged = pa.concat_tables(tables, promote_options="permissive")
+
+        path = os.path.join(target_dir, f"compacted_{stamp}.parquet")
+        with atomic_path(path) as tmp:
+            pq.write_table(merged, tmp, compression=COMPRESSION)
+        add.append(path)
+        remove.extend(paths)
+
+    if add:
+        manifest.commit(dataset_dir, add=add, remove=remove)
+    manifest.vacuum(dataset_dir)
+    return len(add)
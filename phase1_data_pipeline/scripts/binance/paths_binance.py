@@ -5,15 +5,42 @@ BINANCE_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPTS_DIR = os.path.dirname(BINANCE_DIR)
 PHASE1_DIR = os.path.dirname(SCRIPTS_DIR)
 
-DATA_DIR = os.path.join(PHASE1_DIR, "data")
+# PHASE1_DATA_DIR redirects all reads and writes (benchmarks, tests)
+DATA_DIR = os.environ.get("PHASE1_DATA_DIR", os.path.join(PHASE1_DIR, "data"))
 
 # Raw and processed folders specific to Binance
 DATA_RAW_BINANCE = os.path.join(DATA_DIR, "raw", "binance")
 DATA_PROCESSED_BINANCE = os.path.join(DATA_DIR, "processed", "binance")
 
-# Processed subfolders
+# Compressed archive of the raw API responses (see common/raw_archive.py)
+RAW_ARCHIVE_BINANCE = os.path.join(DATA_DIR, "raw", "archive", "binance")
+
+# Processed subfolders (compatibility exports, see read_processed.py)
 HISTORICAL_FIAT_DIR = os.path.join(DATA_PROCESSED_BINANCE, "historical_fiat")
 DAILY_SNAP_DIR = os.path.join(DATA_PROCESSED_BINANCE, "daily_snapshots")
 
-# Master file location
-MASTER_PATH = os.path.join(DATA_PROCESSED_BINANCE, "p2p_master.parquet")
\ No newline at end of file
+# Master file location (legacy single file, exported for compatibility)
+MASTER_PATH = os.path.join(DATA_PROCESSED_BINANCE, "p2p_master.parquet")
+
+# Canonical append-only partitioned dataset (see p2p_store.py). Daily and
+# per-currency tables are filtered reads of it.
+MASTER_DATASET_DIR = os.path.join(DATA_PROCESSED_BINANCE, "master")
+MASTER_PARTITIONS = ("asset", "currency", "date")
+
+# Persistent row-key index used for incremental de-duplication
+ROW_KEY_INDEX_DIR = os.path.join(DATA_PROCESSED_BINANCE, "metadata", "row_keys")
+
+# Hourly and merchant rollups of the master dataset maintained at ingest
+# (see rollup.py)
+ROLLUP_DIR = os.path.join(DATA_PROCESSED_BINANCE, "rollup")
+MERCHANT_ROLLUP_DIR = os.path.join(DATA_PROCESSED_BINANCE, "merchant_rollup")
+
+# Local state kept between runs but never committed with the data
+BINANCE_STATE_DIR = os.path.join(DATA_DIR, "state", "binance")
+
+# Run registry (see common/run_registry.py) and the lock serializing writes
+# to the processed data are local state; the run counter, which the
+# registry keeps in sync, is committed so numbering survives a fresh checkout
+RUN_REGISTRY_PATH = os.path.join(BINANCE_STATE_DIR, "runs.sqlite")
+RUN_COUNTER_PATH = os.path.join(DATA_PROCESSED_BINANCE, "metadata", "run_counter.json")
+INGEST_LOCK_PATH = os.path.join(BINANCE_STATE_DIR, "ingest.lock")
@@ -0,0 +1,196 @@
+# read_processed.py
+#
+# Reader API over the canonical master dataset. Daily snapshots and
+# per-fiat history are not stored separately: they are partition-pruned
+# reads of the master dataset returning the logical tables of the former
+# single files (plus scrape_ts, with calendar fields derived on read):
+#   read_master()          -> p2p_master.parquet
+#   read_historical_fiat() -> historical_fiat/<FIAT>.parquet
+#   read_daily_snapshot()  -> daily_snapshots/daily_snapshot_<date>.parquet
+#
+# Every reader takes an optional manifest `version`: a caller that needs
+# several reads to agree pins one with pin_version() and passes it to all
+# of them, so rows written in between are not seen.
+#
+# The readers return every asset unless `assets` is given; the single
+# files of export_legacy_files() hold one asset. available_assets() and
+# available_currencies() list what the data holds from the partition
+# paths alone, and changed_partitions() what the commits after a version
+# touched. available_dates() does the same for the date partitions.
+# read_runs_after() tails the dataset: rows of the runs after a known
+# one, opening only the files committed since a known version.
+
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.compute as pc
+
+from common.atomic_write import write_parquet
+from common.coverage import DEFAULT_ASSET
+from .manifest import changes, commit_ts, current_version
+from .p2p_store import list_fragments, partition_values, read_dataset
+from .schema import PROCESSED_COLUMNS, CALENDAR_COLUMNS, add_calendar_columns, to_legacy_frame
+from .paths_binance import (
+    HISTORICAL_FIAT_DIR,
+    DAILY_SNAP_DIR,
+    MASTER_PATH,
+    MASTER_DATASET_DIR,
+    DATA_PROCESSED_BINANCE,
+)
+
+
+def pin_version():
+    """Latest committed version of the master dataset (None without manifest)."""
+    return current_version(MASTER_DATASET_DIR)
+
+
+def version_ts(version):
+    """Commit time of a manifest version of the master dataset (see manifest.commit_ts)."""
+    return commit_ts(MASTER_DATASET_DIR, version)
+
+
+def _partition_values(column, filters=None, version=None):
+    values = {v[column] for _, v in list_fragments(MASTER_DATASET_DIR, filters, version=version)
+              if column in v}
+    return sorted(values)
+
+
+def available_assets(version=None):
+    """Assets present in the master dataset (no file is opened)."""
+    return _partition_values("asset", version=version)
+
+
+def available_currencies(assets=None, version=None):
+    """Currencies present in the master dataset, for all or the given assets."""
+    return _partition_values("currency", {"asset": assets}, version=version)
+
+
+def available_dates(currencies=None, assets=None, version=None):
+    """Dates ('YYYY-MM-DD') present in the master dataset, for all or the given currencies and assets."""
+    return _partition_values("date", {"asset": assets, "currency": currencies}, version=version)
+
+
+def changed_partitions(since, version=None, assets=None):
+    """
+    (currency, date) partitions written or rewritten by the commits after
+    manifest version `since`, for all or the given assets. Raises
+    manifest.SnapshotExpired when that history was vacuumed.
+    """
+    added, removed = changes(MASTER_DATASET_DIR, since, version)
+    if isinstance(assets, str):
+        assets = [assets]
+    pairs = set()
+    for rel in added | removed:
+        values = partition_values(rel)
+        if assets is None or values.get("asset") in assets:
+            pairs.add((values["currency"], values["date"]))
+    return pairs
+
+
+def read_master(currencies=None, start_date=None, end_date=None, columns=None, version=None,
+                assets=None, where=None, files=None):
+    """
+    Processed Binance rows for all (or the given) currencies and assets,
+    optionally limited to start_date..end_date ('YYYY-MM-DD', inclusive).
+    Only the matching partitions are opened.
+    `where` narrows the rows further with a pyarrow expression over the
+    stored columns (scrape_ts, side, price, merchant_name, ...), applied
+    in the scan (see p2p_store.read_dataset); `files` limits the read to
+    some fragments (relative paths, see read_runs_after).
+    `columns` may include the calendar fields (scrape_datetime, time,
+    year, ...): they are derived from scrape_ts for the selected rows only.
+    asset, currency, side and merchant_name come back as categoricals.
+    """
+    wanted = PROCESSED_COLUMNS if columns is None else list(columns)
+    derived = [c for c in wanted if c in CALENDAR_COLUMNS and c != "date"]
+
+    file_cols = [c for c in wanted if c not in derived]
+    if derived and "scrape_ts" not in file_cols:
+        file_cols.append("scrape_ts")
+
+    filters = {"asset": assets, "currency": currencies, "date": (start_date, end_date)}
+    df = read_dataset(MASTER_DATASET_DIR, filters=filters, columns=file_cols, version=version,
+                      where=where, files=files)
+    if df.empty:
+        return pd.DataFrame(columns=wanted)
+
+    df = add_calendar_columns(df, derived)
+    if "date" in df.columns:
+        df["date"] = df["date"].astype(str)
+
+    return df[[c for c in wanted if c in df.columns]]
+
+
+def read_runs_after(run_index, since=None, version=None, assets=None, columns=None):
+    """
+    Processed rows of the runs after `run_index`, for all or the given
+    assets. With `since`, a manifest version whose rows were already
+    read, only the files committed after it are opened, so the cost
+    follows the new data rather than the history. A run stored in
+    several commits comes back in parts, and files rewritten by
+    compaction bring back rows read before: callers that keep rows
+    across calls drop duplicates. The run_index bound is applied in the
+    scan. Raises manifest.SnapshotExpired when the commits after `since`
+    were vacuumed.
+    """
+    where = pc.field("run_index") > run_index
+    files = None
+    if since is not None:
+        added, removed = changes(MASTER_DATASET_DIR, since, version)
+        files = added - removed
+        if not files:
+            return pd.DataFrame(columns=PROCESSED_COLUMNS if columns is None else list(columns))
+    return read_master(columns=columns, version=version, assets=assets, where=where, files=files)
+
+
+def read_historical_fiat(fiat, columns=None, version=None, assets=None):
+    """All processed rows of one currency (only its partitions are opened)."""
+    return read_master(currencies=fiat, columns=columns, version=version, assets=assets)
+
+
+def read_daily_snapshot(date=None, columns=None, version=None, assets=None):
+    """All processed rows scraped on `date` (default: today, UTC)."""
+    date = str(date or datetime.utcnow().date())
+    return read_master(start_date=date, end_date=date, columns=columns, version=version,
+                       assets=assets)
+
+
+def export_legacy_files(fiats=None, version=None, asset=DEFAULT_ASSET, binance_dir=None):
+    """
+    Compatibility shim for consumers that still open the single files by
+    path (p2p_master.parquet, historical_fiat/<FIAT>.parquet in
+    HISTORICAL_FIAT_DIR and today's daily snapshot in DAILY_SNAP_DIR):
+    materializes them from the master dataset on demand, for one `asset`.
+    binance_dir (default: the processed Binance folder) receives the
+    same layout, e.g. to export another asset next to the default one.
+    All files come from one manifest version (default: the latest) and
+    each replaces the previous one atomically. Returns the exported
+    version.
+    """
+    binance_dir = binance_dir or DATA_PROCESSED_BINANCE
+    master_path = os.path.join(binance_dir, os.path.basename(MASTER_PATH))
+    fiat_dir = os.path.join(binance_dir, os.path.basename(HISTORICAL_FIAT_DIR))
+    snap_dir = os.path.join(binance_dir, os.path.basename(DAILY_SNAP_DIR))
+    os.makedirs(fiat_dir, exist_ok=True)
+    os.makedirs(snap_dir, exist_ok=True)
+
+    version = pin_version() if version is None else version
+    master = to_legacy_frame(read_master(version=version, assets=asset))
+    if master.empty:
+        return version
+
+    write_parquet(master, master_path, index=False)
+
+    for fiat in fiats or sorted(master["currency"].dropna().unique()):
+        df_fiat = master[master["currency"] == fiat]
+        if not df_fiat.empty:
+            write_parquet(df_fiat, os.path.join(fiat_dir, f"{fiat}.parquet"), index=False)
+
+    today = str(datetime.utcnow().date())
+    daily = master[master["date"] == today]
+    if not daily.empty:
+        write_parquet(
+            daily, os.path.join(snap_dir, f"daily_snapshot_{today}.parquet"), index=False
+        )
+    return version
@@ -0,0 +1,180 @@
+# replay.py
+#
+# Offline replay of the raw Binance archive (see common/raw_archive.py):
+# the archived responses of each run go through the same decode, clean
+# and store steps as a live run, without any network access. Row keys
+# make it idempotent: rows already in the master dataset are skipped, so
+# a plain replay only fills runs whose processing was lost, and a replay
+# after a parser or cleaning change needs rebuild=True.
+
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from common.coverage import DEFAULT_ASSET
+from common.raw_archive import list_segments, read_segment
+from .base_scraper import p2p_to_columns
+from .multi_fetch import SIDES, to_frame
+from .clean_standardize import clean_decoded
+from .p2p_store import read_dataset
+from .row_key import drop_duplicate_keys
+from .snapshot_and_master import (
+    migrate_legacy_files,
+    store_processed,
+    compact_closed_days,
+    upgrade_dataset,
+    ingest_lock,
+)
+from .paths_binance import RAW_ARCHIVE_BINANCE, MASTER_DATASET_DIR, ROW_KEY_INDEX_DIR
+
+
+SEGMENT_RUN_RE = re.compile(r"run_(\d+)\.jsonl\.zst$")
+
+# Runs decoded before each store_processed call
+BATCH_RUNS = 50
+
+
+def segment_run_index(path):
+    match = SEGMENT_RUN_RE.search(os.path.basename(path))
+    return int(match.group(1)) if match else None
+
+
+def replay_frame(meta, records, run_index):
+    """
+    Rebuilds the cleaned frame of one run from its archived responses.
+    Pages are put back in the side/page order of the live fetch and, as
+    p2p_fetch_side does, trimmed to the run's stop_rule max_ads. The
+    scrape timestamp is the arrival time recorded with each response.
+    Runs archived before assets were configurable hold one asset, named
+    in meta["asset"] (or implied) rather than in the request tags.
+    """
+    max_ads = (meta.get("stop_rule") or {}).get("max_ads")
+    run_asset = meta.get("asset", DEFAULT_ASSET)
+
+    pages = {}
+    for record in records:
+        tags = record.get("tags") or {}
+        if record.get("status") != 200 or not record.get("body") or not tags:
+            continue
+        try:
+            data = json.loads(record["body"])
+        except ValueError:
+            continue
+        side = tags["side"]
+        columns = p2p_to_columns(data, side, timestamp=record["ts"])
+        pages[(tags.get("asset", run_asset), tags["fiat"], side, tags["page"])] = columns
+
+    assets = meta.get("assets") or sorted({asset for asset, _, _, _ in pages})
+    fiats = meta.get("fiats") or sorted({fiat for _, fiat, _, _ in pages})
+    frames = []
+    for market in [(asset, fiat) for asset in assets for fiat in fiats]:
+        parts = []
+        for side in SIDES:
+            kept = 0
+            for page in sorted(p for a, f, s, p in pages if (a, f) == market and s == side):
+                columns = pages[(*market, side, page)]
+                if max_ads is not None:
+                    room = max(max_ads - kept, 0)
+                    columns = {col: values[:room] for col, values in columns.items()}
+                kept += len(columns["price"])
+                parts.append(columns)
+
+        frame = to_frame(parts, run_index)
+        if not frame.empty:
+            frames.append(clean_decoded(frame))
+
+    if not frames:
+        return pd.DataFrame()
+    return drop_duplicate_keys(pd.concat(frames, ignore_index=True))
+
+
+def _move_aside(path, stamp):
+    if os.path.exists(path):
+        target = f"{path}.before-replay-{stamp}"
+        os.replace(path, target)
+        print(f"[Binance] moved {path} -> {target}")
+
+
+def master_runs():
+    """Run indices present in the master dataset."""
+    runs = read_dataset(MASTER_DATASET_DIR, columns=["run_index"])["run_index"]
+    return {int(run) for run in runs.dropna().unique()}
+
+
+def replay_binance(first_run=None, last_run=None, rebuild=False,
+                   archive_dir=RAW_ARCHIVE_BINANCE, batch_runs=BATCH_RUNS,
+                   allow_history_loss=False):
+    """
+    Replays the archived runs first_run..last_run (all by default) into
+    the master dataset. With rebuild=True the current master dataset and
+    row-key index are first moved aside (renamed, never deleted) and the
+    dataset is rebuilt from the archive alone, so it then only holds the
+    replayed runs. A rebuild that would drop a run of the master dataset
+    with no replayed segment (runs stored before the archive existed,
+    runs whose segment is missing, or runs outside first_run..last_run)
+    raises ValueError unless allow_history_loss=True. Returns {"runs", "responses", "rows",
+    "stored_rows", "seconds"}.
+    """
+    start = time.time()
+    segments = [
+        path for path in list_segments(archive_dir)
+        if segment_run_index(path) is not None
+        and (first_run is None or segment_run_index(path) >= first_run)
+        and (last_run is None or segment_run_index(path) <= last_run)
+    ]
+
+    summary = {"runs": 0, "responses": 0, "rows": 0, "stored_rows": 0}
+    batch = []
+
+    def flush():
+        if batch:
+            summary["stored_rows"] += store_processed(pd.concat(batch, ignore_index=True))
+            batch.clear()
+
+    # Other ingest processes wait until the replay is complete
+    with ingest_lock():
+        if rebuild and not allow_history_loss:
+            lost = sorted(master_runs() - set(map(segment_run_index, segments)))
+            if lost:
+                shown = ", ".join(map(str, lost[:10])) + (", ..." if len(lost) > 10 else "")
+                raise ValueError(
+                    f"Rebuild would drop {len(lost)} master run(s) with no replayed archive "
+                    f"segment ({shown}); pass allow_history_loss=True "
+                    "(--allow-history-loss) to rebuild anyway"
+                )
+        if rebuild:
+            stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+            _move_aside(MASTER_DATASET_DIR, stamp)
+            _move_aside(ROW_KEY_INDEX_DIR, stamp)
+        else:
+            migrate_legacy_files()
+
+        for path in segments:
+            meta, records = read_segment(path)
+            run_index = meta.get("run_index", segment_run_index(path))
+            df = replay_frame(meta, records, run_index)
+
+            summary["runs"] += 1
+            summary["responses"] += len(records)
+            summary["rows"] += len(df)
+            if not df.empty:
+                batch.append(df)
+            if len(batch) >= batch_runs:
+                flush()
+        flush()
+
+        if summary["stored_rows"]:
+            compact_closed_days()
+            if rebuild:
+                upgrade_dataset(MASTER_DATASET_DIR)
+
+    summary["seconds"] = round(time.time() - start, 2)
+    print(
+        f"[Binance] replayed {summary['runs']} run(s), {summary['responses']} responses: "
+        f"{summary['rows']} rows, {summary['stored_rows']} stored in {summary['seconds']}s"
+    )
+    return summary
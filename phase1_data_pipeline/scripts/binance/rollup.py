@@ -0,0 +1,382 @@
+# rollup.py
+#
+# Hourly and merchant rollups of the master dataset, kept up to date at
+# ingest:
+#
+#   rollup/asset=USDT/date=2025-12-07/rollup.parquet
+#   merchant_rollup/asset=USDT/date=2025-12-07/rollup.parquet
+#
+# The hourly files hold one row per (currency, hour, side) of the day with
+# additive components of the ads stored for it: ad count, price sum/min/
+# max, volume (sum of max_amount), the first and last price (at the
+# earliest and latest scrape_ts) and the first and last run_index. Daily
+# prices, spreads, the intraday profile and order imbalance are
+# re-aggregations of these rows, a few thousand per asset and month,
+# instead of scans of the ads.
+#
+# The merchant files hold one row per (currency, merchant_name) of the
+# day: ad count, volume, finish/positive rate sums and counts, and where
+# the merchant's first ad sits in ingest order (run_index, part of the
+# run, position within the run's rows of the day), so that readers can
+# keep merchants in order of first appearance.
+#
+# store_processed() merges the rows of each batch into the files of the
+# days it touched (update_rollup), so the cost follows the batch.
+# _version.json records the master manifest version (and its commit
+# time) both rollups cover. It is removed while files are rewritten; a
+# rollup that does not cover the version a batch was stored on (first
+# run, legacy migration, rebuilt dataset, older rollup layout) is rebuilt
+# from the master dataset instead. read_rollup() and
+# read_merchant_rollup() check the marker before and after reading, so
+# callers only get a rollup of exactly the version they ask.
+
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.atomic_write import atomic_path, write_json
+from . import manifest
+from .p2p_store import COMPRESSION, fragment_part, list_fragments, partition_dir, read_dataset
+from .paths_binance import MASTER_DATASET_DIR, MERCHANT_ROLLUP_DIR, ROLLUP_DIR
+from .schema import widen_rates
+
+
+# Bump when the rollup files change: the next ingest then rebuilds them
+ROLLUP_LAYOUT = 2
+
+
+ROLLUP_PARTITIONS = ("asset", "date")
+ROLLUP_FILE = "rollup.parquet"
+ROLLUP_KEYS = ["asset", "currency", "date", "hour", "side"]
+
+# Stored columns of the day files (the partition columns are in the path)
+ROLLUP_SCHEMA = pa.schema([
+    ("currency", pa.string()),
+    ("hour", pa.int8()),
+    ("side", pa.string()),
+    ("count", pa.int64()),
+    ("price_sum", pa.float64()),
+    ("price_min", pa.float64()),
+    ("price_max", pa.float64()),
+    ("volume", pa.float64()),
+    ("first_ts", pa.timestamp("us", tz="UTC")),
+    ("first_price", pa.float64()),
+    ("last_ts", pa.timestamp("us", tz="UTC")),
+    ("last_price", pa.float64()),
+    ("first_run", pa.int32()),
+    ("last_run", pa.int32()),
+])
+ROLLUP_COLUMNS = ROLLUP_KEYS + [f.name for f in ROLLUP_SCHEMA if f.name not in ROLLUP_KEYS]
+
+# Processed columns the rollup is computed from
+SOURCE_COLUMNS = ["run_index", "scrape_ts", "asset", "currency", "date", "side", "price", "max_amount"]
+
+MERCHANT_KEYS = ["asset", "currency", "date", "merchant_name"]
+MERCHANT_SCHEMA = pa.schema([
+    ("currency", pa.string()),
+    ("merchant_name", pa.string()),
+    ("ads_count", pa.int64()),
+    ("total_volume", pa.float64()),
+    ("finish_sum", pa.float64()),
+    ("finish_count", pa.int64()),
+    ("positive_sum", pa.float64()),
+    ("positive_count", pa.int64()),
+    ("first_run", pa.int32()),
+    ("first_part", pa.int32()),
+    ("first_pos", pa.int64()),
+])
+MERCHANT_COLUMNS = MERCHANT_KEYS + [f.name for f in MERCHANT_SCHEMA if f.name not in MERCHANT_KEYS]
+# Ingest order of a merchant's first ad
+MERCHANT_ORDER = ["first_run", "first_part", "first_pos"]
+
+# Processed columns the merchant rollup is computed from
+MERCHANT_SOURCE_COLUMNS = [
+    "run_index", "asset", "currency", "date", "merchant_name", "max_amount",
+    "finish_rate", "positive_rate",
+]
+
+
+def rollup_rows(df):
+    """Rollup rows (ROLLUP_COLUMNS) of processed rows holding SOURCE_COLUMNS."""
+    rows = df[SOURCE_COLUMNS].copy()
+    for col in ["asset", "currency", "date", "side"]:
+        rows[col] = rows[col].astype(str)
+    rows["hour"] = rows["scrape_ts"].dt.hour.astype("int8")
+    rows = rows.sort_values("scrape_ts", kind="stable")
+
+    rollup = rows.groupby(ROLLUP_KEYS, sort=True).agg(
+        count=("price", "count"),
+        price_sum=("price", "sum"),
+        price_min=("price", "min"),
+        price_max=("price", "max"),
+        volume=("max_amount", "sum"),
+        first_ts=("scrape_ts", "first"),
+        first_price=("price", "first"),
+        last_ts=("scrape_ts", "last"),
+        last_price=("price", "last"),
+        first_run=("run_index", "min"),
+        last_run=("run_index", "max"),
+    )
+    return rollup.reset_index()[ROLLUP_COLUMNS]
+
+
+def merge_rollup(frames):
+    """Combines rollup rows of the same buckets, e.g. stored and new ones."""
+    both = pd.concat(frames, ignore_index=True)
+
+    merged = both.groupby(ROLLUP_KEYS, sort=True).agg(
+        count=("count", "sum"),
+        price_sum=("price_sum", "sum"),
+        price_min=("price_min", "min"),
+        price_max=("price_max", "max"),
+        volume=("volume", "sum"),
+        first_run=("first_run", "min"),
+        last_run=("last_run", "max"),
+    )
+    first = both.sort_values("first_ts", kind="stable").groupby(ROLLUP_KEYS, sort=True)[
+        ["first_ts", "first_price"]
+    ].first()
+    last = both.sort_values("last_ts", kind="stable").groupby(ROLLUP_KEYS, sort=True)[
+        ["last_ts", "last_price"]
+    ].last()
+    return merged.join(first).join(last).reset_index()[ROLLUP_COLUMNS]
+
+
+def merchant_rows(df, part=0):
+    """
+    Merchant rollup rows (MERCHANT_COLUMNS) of processed rows holding
+    MERCHANT_SOURCE_COLUMNS, in ingest order, stored as part `part` of
+    their runs.
+    """
+    rows = df[MERCHANT_SOURCE_COLUMNS].copy()
+    for col in ["asset", "currency", "date", "merchant_name"]:
+        rows[col] = rows[col].astype(str)
+    rows["finish_rate"] = widen_rates(df["finish_rate"])
+    rows["positive_rate"] = widen_rates(df["positive_rate"])
+    rows["first_part"] = part
+    rows["first_pos"] = rows.groupby(["run_index", "asset", "currency", "date"], sort=False).cumcount()
+    rows = rows.sort_values("run_index", kind="stable")
+
+    rollup = rows.groupby(MERCHANT_KEYS, sort=True).agg(
+        ads_count=("run_index", "size"),
+        total_volume=("max_amount", "sum"),
+        finish_sum=("finish_rate", "sum"),
+        finish_count=("finish_rate", "count"),
+        positive_sum=("positive_rate", "sum"),
+        positive_count=("positive_rate", "count"),
+        first_run=("run_index", "first"),
+        first_part=("first_part", "first"),
+        first_pos=("first_pos", "first"),
+    )
+    return rollup.reset_index()[MERCHANT_COLUMNS]
+
+
+def merge_merchants(frames):
+    """Combines merchant rollup rows of the same merchants and days."""
+    both = pd.concat(frames, ignore_index=True)
+
+    merged = both.groupby(MERCHANT_KEYS, sort=True).agg(
+        ads_count=("ads_count", "sum"),
+        total_volume=("total_volume", "sum"),
+        finish_sum=("finish_sum", "sum"),
+        finish_count=("finish_count", "sum"),
+        positive_sum=("positive_sum", "sum"),
+        positive_count=("positive_count", "sum"),
+    )
+    first = both.sort_values(MERCHANT_ORDER, kind="stable").groupby(MERCHANT_KEYS, sort=True)[
+        MERCHANT_ORDER
+    ].first()
+    return merged.join(first).reset_index()[MERCHANT_COLUMNS]
+
+
+def _day_path(root, asset, date):
+    return os.path.join(partition_dir(root, ROLLUP_PARTITIONS, (asset, date)), ROLLUP_FILE)
+
+
+def _read_day(root, columns, asset, date):
+    path = _day_path(root, asset, date)
+    if not os.path.exists(path):
+        return None
+    df = pq.read_table(path).to_pandas()
+    df["asset"] = asset
+    df["date"] = date
+    return df[columns]
+
+
+def _write_day(root, schema, rows, asset, date):
+    table = pa.Table.from_pandas(
+        rows.drop(columns=list(ROLLUP_PARTITIONS)), schema=schema, preserve_index=False
+    )
+    with atomic_path(_day_path(root, asset, date)) as tmp:
+        pq.write_table(table, tmp, compression=COMPRESSION)
+
+
+def _merchant_day(asset, date, version):
+    """
+    Merchant rollup rows of one master day, one fragment at a time: the
+    part of a run fragment is in its name (compacted files hold whole
+    runs, in part order).
+    """
+    frames = []
+    files = list_fragments(MASTER_DATASET_DIR, filters={"asset": asset, "date": date}, version=version)
+    for path, values in files:
+        names = pq.read_schema(path).names
+        rows = pq.read_table(path, columns=[c for c in MERCHANT_SOURCE_COLUMNS if c in names])
+        rows = rows.to_pandas().assign(**{col: values[col] for col in ("asset", "currency", "date")})
+        if not rows.empty:
+            frames.append(merchant_rows(rows, part=fragment_part(path)))
+    return merge_merchants(frames) if frames else None
+
+
+def _marker_path():
+    return os.path.join(ROLLUP_DIR, "_version.json")
+
+
+def _set_version(version):
+    """Records the master version the rollup covers; None while it is rewritten."""
+    path = _marker_path()
+    if version is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    write_json(
+        {
+            "master_version": version,
+            "master_ts": manifest.commit_ts(MASTER_DATASET_DIR, version),
+            "layout": ROLLUP_LAYOUT,
+        },
+        path,
+    )
+
+
+def rollup_version():
+    """
+    Master manifest version the rollups cover, or None: no rollup yet,
+    one being rewritten, one of an older layout, or one built from a
+    dataset rebuilt since.
+    """
+    try:
+        with open(_marker_path(), "r", encoding="utf-8") as f:
+            marker = json.load(f)
+        if marker.get("layout") != ROLLUP_LAYOUT:
+            return None
+        if manifest.commit_ts(MASTER_DATASET_DIR, marker["master_version"]) != marker["master_ts"]:
+            return None
+    except (FileNotFoundError, manifest.SnapshotExpired):
+        return None
+    return marker["master_version"]
+
+
+def rebuild_rollup(version=None):
+    """
+    Rebuilds both rollups from the master dataset at `version` (default:
+    the latest), reading one (asset, date) partition at a time; days no
+    longer in the dataset are dropped. Returns the number of days.
+    """
+    version = manifest.current_version(MASTER_DATASET_DIR) if version is None else version
+    _set_version(None)
+
+    days = sorted({
+        (values["asset"], values["date"])
+        for _, values in list_fragments(MASTER_DATASET_DIR, version=version)
+        if "asset" in values and "date" in values
+    })
+    for asset, date in days:
+        rows = read_dataset(MASTER_DATASET_DIR, filters={"asset": asset, "date": date},
+                            columns=SOURCE_COLUMNS, version=version)
+        if not rows.empty:
+            _write_day(ROLLUP_DIR, ROLLUP_SCHEMA, rollup_rows(rows), asset, date)
+        merchants = _merchant_day(asset, date, version)
+        if merchants is not None:
+            _write_day(MERCHANT_ROLLUP_DIR, MERCHANT_SCHEMA, merchants, asset, date)
+
+    kept = set(days)
+    for root in (ROLLUP_DIR, MERCHANT_ROLLUP_DIR):
+        for path, values in list_fragments(root):
+            if (values.get("asset"), values.get("date")) not in kept:
+                os.remove(path)
+
+    if version is not None:
+        _set_version(version)
+    return len(days)
+
+
+def update_rollup(df, before, after, part=0):
+    """
+    Merges the processed rows `df`, stored as part `part` of their runs by
+    the master commits after version `before` up to `after`, into the day
+    files they touch. Rollups that do not cover `before` are rebuilt at
+    `after` instead. Runs under the ingest lock. Returns the number of
+    rewritten days.
+    """
+    if before is None or rollup_version() != before:
+        return rebuild_rollup(after)
+
+    _set_version(None)
+    views = (
+        (ROLLUP_DIR, ROLLUP_SCHEMA, ROLLUP_COLUMNS, rollup_rows(df), merge_rollup),
+        (MERCHANT_ROLLUP_DIR, MERCHANT_SCHEMA, MERCHANT_COLUMNS, merchant_rows(df, part),
+         merge_merchants),
+    )
+    days = set()
+    for root, schema, columns, delta, merge in views:
+        for (asset, date), rows in delta.groupby(list(ROLLUP_PARTITIONS), sort=False):
+            stored = _read_day(root, columns, asset, date)
+            _write_day(root, schema, rows if stored is None else merge([stored, rows]), asset, date)
+            days.add((asset, date))
+
+    _set_version(after)
+    return len(days)
+
+
+def carry_rollup_version(before):
+    """
+    After master commits that rewrote files without changing rows
+    (compaction), moves the marker of a rollup covering `before` to the
+    latest version.
+    """
+    if before is not None and rollup_version() == before:
+        _set_version(manifest.current_version(MASTER_DATASET_DIR))
+
+
+def read_rollup(assets=None, currencies=None, start_date=None, end_date=None, version=None):
+    """
+    Rollup rows (ROLLUP_COLUMNS) of all or the given assets and currencies,
+    optionally limited to start_date..end_date ('YYYY-MM-DD', inclusive),
+    or None when the rollup does not cover master `version` (default: the
+    latest): callers then aggregate the master dataset themselves.
+    """
+    return _read_view(ROLLUP_DIR, ROLLUP_COLUMNS, assets, currencies, start_date, end_date, version)
+
+
+def read_merchant_rollup(assets=None, currencies=None, start_date=None, end_date=None,
+                         version=None):
+    """Merchant rollup rows (MERCHANT_COLUMNS), selected as in read_rollup."""
+    return _read_view(MERCHANT_ROLLUP_DIR, MERCHANT_COLUMNS, assets, currencies, start_date,
+                      end_date, version)
+
+
+def _read_view(root, columns, assets, currencies, start_date, end_date, version):
+    version = manifest.current_version(MASTER_DATASET_DIR) if version is None else version
+    if version is None or rollup_version() != version:
+        return None
+
+    if isinstance(currencies, str):
+        currencies = [currencies]
+    where = None if currencies is None else pc.field("currency").isin(list(currencies))
+    filters = {"asset": assets, "date": (start_date, end_date)}
+    try:
+        df = read_dataset(root, filters=filters, columns=columns, where=where)
+    except FileNotFoundError:
+        return None
+
+    # Rewritten while it was read
+    if rollup_version() != version:
+        return None
+    for col in ROLLUP_PARTITIONS:
+        df[col] = df[col].astype(str)
+    return df[columns]
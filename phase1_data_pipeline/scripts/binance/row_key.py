@@ -0,0 +1,139 @@
+# row_key.py
+#
+# Stable per-ad row keys and a persistent key index used to de-duplicate
+# incoming rows at ingest without re-hashing the archive.
+#
+# The index keeps one sorted uint64 .npy file per (asset, currency, date)
+# partition under metadata/row_keys/, so an ingest only loads the keys of
+# the partitions its batch touches.
+
+import hashlib
+import os
+
+import numpy as np
+
+from common.coverage import DEFAULT_ASSET
+from .p2p_store import read_dataset
+from .paths_binance import ROW_KEY_INDEX_DIR, MASTER_DATASET_DIR
+
+
+KEY_COLUMNS = [
+    "run_index", "asset", "side", "currency", "merchant_name",
+    "price", "min_amount", "max_amount",
+]
+
+
+def _num(value):
+    try:
+        return repr(float(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def compute_row_keys(df):
+    """
+    64-bit blake2b key of (run_index, side, currency, merchant, price,
+    min/max limits) per row, plus the asset for assets other than
+    DEFAULT_ASSET (whose keys stay those of the single-asset layout).
+    Numbers are hashed as floats so that legacy int amounts and float
+    amounts give the same key. Uses `fiat` when the frame has no
+    `currency` column yet.
+    """
+    currency = df["currency"] if "currency" in df.columns else df["fiat"]
+    asset = df["asset"] if "asset" in df.columns else [DEFAULT_ASSET] * len(df)
+    rows = zip(
+        df["run_index"], df["side"], currency, df["merchant_name"],
+        df["price"], df["min_amount"], df["max_amount"], asset,
+    )
+
+    keys = np.empty(len(df), dtype=np.uint64)
+    for i, (run, side, cur, merchant, price, low, high, ast) in enumerate(rows):
+        fields = [
+            str(int(run)), str(side), str(cur), str(merchant),
+            _num(price), _num(low), _num(high),
+        ]
+        if ast != DEFAULT_ASSET:
+            fields.append(str(ast))
+        text = "|".join(fields)
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+        keys[i] = int.from_bytes(digest, "little")
+
+    return keys
+
+
+def add_row_key(df):
+    """Adds the `row_key` column in place and returns the frame."""
+    if not df.empty:
+        df["row_key"] = compute_row_keys(df)
+    return df
+
+
+def drop_duplicate_keys(df):
+    """De-duplicates on row_key when present, on all columns otherwise."""
+    if "row_key" in df.columns:
+        return df.drop_duplicates(subset=["row_key"])
+    return df.drop_duplicates()
+
+
+def _index_path(asset, currency, date):
+    return os.path.join(
+        ROW_KEY_INDEX_DIR, f"asset={asset}", f"currency={currency}", f"date={date}.npy"
+    )
+
+
+def load_keys(asset, currency, date):
+    """
+    Sorted keys already stored for one partition. A partition without an
+    index file (e.g. migrated history) is indexed once from its rows.
+    """
+    path = _index_path(asset, currency, date)
+    if os.path.exists(path):
+        return np.load(path)
+
+    stored = read_dataset(
+        MASTER_DATASET_DIR,
+        filters={"asset": asset, "currency": currency, "date": date},
+        columns=KEY_COLUMNS,
+    )
+    if stored.empty:
+        return np.empty(0, dtype=np.uint64)
+
+    return np.unique(compute_row_keys(stored))
+
+
+def filter_new_rows(df):
+    """
+    Keeps only the rows whose row_key is neither repeated in the batch
+    nor already in the index. Cost depends on the batch and the touched
+    partitions only, not on the archive size.
+    """
+    if df.empty:
+        return df
+
+    if "row_key" not in df.columns:
+        df = add_row_key(df.copy())
+
+    df = df.drop_duplicates(subset=["row_key"])
+
+    keys = df["row_key"].to_numpy(np.uint64)
+    keep = np.ones(len(df), dtype=bool)
+    partitions = df.groupby(["asset", "currency", "date"], sort=False, observed=True)
+    for (asset, currency, date), idx in partitions.indices.items():
+        existing = load_keys(asset, currency, date)
+        if existing.size:
+            keep[idx] = ~np.isin(keys[idx], existing, assume_unique=True)
+
+    return df[keep]
+
+
+def record_keys(df):
+    """Adds the keys of freshly written rows to their partition index files."""
+    for (asset, currency, date), part in df.groupby(["asset", "currency", "date"], sort=False, observed=True):
+        merged = np.union1d(load_keys(asset, currency, date), part["row_key"].to_numpy(np.uint64))
+
+        path = _index_path(asset, currency, date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, merged)
+        os.replace(tmp_path, path)
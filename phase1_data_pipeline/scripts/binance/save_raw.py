@@ -4,21 +4,80 @@ import os
 from datetime import datetime
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
+from common import metrics
+from common.atomic_write import write_parquet
+from .base_scraper import P2P_COLUMNS, FLOAT_COLUMNS
 from .paths_binance import DATA_RAW_BINANCE
 
 
+RAW_SCHEMA = pa.schema([
+    (col, pa.float64() if col in FLOAT_COLUMNS else pa.string())
+    for col in P2P_COLUMNS
+])
+
+
+def raw_path(run_index):
+    ts = datetime.utcnow().replace(microsecond=0).isoformat().replace(":", "-")
+    filename = f"run_{run_index:04d}_{ts}Z_raw.parquet"
+    return os.path.join(DATA_RAW_BINANCE, filename)
+
+
 def save_raw(df_raw, run_index):
-    """Save raw Binance P2P data into data/raw/binance/"""
+    """Save raw Binance P2P data into data/raw/binance/ and return the file path."""
 
     if df_raw is None or df_raw.empty:
         print("Binance RAW not saved: empty DataFrame.")
-        return
+        return None
 
     os.makedirs(DATA_RAW_BINANCE, exist_ok=True)
 
-    ts = datetime.utcnow().replace(microsecond=0).isoformat().replace(":", "-")
-    filename = f"run_{run_index:04d}_{ts}Z_raw.parquet"
-    path = os.path.join(DATA_RAW_BINANCE, filename)
+    path = raw_path(run_index)
+    write_parquet(df_raw, path, index=False)
+    _count_written(len(df_raw), path)
+    return path
+
+
+def _count_written(rows, path):
+    metrics.inc("rows_written_total", rows, source="binance", dataset="raw")
+    metrics.inc("bytes_written_total", os.path.getsize(path), source="binance", dataset="raw")
+
+
+class RawRunWriter:
+    """
+    Incremental counterpart of save_raw for the streaming ingest: each
+    write() appends one row group to the run's raw file, so the whole
+    run never has to be held in memory. The file is only created by the
+    first non-empty batch, as "<path>.part", and renamed to its final
+    path by close().
+    """
+
+    def __init__(self, run_index):
+        self.run_index = run_index
+        self.path = None
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df_raw):
+        if df_raw is None or df_raw.empty:
+            return
+
+        if self._writer is None:
+            os.makedirs(DATA_RAW_BINANCE, exist_ok=True)
+            self.path = raw_path(self.run_index)
+            self._writer = pq.ParquetWriter(self.path + ".part", RAW_SCHEMA)
+
+        table = pa.Table.from_pandas(df_raw, schema=RAW_SCHEMA, preserve_index=False)
+        self._writer.write_table(table)
+        self.rows += len(df_raw)
 
-    df_raw.to_parquet(path, index=False)
\ No newline at end of file
+    def close(self):
+        if self._writer is None:
+            print("Binance RAW not saved: empty DataFrame.")
+            return
+        self._writer.close()
+        self._writer = None
+        os.replace(self.path + ".part", self.path)
+        _count_written(self.rows, self.path)
\ No newline at end of file
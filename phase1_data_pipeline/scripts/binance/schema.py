@@ -0,0 +1,154 @@
+# schema.py
+#
+# Declared Arrow schema of the processed Binance fragments.
+#
+# Files store a real UTC timestamp (scrape_ts) instead of formatted
+# calendar strings, dictionary-encoded categoricals and float32 rates.
+# `asset`, `currency` and `date` are partition columns and live in the
+# paths; row keys are kept in the row-key index only (see row_key.py).
+# The calendar fields of the former tables (scrape_datetime, time, year,
+# month, day, year_month) are derived on read from the unique timestamps.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from common.coverage import DEFAULT_ASSET
+
+
+# 2: declared FILE_SCHEMA; 3: asset partition level
+SCHEMA_VERSION = 3
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+FILE_SCHEMA = pa.schema([
+    ("run_index", pa.int32()),
+    ("scrape_ts", pa.timestamp("us", tz="UTC")),
+    ("side", CATEGORY),
+    ("price", pa.float64()),
+    ("min_amount", pa.float64()),
+    ("max_amount", pa.float64()),
+    ("merchant_name", CATEGORY),
+    ("finish_rate", pa.float32()),
+    ("positive_rate", pa.float32()),
+])
+
+# Derived calendar columns: strftime format, or a datetime accessor name
+CALENDAR_COLUMNS = {
+    "scrape_datetime": "%Y-%m-%d %H:%M",
+    "date": "%Y-%m-%d",
+    "time": "%H:%M",
+    "year": "year",
+    "month": "month",
+    "day": "day",
+    "year_month": "%Y-%m",
+}
+
+CATEGORICAL_COLUMNS = ["asset", "currency", "side", "merchant_name"]
+
+# Logical column order of the processed table, as returned by the readers
+PROCESSED_COLUMNS = [
+    "run_index",
+    "scrape_ts",
+    "scrape_datetime",
+    "date",
+    "time",
+    "year",
+    "month",
+    "day",
+    "year_month",
+    "asset",
+    "currency",
+    "side",
+    "price",
+    "min_amount",
+    "max_amount",
+    "merchant_name",
+    "finish_rate",
+    "positive_rate",
+]
+
+
+def add_calendar_columns(df, names=None, ts_col="scrape_ts"):
+    """
+    Adds the requested calendar columns (default: all of CALENDAR_COLUMNS)
+    derived from `ts_col`. Each distinct timestamp is formatted once and
+    the results are broadcast back to the rows.
+    """
+    names = list(CALENDAR_COLUMNS) if names is None else list(names)
+    if not names:
+        return df
+
+    codes, uniques = pd.factorize(df[ts_col])
+    uniques = pd.DatetimeIndex(uniques)
+
+    for name in names:
+        fmt = CALENDAR_COLUMNS[name]
+        if fmt.startswith("%"):
+            values = uniques.strftime(fmt)
+        else:
+            values = pd.Index(getattr(uniques, fmt), dtype="int32")
+        # Rows of missing timestamps (code -1) are left as NA
+        df[name] = values.array.take(codes, allow_fill=bool((codes < 0).any()))
+
+    return df
+
+
+def to_scrape_ts(values):
+    """Parses timestamps (ISO strings or datetimes) to UTC, once per distinct value."""
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(pd.Index(uniques), errors="coerce", utc=True).as_unit("us")
+    return parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+
+
+def widen_rates(values):
+    """
+    float64 Series of stored float32 rates. The shortest float32 repr
+    gives back the float64 value that was scraped (0.995, not
+    0.99500000476...), computed once per distinct value.
+    """
+    codes, uniques = pd.factorize(values)
+    # numpy formats float32 with its own shortest repr (pandas 3 widens first)
+    widened = np.asarray(uniques, dtype="float32").astype(str).astype("float64")
+    return pd.Series(widened.take(codes), index=values.index).where(codes >= 0)
+
+
+def from_legacy(df):
+    """
+    Converts a frame with the former processed columns (scrape_datetime
+    and the other calendar strings) to the stored columns. scrape_ts is
+    rebuilt from scrape_datetime, which holds minute-resolution UTC time.
+    Legacy rows are all DEFAULT_ASSET rows.
+    """
+    df = df.copy()
+    df["scrape_ts"] = to_scrape_ts(df["scrape_datetime"])
+    if "asset" not in df.columns:
+        df["asset"] = DEFAULT_ASSET
+    calendar = [c for c in CALENDAR_COLUMNS if c != "date"]
+    return df.drop(columns=calendar, errors="ignore")
+
+
+def to_legacy_frame(df):
+    """
+    Former processed table layout (plain strings and int64 amounts where
+    the single files had them, no asset column: they hold one asset), for
+    the compatibility exports.
+    """
+    df = df.drop(columns=["scrape_ts", "row_key", "asset"], errors="ignore").copy()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+
+    for col in ["min_amount", "max_amount"]:
+        if col in df.columns and df[col].notna().all() and (df[col] % 1 == 0).all():
+            df[col] = df[col].astype("int64")
+
+    for col in ["finish_rate", "positive_rate"]:
+        if col in df.columns:
+            df[col] = widen_rates(df[col])
+
+    if "run_index" in df.columns:
+        df["run_index"] = df["run_index"].astype("int64")
+
+    return df
@@ -1,109 +1,287 @@
 # snapshot_and_master.py
 
+import glob
+import json
 import os
 from datetime import datetime
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
+from common import metrics
+from common.atomic_write import write_json
+from common.coverage import DEFAULT_ASSET
+from common.run_registry import advisory_lock
+from . import manifest
+from .p2p_store import (
+    append_run,
+    write_fragments,
+    compact_partitions,
+    has_partitions,
+    list_fragments,
+    COMPRESSION,
+)
+from .rollup import carry_rollup_version, update_rollup
+from .row_key import filter_new_rows, record_keys
+from .schema import (
+    FILE_SCHEMA,
+    PROCESSED_COLUMNS,
+    SCHEMA_VERSION,
+    add_calendar_columns,
+    from_legacy,
+    to_scrape_ts,
+)
 from .paths_binance import (
     DATA_PROCESSED_BINANCE,
     HISTORICAL_FIAT_DIR,
-    DAILY_SNAP_DIR,
     MASTER_PATH,
+    MASTER_DATASET_DIR,
+    MASTER_PARTITIONS,
+    ROW_KEY_INDEX_DIR,
+    INGEST_LOCK_PATH,
 )
 
 
-def add_time_columns(df):
-    if "timestamp_scraped" not in df.columns:
-        raise ValueError("timestamp_scraped is missing in the DataFrame")
+def ingest_lock():
+    """
+    Advisory lock held while the master dataset and its row-key index are
+    modified, so several ingest processes can share one data directory.
+    Re-entrant: the functions below take it themselves and may be nested.
+    """
+    return advisory_lock(INGEST_LOCK_PATH)
+
 
-    ts = pd.to_datetime(df["timestamp_scraped"], errors="coerce")
-
-    df["scrape_datetime"] = ts.dt.strftime("%Y-%m-%d %H:%M")
-    df["date"] = ts.dt.strftime("%Y-%m-%d")
-    df["time"] = ts.dt.strftime("%H:%M")
-    df["year"] = ts.dt.year
-    df["month"] = ts.dt.month
-    df["day"] = ts.dt.day
-    df["year_month"] = ts.dt.strftime("%Y-%m")
-
-    return df
-
-
-def enforce_column_order(df):
-    final_cols = [
-        "run_index",
-        "scrape_datetime",
-        "date",
-        "time",
-        "year",
-        "month",
-        "day",
-        "year_month",
-        "currency",
-        "side",
-        "price",
-        "min_amount",
-        "max_amount",
-        "merchant_name",
-        "finish_rate",
-        "positive_rate",
-    ]
+def enforce_column_order(df, keep_row_key=False):
+    final_cols = list(PROCESSED_COLUMNS)
+    if keep_row_key:
+        final_cols.append("row_key")
 
     existing = [c for c in final_cols if c in df.columns]
     return df[existing]
 
 
-def update_processed_data(p2p_all, tmp_by_fiat):
+def prepare_processed(df):
+    """
+    Builds the stored columns of the processed rows: a UTC scrape_ts
+    parsed once per distinct timestamp, the `date` partition value derived
+    from it, currency and asset (DEFAULT_ASSET when the rows have none).
+    The other calendar fields are not materialized (the readers derive
+    them, see schema.add_calendar_columns).
+    """
+    if "timestamp_scraped" not in df.columns:
+        raise ValueError("timestamp_scraped is missing in the DataFrame")
+
+    df = df.copy()
+    df["scrape_ts"] = to_scrape_ts(df["timestamp_scraped"])
+    df = add_calendar_columns(df, ["date"])
+
+    if "fiat" in df.columns:
+        df["currency"] = df["fiat"]
+    if "asset" not in df.columns:
+        df["asset"] = DEFAULT_ASSET
+
+    return enforce_column_order(df, keep_row_key=True)
+
+
+def update_processed_data(p2p_all, stats=None):
+    """
+    Appends the rows of this run to the canonical master dataset, the only
+    processed table written by the pipeline. Daily snapshots and per-fiat
+    history are filtered reads of it (see read_processed.py).
+    Incoming rows are de-duplicated against the persistent row-key index
+    (see row_key.py), so the cost scales with the batch, not the archive;
+    the same batch updates the hourly and merchant rollups (see rollup.py).
+    Fragments of days that are over are compacted into one file per day.
+    stats: see store_processed.
+    """
     os.makedirs(DATA_PROCESSED_BINANCE, exist_ok=True)
-    os.makedirs(HISTORICAL_FIAT_DIR, exist_ok=True)
-    os.makedirs(DAILY_SNAP_DIR, exist_ok=True)
 
-    p2p_all = p2p_all.copy()
-    p2p_all = add_time_columns(p2p_all)
+    with ingest_lock():
+        migrate_legacy_files()
 
-    if "fiat" in p2p_all.columns:
-        p2p_all["currency"] = p2p_all["fiat"]
+        if store_processed(p2p_all, stats=stats) == 0:
+            print("[Binance] no new rows to store")
+            return
 
-    p2p_all = enforce_column_order(p2p_all)
+        compact_closed_days()
 
-    today = datetime.utcnow().date()
-    daily_path = os.path.join(DAILY_SNAP_DIR, f"daily_snapshot_{today}.parquet")
 
-    if os.path.exists(daily_path):
-        old = pd.read_parquet(daily_path)
-        daily = pd.concat([old, p2p_all], ignore_index=True).drop_duplicates()
-    else:
-        daily = p2p_all.copy()
+def store_processed(df, part=0, stats=None):
+    """
+    Prepares one batch of cleaned rows, drops the rows already stored and
+    appends the rest to the master dataset as fragments `part` of their
+    run, then merges them into the rollups (see rollup.py). Returns the
+    number of rows written; `stats`, when given, is a dict whose "rows"
+    and "bytes" counters are increased accordingly.
+    """
+    df = prepare_processed(df)
+
+    with ingest_lock():
+        df = filter_new_rows(df)
+        if df.empty:
+            return 0
+
+        if not has_partitions(MASTER_DATASET_DIR):
+            # A new dataset is written in the current layout: recording it
+            # spares the next run an upgrade_dataset() scan of every fragment
+            _write_schema_version(MASTER_DATASET_DIR)
+
+        before = manifest.current_version(MASTER_DATASET_DIR)
+        written = []
+        for run_index, rows in df.groupby("run_index", sort=False):
+            written += append_run(
+                rows, MASTER_DATASET_DIR, run_index, MASTER_PARTITIONS,
+                schema=FILE_SCHEMA, part=part,
+            )
+
+        record_keys(df)
+        update_rollup(df, before, manifest.current_version(MASTER_DATASET_DIR), part=part)
+
+    written_bytes = sum(os.path.getsize(p) for p in written)
+    metrics.inc("rows_written_total", len(df), source="binance", dataset="master")
+    metrics.inc("bytes_written_total", written_bytes, source="binance", dataset="master")
+    if stats is not None:
+        stats["rows"] = stats.get("rows", 0) + len(df)
+        stats["bytes"] = stats.get("bytes", 0) + written_bytes
+    return len(df)
+
 
-    daily.to_parquet(daily_path, index=False)
+def compact_closed_days():
+    """Merges the fragments of the days before today (UTC), one file per day."""
+    with ingest_lock():
+        before = manifest.current_version(MASTER_DATASET_DIR)
+        compacted = compact_partitions(MASTER_DATASET_DIR, before_date=str(datetime.utcnow().date()))
+        # Same rows, other files: the rollup still covers the dataset
+        carry_rollup_version(before)
+        return compacted
+
+
+def migrate_legacy_files():
+    """
+    One-off conversion of the legacy single master file (or, without it,
+    the historical_fiat/<FIAT>.parquet files, which hold the same rows)
+    into the master dataset, and upgrade of fragments and row-key index
+    files written before the current layout (see upgrade_dataset). Does
+    nothing once done.
+    """
+    with ingest_lock():
+        _migrate_legacy_files()
+
+
+def _migrate_legacy_files():
+    _partition_row_keys_by_asset()
+
+    if has_partitions(MASTER_DATASET_DIR):
+        upgrade_dataset(MASTER_DATASET_DIR)
+        return
 
     if os.path.exists(MASTER_PATH):
-        old = pd.read_parquet(MASTER_PATH)
-        master = pd.concat([old, p2p_all], ignore_index=True).drop_duplicates()
+        sources = [MASTER_PATH]
     else:
-        master = p2p_all.copy()
+        sources = sorted(glob.glob(os.path.join(HISTORICAL_FIAT_DIR, "*.parquet")))
 
-    master.to_parquet(MASTER_PATH, index=False)
+    for path in sources:
+        write_fragments(
+            from_legacy(pd.read_parquet(path)), MASTER_DATASET_DIR, MASTER_PARTITIONS,
+            "compacted.parquet", schema=FILE_SCHEMA,
+        )
+    if sources:
+        _write_schema_version(MASTER_DATASET_DIR)
+        print(f"[Binance] migrated {len(sources)} legacy file(s) into the master dataset")
+
+
+def _schema_version_path(dataset_dir):
+    return os.path.join(dataset_dir, "_schema.json")
+
+
+def dataset_schema_version(dataset_dir):
+    """Schema version of a dataset; 1 for fragments written before schema.py."""
+    path = _schema_version_path(dataset_dir)
+    if not os.path.exists(path):
+        return 1
+    with open(path, "r") as f:
+        return json.load(f)["version"]
 
-    for fiat, df_local in tmp_by_fiat.items():
-        if df_local is None or df_local.empty:
-            continue
 
-        df_local = df_local.copy()
-        df_local = add_time_columns(df_local)
+def _write_schema_version(dataset_dir):
+    write_json({"version": SCHEMA_VERSION}, _schema_version_path(dataset_dir))
 
-        if "fiat" in df_local.columns:
-            df_local["currency"] = df_local["fiat"]
 
-        df_local = enforce_column_order(df_local)
+def upgrade_fragment(path):
+    """
+    Rewrites one fragment with the declared FILE_SCHEMA (fragments of the
+    former layout get scrape_ts from scrape_datetime). Returns False when
+    the file was already up to date.
+    """
+    table = pq.read_table(path)
+    if table.schema.equals(FILE_SCHEMA):
+        return False
+
+    df = table.to_pandas()
+    if "scrape_ts" not in df.columns:
+        df = from_legacy(df)
+
+    tmp_path = path + ".tmp"
+    table = pa.Table.from_pandas(df, schema=FILE_SCHEMA, preserve_index=False)
+    pq.write_table(table, tmp_path, compression=COMPRESSION)
+    os.replace(tmp_path, path)
+    return True
+
+
+def upgrade_dataset(dataset_dir):
+    """
+    Upgrades a dataset older than SCHEMA_VERSION: fragments written before
+    the declared schema are rewritten (v2) and fragments of the
+    single-asset layout are moved under the asset partition (v3). Then
+    records the version. Returns the number of upgraded fragments.
+    """
+    version = dataset_schema_version(dataset_dir)
+    if version >= SCHEMA_VERSION:
+        return 0
+
+    upgraded = 0
+    if version < 2:
+        upgraded += sum(upgrade_fragment(path) for path, _ in list_fragments(dataset_dir))
+    upgraded += partition_by_asset(dataset_dir)
+
+    _write_schema_version(dataset_dir)
+    print(f"[Binance] upgraded {upgraded} fragment(s) to schema v{SCHEMA_VERSION}")
+    return upgraded
+
+
+def partition_by_asset(dataset_dir, asset=DEFAULT_ASSET):
+    """
+    Moves the fragments that have no asset partition (currency=/date=/...)
+    to asset=<asset>/currency=/date=/... : each file is hard-linked under
+    its new path (no data is copied) and all of them are swapped in one
+    manifest commit, so readers never see the dataset half moved. The old
+    paths are deleted by manifest.vacuum(). Returns the number of moved
+    fragments.
+    """
+    add, remove = [], []
+    for path, values in list_fragments(dataset_dir):
+        if "asset" in values:
+            continue
+        rel = manifest.relative_path(dataset_dir, path)
+        target = os.path.join(dataset_dir, f"asset={asset}", *rel.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if not os.path.exists(target):
+            os.link(path, target)
+        add.append(target)
+        remove.append(path)
 
-        fiat_path = os.path.join(HISTORICAL_FIAT_DIR, f"{fiat}.parquet")
+    if add:
+        manifest.commit(dataset_dir, add=add, remove=remove)
+    return len(add)
 
-        if os.path.exists(fiat_path):
-            old = pd.read_parquet(fiat_path)
-            new = pd.concat([old, df_local], ignore_index=True).drop_duplicates()
-        else:
-            new = df_local.copy()
 
-        new.to_parquet(fiat_path, index=False)
+def _partition_row_keys_by_asset(asset=DEFAULT_ASSET):
+    """Moves row-key index files of the single-asset layout under asset=<asset>/."""
+    if not os.path.isdir(ROW_KEY_INDEX_DIR):
+        return
+    for name in os.listdir(ROW_KEY_INDEX_DIR):
+        if name.startswith("currency="):
+            target = os.path.join(ROW_KEY_INDEX_DIR, f"asset={asset}", name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(os.path.join(ROW_KEY_INDEX_DIR, name), target)
@@ -0,0 +1,216 @@
+# stream_ingest.py
+#
+# Streaming ingest for update_binance: every fetched page flows through
+#
+#   fetch -> parse -> clean -> write
+#
+# stages connected by bounded queues. Fetching the next pages overlaps
+# with cleaning and persisting the previous ones, and a full queue blocks
+# the stage that feeds it, so peak memory is bounded by the queue depth
+# (plus the rows buffered by the writer before a flush), not by the
+# number of markets or the depth of the books.
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from common import metrics
+from common.rate_limiter import configure_rate_limit, DEFAULT_RATE, DEFAULT_BURST
+from common.raw_archive import run_in_context
+from .base_scraper import P2P_SEARCH_URL
+from .multi_fetch import SIDES, p2p_fetch_side, fetch_page, to_frame
+from .clean_standardize import clean_decoded
+from .save_raw import RawRunWriter
+from .snapshot_and_master import migrate_legacy_files, store_processed, compact_closed_days
+
+
+QUEUE_DEPTH = 8
+FLUSH_ROWS = 5000
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """Raised in a stage when another stage failed."""
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+    raise _Stopped()
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    raise _Stopped()
+
+
+def stream_binance(market_list, run_index, pages=2, stop_rule=None, max_workers=16,
+                   rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                   queue_depth=QUEUE_DEPTH, flush_rows=FLUSH_ROWS):
+    """
+    Scrapes the (asset, fiat) markets of `market_list` and stores raw and
+    processed rows as they arrive.
+
+    - fetch: a pool of max_workers threads walks the (asset, fiat, side) books
+      (adaptively with a stop_rule, see multi_fetch.p2p_fetch_side, or
+      `pages` fixed pages) and emits one item per decoded page;
+    - parse: builds the typed frame of the page (run_index, row keys);
+    - clean: clean_decoded;
+    - write: appends each page to the raw run file as a row group and
+      buffers cleaned rows, storing them in the master dataset every
+      `flush_rows` rows (one fragment part per flush).
+
+    Each queue holds at most `queue_depth` pages. An error in any stage
+    stops the others and is re-raised here. The busy time of each stage
+    (queue waits excluded) goes to the stage_seconds metric; only the
+    flushes to the master are logged as spans.
+    Returns {"pages", "raw_rows", "stored_rows", "stored_bytes",
+    "rows_by_market", "raw_path"}, rows_by_market keyed by "ASSET/FIAT".
+    """
+    configure_rate_limit(P2P_SEARCH_URL, rate=rate, burst=burst)
+    migrate_legacy_files()
+
+    parse_q = queue.Queue(maxsize=queue_depth)
+    clean_q = queue.Queue(maxsize=queue_depth)
+    write_q = queue.Queue(maxsize=queue_depth)
+
+    stop = threading.Event()
+    errors = []
+
+    def run_stage(fn):
+        try:
+            fn()
+        except _Stopped:
+            pass
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    def fetch_book(asset, fiat, side):
+        p2p_fetch_side(
+            asset, fiat, side, stop_rule, max_pages=pages,
+            on_page=lambda page, columns: _put(parse_q, ((asset, fiat), columns), stop),
+        )
+
+    def fetch_one(asset, fiat, side, page):
+        if not stop.is_set():
+            _put(parse_q, ((asset, fiat), fetch_page(asset, fiat, side, page)), stop)
+
+    def fetch():
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            if stop_rule:
+                futures = [
+                    pool.submit(run_in_context(fetch_book), asset, fiat, side)
+                    for asset, fiat in market_list for side in SIDES
+                ]
+            else:
+                futures = [
+                    pool.submit(run_in_context(fetch_one), asset, fiat, side, page)
+                    for asset, fiat in market_list for side in SIDES
+                    for page in range(1, pages + 1)
+                ]
+            wait(futures)
+            for future in futures:
+                future.result()
+
+        _put(parse_q, _DONE, stop)
+
+    def parse():
+        while True:
+            item = _get(parse_q, stop)
+            if item is _DONE:
+                break
+            (asset, fiat), columns = item
+            with metrics.span("parse", log=False, source="binance", asset=asset, fiat=fiat):
+                frame = to_frame([columns], run_index)
+            if not frame.empty:
+                _put(clean_q, ((asset, fiat), frame), stop)
+        _put(clean_q, _DONE, stop)
+
+    def clean():
+        while True:
+            item = _get(clean_q, stop)
+            if item is _DONE:
+                break
+            (asset, fiat), frame = item
+            with metrics.span("clean", log=False, source="binance", asset=asset, fiat=fiat):
+                raw = frame.drop(columns=["run_index", "row_key"], errors="ignore")
+                cleaned = clean_decoded(frame)
+            _put(write_q, (f"{asset}/{fiat}", raw, cleaned), stop)
+        _put(write_q, _DONE, stop)
+
+    # Stage threads run in the caller's context, so that the fetch workers
+    # archive their responses in the run's segment (see common/raw_archive.py)
+    threads = [
+        threading.Thread(target=run_in_context(run_stage), args=(fn,),
+                         name=f"binance-{fn.__name__}", daemon=True)
+        for fn in (fetch, parse, clean)
+    ]
+    for thread in threads:
+        thread.start()
+
+    summary = {"pages": 0, "raw_rows": 0, "stored_rows": 0, "stored_bytes": 0,
+               "rows_by_market": {}, "raw_path": None}
+    stored = {}
+    raw_writer = RawRunWriter(run_index)
+    buffer, buffered = [], 0
+    part = 0
+
+    def flush():
+        nonlocal buffer, buffered, part
+        if buffered:
+            batch = pd.concat(buffer, ignore_index=True)
+            with metrics.span("store", source="binance"):
+                store_processed(batch, part=part, stats=stored)
+            summary["stored_rows"] = stored.get("rows", 0)
+            summary["stored_bytes"] = stored.get("bytes", 0)
+            part += 1
+        buffer, buffered = [], 0
+
+    def write():
+        nonlocal buffered
+        while True:
+            item = _get(write_q, stop)
+            if item is _DONE:
+                break
+            market, raw, cleaned = item
+            with metrics.span("save_raw", log=False, source="binance"):
+                raw_writer.write(raw)
+
+            summary["pages"] += 1
+            summary["raw_rows"] += len(raw)
+            summary["rows_by_market"][market] = summary["rows_by_market"].get(market, 0) + len(raw)
+
+            buffer.append(cleaned)
+            buffered += len(cleaned)
+            if buffered >= flush_rows:
+                flush()
+        flush()
+
+    try:
+        run_stage(write)
+    finally:
+        # Normally every stage has already returned; this releases the
+        # others when the write stage failed or was interrupted.
+        stop.set()
+        for thread in threads:
+            thread.join()
+        raw_writer.close()
+        summary["raw_path"] = raw_writer.path
+
+    if errors:
+        raise errors[0]
+
+    compact_closed_days()
+    return summary
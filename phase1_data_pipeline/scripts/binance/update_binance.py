@@ -1,79 +1,184 @@
 # update_binance.py
 
 import os
-import json
 import time
+from urllib.parse import urlparse
 
 import pandas as pd
 
-from .multi_fetch import p2p_fetch
-from .clean_standardize import clean_and_standardize
+from common import metrics
+from common.coverage import load_coverage
+from common.http_client import get_client
+from common.raw_archive import archive_run
+from common.run_registry import RunRegistry
+from .base_scraper import P2P_SEARCH_URL
+from .multi_fetch import markets, p2p_fetch, p2p_fetch_markets
+from .clean_standardize import clean_decoded
+from .row_key import drop_duplicate_keys
 from .save_raw import save_raw
+from .stream_ingest import stream_binance
 from .snapshot_and_master import update_processed_data
 from .paths_binance import (
     DATA_RAW_BINANCE,
     DATA_PROCESSED_BINANCE,
-    HISTORICAL_FIAT_DIR,
-    DAILY_SNAP_DIR,
-    MASTER_PATH,
+    RAW_ARCHIVE_BINANCE,
+    RUN_REGISTRY_PATH,
+    RUN_COUNTER_PATH,
 )
 
 
-def update_binance():
-
-    metadata_dir = os.path.join(DATA_PROCESSED_BINANCE, "metadata")
-
-    for d in [
-        DATA_RAW_BINANCE,
-        DATA_PROCESSED_BINANCE,
-        metadata_dir,
-        HISTORICAL_FIAT_DIR,
-        DAILY_SNAP_DIR,
-    ]:
+# Adaptive pagination: stop a book once 40 ads are collected (the depth of
+# the former fixed pages=2 x rows=20) or when Binance has no more ads.
+STOP_RULE = {"max_ads": 40}
+MAX_PAGES = 10
+
+
+def run_key(run_index):
+    """Name of the raw archive segment of a run."""
+    return f"run_{run_index:06d}"
+
+
+def run_registry():
+    """The Binance run registry, kept in sync with run_counter.json."""
+    # Registries created next to the processed data move to the state folder
+    old_path = os.path.join(DATA_PROCESSED_BINANCE, "metadata", os.path.basename(RUN_REGISTRY_PATH))
+    if os.path.exists(old_path) and not os.path.exists(RUN_REGISTRY_PATH):
+        os.makedirs(os.path.dirname(RUN_REGISTRY_PATH), exist_ok=True)
+        os.replace(old_path, RUN_REGISTRY_PATH)
+    return RunRegistry(RUN_REGISTRY_PATH, counter_path=RUN_COUNTER_PATH)
+
+
+def _file_size(path):
+    return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+def update_binance(concurrent=True, max_workers=16, rate=10.0, burst=32,
+                   stop_rule=STOP_RULE, max_pages=MAX_PAGES, stream=False,
+                   assets=None, fiats=None):
+    """
+    Runs one Binance P2P scrape and updates raw and processed data.
+    Every asset is scraped against every fiat; both lists default to the
+    coverage file (see common/coverage.py).
+    With concurrent=True every (asset, fiat, side, page) request is sent at once
+    through a thread pool of max_workers, throttled by a token bucket of
+    `rate` requests/s and `burst` back-to-back requests on the Binance host.
+    concurrent=False keeps the original one-by-one fetch with fixed delays.
+    stop_rule (see multi_fetch.depth_reached) enables adaptive pagination
+    up to max_pages per side; stop_rule=None fetches a fixed 2 pages.
+    stream=True runs the bounded-queue pipeline of stream_ingest.py
+    instead: pages are cleaned and written while the next ones are
+    fetched, and the run's rows are never all held in memory. It returns
+    the stream summary (pages, raw_rows, stored_rows, rows_by_market)
+    rather than the cleaned frame.
+    The run index comes from the run registry, which also records the
+    run's status, times, rows and bytes; several update_binance processes
+    may run at once against the same data directory.
+    The fetch, save_raw, clean and store stages are timed as metrics
+    spans (source="binance"), see common/metrics.py.
+    """
+    pages = max_pages if stop_rule else 2
+
+    for d in [DATA_RAW_BINANCE, DATA_PROCESSED_BINANCE]:
         os.makedirs(d, exist_ok=True)
 
-    run_file = os.path.join(metadata_dir, "run_counter.json")
-
-    if os.path.exists(run_file):
-        with open(run_file, "r") as f:
-            run_index = json.load(f) + 1
-    else:
-        run_index = 1
-
-    with open(run_file, "w") as f:
-        json.dump(run_index, f)
-
-    print(f"Current run index: {run_index}")
-
-    fiats = ["USD", "EUR", "GBP", "JPY", "CNY", "MXN", "ARS", "BOB"]
-
-    raw_dfs = []
-    for fiat in fiats:
-        df_raw = p2p_fetch("USDT", fiat, run_index, pages=2, delay=0.5)
-        print(f"[{fiat}] {len(df_raw)} raw rows")
-        raw_dfs.append(df_raw)
+    coverage = load_coverage()
+    assets = list(assets or coverage["assets"])
+    fiats = list(fiats or coverage["fiats"])
+    market_list = markets(assets, fiats)
+    http_mark = get_client().mark()
+
+    with run_registry().run("binance") as run:
+        run_index = run.run_index
+        print(f"Current run index: {run_index}")
+
+        # Every response of the run is archived verbatim (see replay.py)
+        archive_meta = {
+            "run_index": run_index, "assets": assets, "fiats": fiats,
+            "pages": pages, "stop_rule": stop_rule,
+        }
+        with archive_run(RAW_ARCHIVE_BINANCE, "binance", run_key(run_index), meta=archive_meta) as segment, \
+                metrics.span("stream" if stream else "fetch", source="binance"):
+            if stream:
+                summary = stream_binance(
+                    market_list, run_index, pages=pages, stop_rule=stop_rule,
+                    max_workers=max_workers, rate=rate, burst=burst,
+                )
+            elif concurrent:
+                by_market = p2p_fetch_markets(
+                    market_list, run_index, pages=pages,
+                    max_workers=max_workers, rate=rate, burst=burst, stop_rule=stop_rule,
+                )
+                raw_dfs = [by_market[market] for market in market_list]
+            else:
+                raw_dfs = []
+                for asset, fiat in market_list:
+                    raw_dfs.append(p2p_fetch(
+                        asset, fiat, run_index, pages=pages, delay=0.5, stop_rule=stop_rule
+                    ))
+
+        if stream:
+            for asset, fiat in market_list:
+                rows = summary["rows_by_market"].get(f"{asset}/{fiat}", 0)
+                print(f"[{asset}/{fiat}] {rows} raw rows")
+            run.record(
+                raw_rows=summary["raw_rows"], stored_rows=summary["stored_rows"],
+                raw_bytes=_file_size(summary["raw_path"]) + _file_size(segment.path),
+                stored_bytes=summary["stored_bytes"],
+            )
+            metrics.event(
+                "ingest", source="binance", run_index=run_index,
+                raw_rows=summary["raw_rows"], stored_rows=summary["stored_rows"],
+            )
+
+            if summary["raw_rows"] == 0:
+                raise ValueError("Pipeline stopped: no data scraped.")
+
+            print(f"[Binance] RAW saved, {summary['stored_rows']} rows stored")
+            _print_http_summary(http_mark)
+            print("Binance update completed.")
+            return summary
+
+        for (asset, fiat), df_raw in zip(market_list, raw_dfs):
+            print(f"[{asset}/{fiat}] {len(df_raw)} raw rows")
+
+        p2p_all_raw = pd.concat(raw_dfs, ignore_index=True)
+        p2p_all_raw = p2p_all_raw.drop(columns=["run_index", "row_key"], errors="ignore")
+        with metrics.span("save_raw", source="binance"):
+            raw_file = save_raw(p2p_all_raw, run_index)
+        print("[Binance] RAW saved")
+        run.record(
+            raw_rows=len(p2p_all_raw),
+            raw_bytes=_file_size(raw_file) + _file_size(segment.path),
+        )
+
+        with metrics.span("clean", source="binance"):
+            clean_dfs = [clean_decoded(df) for df in raw_dfs]
+            p2p_all_clean = drop_duplicate_keys(pd.concat(clean_dfs, ignore_index=True))
+
+        if p2p_all_clean.empty:
+            raise ValueError("Pipeline stopped: no data scraped.")
+
+        stored = {}
+        with metrics.span("store", source="binance"):
+            update_processed_data(p2p_all_clean, stats=stored)
+        run.record(stored_rows=stored.get("rows", 0), stored_bytes=stored.get("bytes", 0))
+        metrics.event(
+            "ingest", source="binance", run_index=run_index,
+            raw_rows=len(p2p_all_raw), stored_rows=stored.get("rows", 0),
+        )
 
-    p2p_all_raw = pd.concat(raw_dfs, ignore_index=True)
-    p2p_all_raw = p2p_all_raw.drop(columns=["run_index"], errors="ignore")
-    save_raw(p2p_all_raw, run_index)
-    print("[Binance] RAW saved")
-
-    clean_dfs = [clean_and_standardize(df) for df in raw_dfs]
-    p2p_all_clean = (
-        pd.concat(clean_dfs, ignore_index=True)
-        .drop_duplicates()
-    )
-
-    if p2p_all_clean.empty:
-        raise ValueError("Pipeline stopped: no data scraped.")
-
-    tmp_by_fiat_clean = {fiat: clean_dfs[i] for i, fiat in enumerate(fiats)}
-
-    update_processed_data(p2p_all_clean, tmp_by_fiat_clean)
-
-    print("[Binance] fiat datasets updated")
-    print("[Binance] daily snapshot updated")
     print("[Binance] master updated")
 
+    _print_http_summary(http_mark)
     print("Binance update completed.")
     return p2p_all_clean
+
+
+def _print_http_summary(since):
+    http = get_client().summary(since=since).get(urlparse(P2P_SEARCH_URL).netloc)
+    if http:
+        print(
+            f"[Binance] HTTP: {http['requests']} requests, "
+            f"{http['retries']} retries, {http['failures']} failures, "
+            f"mean latency {http['mean_latency_s']}s, mean wait {http['mean_wait_s']}s"
+        )
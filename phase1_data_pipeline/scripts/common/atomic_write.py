@@ -0,0 +1,60 @@
+# atomic_write.py
+#
+# Whole-file writes that readers never see half done: the content goes to
+# a temporary file in the same directory, which then replaces the target
+# with os.replace (atomic on POSIX and Windows). A reader opening the path
+# gets either the previous or the new file, never a truncated one.
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+
+def temp_path(path):
+    """Temporary sibling of `path`, unique per process and thread."""
+    return f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yields a temporary path to write to; on success it replaces `path`,
+    on error it is removed and `path` is left untouched.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp = temp_path(path)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_parquet(df, path, **kwargs):
+    """DataFrame.to_parquet(path, **kwargs), published atomically."""
+    with atomic_path(path) as tmp:
+        df.to_parquet(tmp, **kwargs)
+
+
+def write_csv(df, path, **kwargs):
+    """DataFrame.to_csv(path, **kwargs), published atomically."""
+    with atomic_path(path) as tmp:
+        df.to_csv(tmp, **kwargs)
+
+
+def write_json(obj, path, **kwargs):
+    with atomic_path(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, **kwargs)
+
+
+def write_text(text, path):
+    with atomic_path(path) as tmp:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
@@ -0,0 +1,58 @@
+# coverage.py
+#
+# Markets scraped by the Binance pipeline, read from one JSON file:
+#
+#   phase1_data_pipeline/config/coverage.json
+#   {"assets": ["USDT", "USDC"], "fiats": ["USD", "EUR", ...]}
+#
+# Every asset is scraped against every fiat. PHASE1_COVERAGE points to
+# another file. Consumers of the processed data (extraction, dashboard)
+# do not read this file: they discover the assets and currencies present
+# in the data, so coverage grows by editing the file alone.
+
+import json
+import os
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASE1_DIR = os.path.dirname(SCRIPTS_DIR)
+
+COVERAGE_PATH = os.environ.get(
+    "PHASE1_COVERAGE", os.path.join(PHASE1_DIR, "config", "coverage.json")
+)
+
+# Asset of every row stored before assets were configurable
+DEFAULT_ASSET = "USDT"
+DEFAULT_FIATS = ["USD", "EUR", "GBP", "JPY", "CNY", "MXN", "ARS", "BOB"]
+
+
+def _codes(values, key):
+    if isinstance(values, str) or not isinstance(values, list):
+        raise ValueError(f"coverage: '{key}' must be a list of codes")
+
+    codes = []
+    for value in values:
+        code = str(value).strip().upper()
+        if not code.isalnum():
+            raise ValueError(f"coverage: invalid code {value!r} in '{key}'")
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def load_coverage(path=COVERAGE_PATH):
+    """
+    {"assets": [...], "fiats": [...]}, upper-cased and de-duplicated in
+    file order. A missing file gives the original coverage (USDT against
+    DEFAULT_FIATS); a malformed one raises ValueError.
+    """
+    if not os.path.exists(path):
+        return {"assets": [DEFAULT_ASSET], "fiats": list(DEFAULT_FIATS)}
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    return {
+        "assets": _codes(config.get("assets", [DEFAULT_ASSET]), "assets"),
+        "fiats": _codes(config.get("fiats", DEFAULT_FIATS), "fiats"),
+    }
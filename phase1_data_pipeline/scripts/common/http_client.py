@@ -0,0 +1,241 @@
+# http_client.py
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+from .rate_limiter import get_rate_limiter
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _retry_after_seconds(response):
+    """
+    Reads the Retry-After header (delta-seconds or HTTP-date).
+    Returns the number of seconds to wait, or None if absent/invalid.
+    """
+    if response is None:
+        return None
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HttpClient:
+    """
+    Reusable HTTP client shared by the Binance and BCB scrapers.
+    - one keep-alive requests.Session per host, with a connection pool
+      of pool_maxsize connections (so concurrent fetches reuse sockets)
+    - every attempt waits for the host's token bucket
+    - retries on network errors, 429 and 5xx with exponential backoff
+      and jitter (max_retries retries: max_retries + 1 attempts);
+      Retry-After is honoured when the server sends it
+    - every attempt's latency (the request itself, waits excluded) goes
+      to a histogram per host and asset/fiat/side tags; the time spent
+      waiting for the token bucket and in retry backoff goes to a
+      separate wait histogram, next to the request and retry counters
+    - per-request status, retry count, final-attempt latency and total
+      wait are kept in `stats`
+    """
+
+    def __init__(self, pool_maxsize=32, timeout=10, max_retries=2,
+                 backoff=0.5, max_backoff=30.0, stats_size=10000):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = deque(maxlen=stats_size)
+        self._recorded = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        parsed = urlparse(url)
+        key = f"{parsed.scheme}://{parsed.netloc}"
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=0,
+                )
+                session.mount(key, adapter)
+                self._sessions[key] = session
+            return session
+
+    def _sleep_before_retry(self, attempt, backoff, response):
+        wait = min(self.max_backoff, backoff * (2 ** attempt))
+        wait = wait * random.uniform(0.5, 1.0)
+
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            wait = max(wait, min(retry_after, self.max_backoff))
+
+        time.sleep(wait)
+        return wait
+
+    def _observe_attempt(self, url, sent, tags):
+        """Observes one attempt sent at perf_counter() `sent`; returns its latency."""
+        latency = time.perf_counter() - sent
+        tags = tags or {}
+        metrics.observe(
+            "http_request_seconds", latency, host=urlparse(url).netloc,
+            asset=tags.get("asset"), fiat=tags.get("fiat"), side=tags.get("side"),
+        )
+        return latency
+
+    def request(self, method, url, max_retries=None, backoff=None, tags=None,
+                raise_for_status=True, **kwargs):
+        """
+        Sends a request and returns the requests.Response.
+        Raises the last error (requests.RequestException) when every
+        attempt failed. With raise_for_status=False an HTTP error status
+        is not an error: the last response is returned, as requests does.
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        if max_retries < 0:
+            raise ValueError("max_retries must be >= 0")
+        backoff = self.backoff if backoff is None else backoff
+        kwargs.setdefault("timeout", self.timeout)
+
+        session = self._session(url)
+        limiter = get_rate_limiter(url)
+        waits = {"rate_limit": 0.0, "backoff": 0.0}
+
+        for attempt in range(max_retries + 1):
+            queued = time.perf_counter()
+            limiter.acquire()
+            sent = time.perf_counter()
+            waits["rate_limit"] += sent - queued
+
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException:
+                latency = self._observe_attempt(url, sent, tags)
+                if attempt < max_retries:
+                    waits["backoff"] += self._sleep_before_retry(attempt, backoff, None)
+                    continue
+                self._record(method, url, None, latency, waits, attempt, False, tags)
+                raise
+
+            latency = self._observe_attempt(url, sent, tags)
+            status = response.status_code
+            if status in RETRY_STATUSES and attempt < max_retries:
+                waits["backoff"] += self._sleep_before_retry(attempt, backoff, response)
+                continue
+
+            self._record(method, url, status, latency, waits, attempt, response.ok, tags)
+            if raise_for_status:
+                response.raise_for_status()
+            return response
+
+        raise AssertionError("unreachable: the last attempt returns or raises")
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, method, url, status, latency, waits, retries, ok, tags):
+        entry = {
+            "ts": time.time(),
+            "method": method,
+            "host": urlparse(url).netloc,
+            "status": status,
+            "latency_s": round(latency, 4),
+            "wait_s": round(sum(waits.values()), 4),
+            "retries": retries,
+            "ok": ok,
+        }
+        if tags:
+            entry.update(tags)
+        with self._lock:
+            self.stats.append(entry)
+            self._recorded += 1
+
+        host = entry["host"]
+        metrics.observe("http_wait_seconds", waits["rate_limit"], host=host, reason="rate_limit")
+        if retries:
+            metrics.observe("http_wait_seconds", waits["backoff"], host=host, reason="backoff")
+            metrics.inc("http_retries_total", retries, host=host)
+        metrics.inc("http_requests_total", host=host, status=status or "error")
+
+    def mark(self):
+        """Position in `stats`: pass it to summary(since=...) to cover a single run."""
+        with self._lock:
+            return self._recorded
+
+    def summary(self, since=None):
+        """
+        Aggregates `stats` per host: requests, failures, retries, mean
+        final-attempt latency and mean wait (rate limit and backoff).
+        since=mark() keeps only the requests recorded after that mark (the
+        client is shared by every run of the process).
+        """
+        with self._lock:
+            entries = list(self.stats)
+            if since is not None:
+                entries = entries[max(0, len(entries) - (self._recorded - since)):]
+
+        out = {}
+        for entry in entries:
+            host = out.setdefault(entry["host"], {
+                "requests": 0, "failures": 0, "retries": 0, "latency_s": 0.0, "wait_s": 0.0,
+            })
+            host["requests"] += 1
+            host["failures"] += 0 if entry["ok"] else 1
+            host["retries"] += entry["retries"]
+            host["latency_s"] += entry["latency_s"]
+            host["wait_s"] += entry["wait_s"]
+
+        for host in out.values():
+            host["mean_latency_s"] = round(host.pop("latency_s") / host["requests"], 4)
+            host["mean_wait_s"] = round(host.pop("wait_s") / host["requests"], 4)
+        return out
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Returns the process-wide HttpClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
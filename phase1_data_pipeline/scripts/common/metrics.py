@@ -0,0 +1,259 @@
+# metrics.py
+#
+# In-process instrumentation shared by the Binance and BCB pipelines:
+# counters, gauges, histograms and timed spans, exported as
+#
+# - JSON lines: one event per span / run, appended on flush()
+# - a Prometheus textfile (node_exporter textfile collector format),
+#   rewritten atomically on flush()
+#
+# Metric values accumulate for the life of the process: per run for the
+# one-shot pipeline, since start-up for the daemon. Events are dropped
+# from memory once flushed, past the last RETAINED_EVENTS.
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .atomic_write import write_text
+
+
+PREFIX = "p2p_"
+
+# Seconds; fits HTTP requests as well as whole pipeline stages
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": "Duration of pipeline stages",
+    "http_request_seconds": "HTTP latency of each attempt, waits excluded",
+    "http_wait_seconds": "HTTP time waited per request, by reason (rate_limit, backoff)",
+    "http_requests_total": "HTTP requests by final status",
+    "http_retries_total": "HTTP attempts retried",
+    "rows_written_total": "Rows written",
+    "bytes_written_total": "Bytes written",
+    "last_run_timestamp_seconds": "End of the last run (unix time)",
+    "last_run_success": "1 if the last run succeeded, 0 otherwise",
+    "last_run_duration_seconds": "Duration of the last run",
+}
+
+# Flushed events kept in memory, so that span_totals() of a run still in
+# progress (e.g. a Binance run while the daemon flushes a BCB one) sees
+# the events logged since its mark
+RETAINED_EVENTS = 1000
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in items
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Thread-safe registry; the module-level functions use one instance."""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.events = []
+        self.jsonl_path = None
+        self.prom_path = None
+        self._flushed = 0
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def configure(self, jsonl_path=None, prom_path=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            key = (name, _label_key(labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def event(self, kind, **fields):
+        record = {"ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z", "event": kind}
+        record.update(fields)
+        with self._lock:
+            self.events.append(record)
+
+    @contextmanager
+    def span(self, name, log=True, **labels):
+        """
+        Times the block into the stage_seconds{stage=name, ...} histogram
+        and, with log=True, records a "span" event (status ok/error).
+        log=False suits per-page spans, which would flood the event log.
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("stage_seconds", seconds, stage=name, **labels)
+            if log:
+                self.event("span", name=name, seconds=round(seconds, 6), status=status, **labels)
+
+    def mark(self):
+        """Position in the event log, for span_totals(since=...)."""
+        with self._lock:
+            return self._dropped + len(self.events)
+
+    def span_totals(self, since=0, **labels):
+        """Seconds per span name among the logged spans after `since` matching `labels`."""
+        totals = {}
+        with self._lock:
+            events = self.events[max(0, since - self._dropped):]
+        for record in events:
+            if record["event"] != "span":
+                continue
+            if any(str(record.get(k)) != str(v) for k, v in labels.items()):
+                continue
+            totals[record["name"]] = totals.get(record["name"], 0.0) + record["seconds"]
+        return totals
+
+    def histogram_sums(self, name, by, **labels):
+        """Sum of the `name` histograms matching `labels`, per value of the `by` label."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        sums = {}
+        with self._lock:
+            for (n, key), histogram in self.histograms.items():
+                values = dict(key)
+                if n != name or by not in values or not wanted <= set(key):
+                    continue
+                sums[values[by]] = sums.get(values[by], 0.0) + histogram.sum
+        return sums
+
+    def to_prometheus(self):
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.count, h.sum)
+                for key, h in self.histograms.items()
+            }
+
+        lines = []
+
+        def header(name, kind):
+            if name in HELP:
+                lines.append(f"# HELP {PREFIX}{name} {HELP[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({n for n, _ in values}):
+                header(name, kind)
+                for (n, key), value in sorted(values.items()):
+                    if n == name:
+                        lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+
+        for name in sorted({n for n, _ in histograms}):
+            header(name, "histogram")
+            for (n, key), (buckets, counts, count, total) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound, bucket_count in zip(buckets, counts):
+                    labels = _format_labels(key, [("le", repr(float(bound)))])
+                    lines.append(f"{PREFIX}{name}_bucket{labels} {bucket_count}")
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {round(total, 6)}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """
+        Appends the new events to the JSON-lines file and rewrites the
+        textfile. Flushed events past the last RETAINED_EVENTS are dropped.
+        """
+        with self._lock:
+            events = self.events[self._flushed:]
+            drop = max(0, len(self.events) - RETAINED_EVENTS)
+            del self.events[:drop]
+            self._dropped += drop
+            self._flushed = len(self.events)
+
+        if self.jsonl_path and events:
+            os.makedirs(os.path.dirname(self.jsonl_path), exist_ok=True)
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e) + "\n" for e in events))
+
+        if self.prom_path:
+            write_text(self.to_prometheus(), self.prom_path)
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    return _metrics
+
+
+def configure(jsonl_path=None, prom_path=None):
+    _metrics.configure(jsonl_path=jsonl_path, prom_path=prom_path)
+
+
+def inc(name, value=1, **labels):
+    _metrics.inc(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    _metrics.set_gauge(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    _metrics.observe(name, value, **labels)
+
+
+def event(kind, **fields):
+    _metrics.event(kind, **fields)
+
+
+def span(name, log=True, **labels):
+    return _metrics.span(name, log=log, **labels)
+
+
+def flush():
+    _metrics.flush()
@@ -0,0 +1,71 @@
+# rate_limiter.py
+
+import threading
+import time
+from urllib.parse import urlparse
+
+
+DEFAULT_RATE = 10.0      # requests per second, per host
+DEFAULT_BURST = 32       # requests that may be sent back to back
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    Tokens are refilled at `rate` per second up to `burst`.
+    acquire() blocks until one token is available and consumes it.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(max(1, burst))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _host(url_or_host):
+    return urlparse(url_or_host).netloc or url_or_host
+
+
+def get_rate_limiter(url_or_host):
+    """
+    Returns the shared TokenBucket of a host, creating it with the
+    default limits on first use.
+    """
+    host = _host(url_or_host)
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = TokenBucket(DEFAULT_RATE, DEFAULT_BURST)
+        return _limiters[host]
+
+
+def configure_rate_limit(url_or_host, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    """Replaces the token bucket of a host with new limits."""
+    host = _host(url_or_host)
+    with _limiters_lock:
+        _limiters[host] = TokenBucket(rate, burst)
+        return _limiters[host]
@@ -0,0 +1,139 @@
+# raw_archive.py
+#
+# Append-only archive of the raw HTTP responses (Binance JSON, BCB HTML),
+# one zstd-compressed JSON-lines segment per run:
+#
+#   data/raw/archive/<source>/<run_key>.jsonl.zst
+#
+# The first line of a segment holds the run metadata ({"meta": {...}}),
+# every other line one response ({"ts", "url", "status", "body", ...}).
+# A segment is written as "<name>.part" and renamed when the run closes
+# it, so readers only see complete segments, and it is never modified
+# afterwards.
+#
+# The open segments belong to the run's context (contextvars), not to the
+# process: runs of the same source in other threads keep their own, and
+# worker threads of a run see its segment when they are started with
+# run_in_context().
+
+import contextvars
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pyarrow as pa
+
+
+SEGMENT_SUFFIX = ".jsonl.zst"
+COMPRESSION = "zstd"
+
+
+class SegmentWriter:
+    """
+    Thread-safe writer of one segment. The file is only created by the
+    first append, so a run that archived nothing leaves no segment.
+    """
+
+    def __init__(self, archive_dir, run_key, meta=None):
+        self.path = os.path.join(archive_dir, run_key + SEGMENT_SUFFIX)
+        self.meta = dict(meta or {}, run_key=run_key)
+        self.records = 0
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def _write_line(self, obj):
+        self._stream.write((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def append(self, record):
+        with self._lock:
+            if self._stream is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._stream = pa.CompressedOutputStream(self.path + ".part", COMPRESSION)
+                self._write_line({"meta": self.meta})
+            self._write_line(record)
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._stream is None:
+                return
+            self._stream.close()
+            self._stream = None
+        os.replace(self.path + ".part", self.path)
+
+
+# {source: SegmentWriter} of the run executing in the current context
+_active = contextvars.ContextVar("raw_archive_active", default={})
+
+
+@contextmanager
+def archive_run(archive_dir, source, run_key, meta=None):
+    """
+    Opens the segment of one run and makes it the active segment of
+    `source` in the current context: archive_response(source, ...) calls
+    made meanwhile by this thread, or by threads started through
+    run_in_context(), are appended to it. The segment is closed even when
+    the run fails, so the responses of a failed run are kept.
+    """
+    writer = SegmentWriter(archive_dir, run_key, meta=meta)
+    token = _active.set({**_active.get(), source: writer})
+    try:
+        yield writer
+    finally:
+        _active.reset(token)
+        writer.close()
+
+
+def run_in_context(fn):
+    """
+    Wraps fn so that it runs in a copy of the caller's context, i.e. with
+    the caller's open segments, e.g. pool.submit(run_in_context(fn), ...)
+    or threading.Thread(target=run_in_context(fn)).
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def archive_response(source, **record):
+    """Appends one response to the segment `source` has open in this context, if any."""
+    writer = _active.get().get(source)
+    if writer is None:
+        return
+    record.setdefault("ts", datetime.utcnow().replace(microsecond=0).isoformat() + "Z")
+    writer.append(record)
+
+
+def list_segments(archive_dir):
+    """Complete segments of an archive, in run order."""
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        os.path.join(archive_dir, name)
+        for name in os.listdir(archive_dir)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def read_segment(path):
+    """Returns (meta, records) of one segment."""
+    with pa.input_stream(path, compression=COMPRESSION) as f:
+        lines = f.read().decode("utf-8").splitlines()
+
+    meta = {}
+    records = []
+    for line in lines:
+        if not line:
+            continue
+        obj = json.loads(line)
+        if "meta" in obj and len(obj) == 1:
+            meta = obj["meta"]
+        else:
+            records.append(obj)
+    return meta, records
@@ -0,0 +1,261 @@
+# run_registry.py
+#
+# Transactional run registry (SQLite) and advisory inter-process lock.
+#
+# Run indices are allocated inside an IMMEDIATE transaction from an
+# AUTOINCREMENT key, so overlapping processes never get the same index
+# and an index is never handed out twice. Each run row records its
+# status, start/end times, row and byte counts; a run that crashed stays
+# visible (status "running", later "abandoned") instead of leaving an
+# unexplained gap.
+#
+# The SQLite file is local state. The last allocated index is also kept in
+# a plain counter file (run_counter.json) next to the committed data, so a
+# registry created on another machine, or from a fresh checkout, continues
+# the numbering.
+
+import os
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .atomic_write import write_text
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: the lock is then process-local only
+    fcntl = None
+
+
+RUN_COLUMNS = [
+    "run_index", "source", "status", "started_at", "finished_at", "host", "pid",
+    "raw_rows", "stored_rows", "raw_bytes", "stored_bytes", "error",
+]
+COUNTERS = ["raw_rows", "stored_rows", "raw_bytes", "stored_bytes"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_index INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    host TEXT,
+    pid INTEGER,
+    raw_rows INTEGER,
+    stored_rows INTEGER,
+    raw_bytes INTEGER,
+    stored_bytes INTEGER,
+    error TEXT
+)
+"""
+
+
+def _now():
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class RunRegistry:
+    """
+    Registry stored in the SQLite file `path`. `counter_path` is the run
+    counter file (run_counter.json): every allocation continues after the
+    last index it holds, if that is ahead of the registry, and then writes
+    the new index back to it.
+    """
+
+    def __init__(self, path, counter_path=None, timeout=30.0):
+        self.path = path
+        self.counter_path = counter_path
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def start(self, source):
+        """Allocates the next run index for `source` and marks it running."""
+        host, pid = socket.gethostname(), os.getpid()
+        with self._transaction() as conn:
+            # Runs of this host whose process is gone will never finish
+            stale = conn.execute(
+                "SELECT run_index, pid FROM runs WHERE status = 'running' AND host = ?", (host,)
+            ).fetchall()
+            for run_index, run_pid in stale:
+                if run_pid != pid and not _pid_alive(run_pid):
+                    conn.execute(
+                        "UPDATE runs SET status = 'abandoned', finished_at = ? WHERE run_index = ?",
+                        (_now(), run_index),
+                    )
+
+            last = _read_counter(self.counter_path)
+            if last:
+                seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'runs'").fetchone()
+                if seq is None:
+                    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('runs', ?)", (last,))
+                elif seq[0] < last:
+                    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'runs'", (last,))
+
+            cursor = conn.execute(
+                "INSERT INTO runs (source, status, started_at, host, pid) VALUES (?, 'running', ?, ?, ?)",
+                (source, _now(), host, pid),
+            )
+            # Still inside the transaction: counter writes are serialized too
+            if self.counter_path:
+                write_text(str(cursor.lastrowid), self.counter_path)
+            return cursor.lastrowid
+
+    def finish(self, run_index, status="success", error=None, **counters):
+        """Closes a run with its final status and counters (see COUNTERS)."""
+        unknown = set(counters) - set(COUNTERS)
+        if unknown:
+            raise ValueError(f"unknown run counters: {sorted(unknown)}")
+
+        values = {"status": status, "finished_at": _now(), "error": error, **counters}
+        assignments = ", ".join(f"{col} = ?" for col in values)
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE runs SET {assignments} WHERE run_index = ?",
+                (*values.values(), run_index),
+            )
+
+    @contextmanager
+    def run(self, source):
+        """
+        Allocates a run for the duration of the block and yields a Run.
+        The run is recorded as "success" when the block completes and as
+        "failed" (with the error) when it raises.
+        """
+        run = Run(self.start(source))
+        try:
+            yield run
+        except BaseException as e:
+            self.finish(run.run_index, "failed", error=f"{type(e).__name__}: {e}", **run.counters)
+            raise
+        self.finish(run.run_index, "success", **run.counters)
+
+    def get(self, run_index):
+        rows = self._select("WHERE run_index = ?", (run_index,))
+        return rows[0] if rows else None
+
+    def runs(self, source=None, status=None, limit=None):
+        """Runs, most recent first, optionally filtered."""
+        clauses, params = [], []
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+
+        sql = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+        sql += " ORDER BY run_index DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._select(sql, params)
+
+    def _select(self, where, params):
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(RUN_COLUMNS)} FROM runs {where}", params)
+            return [dict(zip(RUN_COLUMNS, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+
+class Run:
+    """Handle of a run in progress; counters set here are saved on finish."""
+
+    def __init__(self, run_index):
+        self.run_index = run_index
+        self.counters = {}
+
+    def record(self, **counters):
+        self.counters.update(counters)
+
+
+def _read_counter(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class AdvisoryLock:
+    """
+    Exclusive flock on a lock file, shared by every process using the same
+    data directory. Re-entrant within a process (nested `with` blocks and
+    threads of the same process queue on an RLock, only the outermost
+    holder takes the file lock).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        try:
+            if self._depth == 0:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                self._fd = fd
+            self._depth += 1
+        except BaseException:
+            self._rlock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._rlock.release()
+
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def advisory_lock(path):
+    """The process-wide AdvisoryLock of a lock file."""
+    path = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = AdvisoryLock(path)
+        return lock
@@ -0,0 +1,130 @@
+# scheduler.py
+
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+
+
+class Job:
+    """
+    A periodic task. Either `every` seconds (fixed rate, missed slots are
+    skipped rather than queued) or at fixed UTC times of day, `at` being a
+    list of "HH:MM" strings.
+    """
+
+    def __init__(self, name, fn, every=None, at=None, run_on_start=True):
+        if (every is None) == (at is None):
+            raise ValueError(f"{name}: give exactly one of every= or at=")
+        if every is not None and every <= 0:
+            raise ValueError(f"{name}: every must be positive")
+
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.at = sorted(_parse_hhmm(t) for t in at) if at is not None else None
+        self.next_due = time.time() if run_on_start else self._next_after(time.time())
+        self.thread = None
+
+    def _next_after(self, now):
+        if self.every is not None:
+            return now + self.every
+
+        day = datetime.fromtimestamp(now, UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in (0, 1):
+            for hour, minute in self.at:
+                due = day + timedelta(days=offset, hours=hour, minutes=minute)
+                if due.timestamp() > now:
+                    return due.timestamp()
+
+    def schedule_next(self, now):
+        if self.every is not None:
+            # Keep a fixed rate: the next slot after `now` on the original grid
+            missed = int((now - self.next_due) // self.every) + 1
+            self.next_due += max(missed, 1) * self.every
+        else:
+            self.next_due = self._next_after(now)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+
+def _parse_hhmm(value):
+    hour, minute = value.strip().split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"invalid time of day: {value!r}")
+    return hour, minute
+
+
+class Scheduler:
+    """
+    In-process scheduler for a long-running daemon.
+    Each due job runs in its own thread so that a slow source does not
+    delay the others; a job whose previous run is still in progress is
+    skipped for that slot, so runs of the same job never overlap.
+    stop() (or SIGTERM/SIGINT once install_signal_handlers() was called)
+    stops scheduling and run() returns after the running jobs finish.
+    """
+
+    def __init__(self, log=print):
+        self.jobs = []
+        self.log = log
+        self._stop = threading.Event()
+
+    def add(self, name, fn, every=None, at=None, run_on_start=True):
+        job = Job(name, fn, every=every, at=at, run_on_start=run_on_start)
+        self.jobs.append(job)
+        return job
+
+    def stop(self):
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        """
+        First SIGTERM/SIGINT: graceful stop. The default handlers are
+        restored, so a second signal terminates immediately.
+        """
+        def handle(signum, frame):
+            self.log(f"[scheduler] {signal.Signals(signum).name} received, stopping after running jobs")
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            self.stop()
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
+
+    def _start(self, job):
+        def target():
+            start = time.time()
+            try:
+                job.fn()
+            except Exception as e:
+                self.log(f"[scheduler] {job.name} failed: {e}")
+            self.log(f"[scheduler] {job.name} finished in {time.time() - start:.2f}s")
+
+        job.thread = threading.Thread(target=target, name=f"job-{job.name}", daemon=True)
+        job.thread.start()
+
+    def run(self):
+        if not self.jobs:
+            return
+
+        while not self._stop.is_set():
+            now = time.time()
+            for job in self.jobs:
+                if job.next_due > now:
+                    continue
+                if job.is_running():
+                    self.log(f"[scheduler] {job.name} skipped: previous run still in progress")
+                else:
+                    self._start(job)
+                job.schedule_next(now)
+
+            next_due = min(job.next_due for job in self.jobs)
+            self._stop.wait(max(0.0, next_due - time.time()))
+
+        for job in self.jobs:
+            if job.is_running():
+                job.thread.join()
+        self.log("[scheduler] stopped")
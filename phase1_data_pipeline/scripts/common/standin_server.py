@@ -0,0 +1,284 @@
+# standin_server.py
+#
+# Local stand-in for the two upstream sources, for offline benchmarks and
+# tests. It serves
+#
+#   POST /bapi/c2c/v2/friendly/c2c/adv/search   Binance P2P search pages
+#   GET  /librerias/indicadores/otras/ultimo.php BCB official rate page
+#   GET  /__stats                                request counters (JSON)
+#
+# with tunable latency, error rate and book depth. Point the pipeline at
+# it with the BINANCE_P2P_URL and BCB_RATES_URL environment variables.
+#
+# Usage (from phase1_data_pipeline/scripts):
+#   python -m common.standin_server [--port 8765] [--latency 0.05]
+#       [--jitter 0.02] [--error-rate 0.01] [--depth 40] [--bcb-rotate]
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BINANCE_PATH = "/bapi/c2c/v2/friendly/c2c/adv/search"
+BCB_PATH = "/librerias/indicadores/otras/ultimo.php"
+STATS_PATH = "/__stats"
+
+# Reference USDT price per fiat and decimals of the quoted price
+FIAT_PRICES = {
+    "USD": (1.0, 3), "EUR": (0.86, 3), "GBP": (0.75, 3), "JPY": (156.0, 2),
+    "CNY": (7.2, 3), "MXN": (18.5, 2), "ARS": (1480.0, 2), "BOB": (9.6, 3),
+}
+
+# Price of one unit of the asset in USD (unknown assets: 1.0)
+ASSET_PRICES = {"USDT": 1.0, "USDC": 1.0, "FDUSD": 1.0, "BTC": 100000.0, "ETH": 3500.0}
+PAYMENT_METHODS = ["BANK", "Wise", "Revolut", "SEPA", "Zelle", "Mercadopago", "BancoUnion"]
+
+# (pais, unidad_monetaria, moneda, tipo_cambio_bs, tipo_cambio_me)
+BCB_RATES = [
+    ("ESTADOS UNIDOS", "DOLAR VENTA", "USD.VENTA", "6.96", ""),
+    ("ESTADOS UNIDOS", "DOLAR COMPRA", "USD.COMPRA", "6.86", ""),
+    ("UNION EUROPEA", "EURO", "EUR", "8.06186", "0.85092"),
+    ("JAPON", "YEN", "JPY", "0.04385", "156.43000"),
+    ("ARGENTINA", "PESO", "ARS", "0.00472", "1453.24290"),
+    ("BRASIL", "REAL", "BRL", "1.25030", "5.48670"),
+    ("CHINA", "YUAN", "CNY", "0.97470", "7.03800"),
+    ("MEXICO", "PESO", "MXN", "0.38142", "17.98530"),
+    ("REINO UNIDO", "LIBRA ESTERLINA", "GBP", "9.22100", "0.74390"),
+]
+MONTH_NAMES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+]
+
+
+def bcb_page_html(day):
+    """A BCB page with the layout parse_bcb_page expects, dated `day`."""
+    header = ("PAÍS", "UNIDAD  MONETARIA", "MONEDA",
+              "TIPO DE CAMBIO  EN Bs  POR UNIDAD DE MONEDA EXTRANJERA", "TIPO CAMBIO  EN M.E.")
+    rows = "\n".join(
+        "<tr>" + "".join(f"<td> {cell} </td>" for cell in row) + "</tr>"
+        for row in [header] + BCB_RATES
+    )
+    title = f"COTIZACIONES {day.day} de {MONTH_NAMES[day.month - 1]} {day.year}"
+    return (
+        '<html><head><meta charset="utf-8"></head><body>\n'
+        f"<table><tr><td>{title}</td></tr></table>\n"
+        f"<table border=1>\n{rows}\n</table>\n"
+        "</body></html>\n"
+    )
+
+
+class StandinState:
+    """Knobs and counters shared by the request handlers."""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, depth=40,
+                 bcb_rotate=False, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.depth = depth
+        self.bcb_rotate = bcb_rotate
+        self.seed = seed
+        self.counts = {"binance": 0, "bcb": 0, "bcb_not_modified": 0, "errors": 0}
+        self._bcb_day = datetime.utcnow().date()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        time.sleep(self.latency + extra)
+
+    def next_bcb_day(self):
+        with self._lock:
+            day = self._bcb_day
+            if self.bcb_rotate:
+                self._bcb_day += timedelta(days=1)
+            return day
+
+    def search_page(self, payload):
+        """One adv/search response: `depth` ads per (fiat, side) book."""
+        fiat = str(payload.get("fiat", "USD")).upper()
+        side = str(payload.get("tradeType", "BUY")).upper()
+        asset = str(payload.get("asset", "USDT")).upper()
+        page = int(payload.get("page", 1))
+        rows = int(payload.get("rows", 20))
+
+        base, decimals = FIAT_PRICES.get(fiat, (1.0, 3))
+        base *= ASSET_PRICES.get(asset, 1.0)
+        # Prices move between requests, as on the live book
+        rng = random.Random(f"{self.seed}:{asset}:{fiat}:{side}:{time.time_ns()}")
+        drift = rng.uniform(-0.002, 0.002)
+        step = 0.0004 if side == "BUY" else -0.0004
+
+        data = []
+        for i in range((page - 1) * rows, min(page * rows, self.depth)):
+            price = base * (1 + drift + step * i)
+            min_amount = rng.choice([10, 20, 50, 100, 500]) * max(1, int(base))
+            merchant = f"{fiat.lower()}_merchant_{(i * 7 + (side == 'SELL')) % 97:02d}"
+            data.append({
+                "adv": {
+                    "advNo": f"{asset}{fiat}{side}{i:05d}",
+                    "tradeType": side,
+                    "asset": asset,
+                    "fiatUnit": fiat,
+                    "price": f"{price:.{decimals}f}",
+                    "minSingleTransAmount": f"{min_amount:.2f}",
+                    "maxSingleTransAmount": f"{min_amount * rng.randint(5, 200):.2f}",
+                    "tradeMethods": [
+                        {"identifier": m}
+                        for m in rng.sample(PAYMENT_METHODS, rng.randint(1, 3))
+                    ],
+                },
+                "advertiser": {
+                    "userNo": hashlib.md5(merchant.encode()).hexdigest(),
+                    "nickName": merchant,
+                    "monthFinishRate": round(rng.uniform(0.85, 1.0), 3),
+                    "positiveRate": round(rng.uniform(0.9, 1.0), 4),
+                },
+            })
+
+        return {"code": "000000", "message": None, "data": data,
+                "total": self.depth, "success": True}
+
+
+def make_handler(state):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _injected_error(self):
+            if state.fail():
+                state.count("errors")
+                self._send(503, b'{"code":"503","message":"stand-in error"}')
+                return True
+            return False
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            if self.path.split("?")[0] != BINANCE_PATH:
+                self._send(404)
+                return
+
+            state.delay()
+            if self._injected_error():
+                return
+            state.count("binance")
+            payload = json.loads(body or b"{}")
+            self._send(200, json.dumps(state.search_page(payload)).encode("utf-8"))
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == STATS_PATH:
+                self._send(200, json.dumps(state.counts).encode("utf-8"))
+                return
+            if path != BCB_PATH:
+                self._send(404)
+                return
+
+            state.delay()
+            if self._injected_error():
+                return
+            state.count("bcb")
+            html = bcb_page_html(state.next_bcb_day()).encode("utf-8")
+            etag = '"' + hashlib.md5(html).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                state.count("bcb_not_modified")
+                self._send(304, headers={"ETag": etag})
+                return
+            self._send(200, html, content_type="text/html; charset=utf-8",
+                       headers={"ETag": etag})
+
+    return Handler
+
+
+class StandinServer:
+    """Threaded stand-in server; port=0 picks a free port."""
+
+    def __init__(self, host="127.0.0.1", port=0, **knobs):
+        self.state = StandinState(**knobs)
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def binance_url(self):
+        return self.base_url + BINANCE_PATH
+
+    @property
+    def bcb_url(self):
+        return self.base_url + BCB_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Binance and BCB endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--depth", type=int, default=40, help="ads per (fiat, side) book")
+    parser.add_argument("--bcb-rotate", action="store_true",
+                        help="advance the BCB page date on every request (no 304s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandinServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, depth=args.depth, bcb_rotate=args.bcb_rotate, seed=args.seed,
+    )
+    # First line is read by benchmark.py to find the port
+    print(f"listening on {server.base_url}", flush=True)
+    print(f"  BINANCE_P2P_URL={server.binance_url}", flush=True)
+    print(f"  BCB_RATES_URL={server.bcb_url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import argparse
+
+from binance.replay import replay_binance
+from bcb.replay import replay_bcb
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Re-run parse/clean/store from the raw response archive (no network)"
+    )
+    parser.add_argument("--source", choices=["binance", "bcb", "all"], default="all")
+    parser.add_argument("--from-run", type=int, default=None,
+                        help="first Binance run index to replay")
+    parser.add_argument("--to-run", type=int, default=None,
+                        help="last Binance run index to replay")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="move the processed data aside and rebuild it from the archive")
+    parser.add_argument("--allow-history-loss", action="store_true",
+                        help="let --rebuild drop Binance runs that have no archive segment")
+    args = parser.parse_args()
+
+    if args.source in ("binance", "all"):
+        replay_binance(
+            first_run=args.from_run, last_run=args.to_run, rebuild=args.rebuild,
+            allow_history_loss=args.allow_history_loss,
+        )
+    if args.source in ("bcb", "all"):
+        replay_bcb(rebuild=args.rebuild)
@@ -1,29 +1,83 @@
 import os
 import time
+import argparse
 from datetime import datetime, UTC
 import socket
+from urllib.parse import urlparse
 
+from binance.base_scraper import P2P_SEARCH_URL
 from binance.update_binance import update_binance
+from binance.read_processed import export_legacy_files
 from bcb.update_bcb import update_bcb
+from bcb.bcb_page import last_bcb_page
+from common import metrics
+from common.scheduler import Scheduler
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
-logs_dir = os.path.join(base_dir, "..", "logs")
+logs_dir = os.environ.get("PHASE1_LOGS_DIR", os.path.join(base_dir, "..", "logs"))
 
 binance_log_dir = os.path.join(logs_dir, "binance")
 bcb_log_dir = os.path.join(logs_dir, "bcb")
+metrics_dir = os.path.join(logs_dir, "metrics")
 
-for d in [logs_dir, binance_log_dir, bcb_log_dir]:
+for d in [logs_dir, binance_log_dir, bcb_log_dir, metrics_dir]:
     os.makedirs(d, exist_ok=True)
 
-today = datetime.now(UTC).strftime("%Y-%m-%d")
+# Prometheus textfile, rewritten after every run; point it at the
+# node_exporter textfile collector directory to scrape it
+metrics_textfile = os.environ.get(
+    "PHASE1_METRICS_TEXTFILE", os.path.join(metrics_dir, "pipeline.prom")
+)
 
-binance_log_file = os.path.join(binance_log_dir, f"binance_{today}.log")
-bcb_log_file = os.path.join(bcb_log_dir, f"bcb_{today}.log")
+# Daemon cadence: Binance every minute, BCB around its daily publication
+# (the next day's table appears between ~19:45 and ~22:00 UTC in the raw
+# runs). Checks of an unchanged page only cost a 304.
+BINANCE_EVERY = 60
+BCB_AT_UTC = ["20:00", "21:00", "22:00", "23:00"]
 
 
-def write_log(path, text):
+def binance_log_file():
+    today = datetime.now(UTC).strftime("%Y-%m-%d")
+    return os.path.join(binance_log_dir, f"binance_{today}.log")
+
+
+def bcb_log_file():
+    today = datetime.now(UTC).strftime("%Y-%m-%d")
+    return os.path.join(bcb_log_dir, f"bcb_{today}.log")
+
+
+def metrics_log_file():
+    today = datetime.now(UTC).strftime("%Y-%m-%d")
+    return os.path.join(metrics_dir, f"pipeline_{today}.jsonl")
+
+
+def write_log(path, *lines):
     with open(path, "a", encoding="utf-8") as f:
-        f.write(text + "\n")
+        f.write("".join(line + "\n" for line in lines))
+
+
+def stages_line(source, mark):
+    """Time spent per stage by the run whose spans start at `mark`."""
+    totals = metrics.get_metrics().span_totals(since=mark, source=source)
+    return "Stages: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in totals.items())
+
+
+def finish_run(source, start, error=None):
+    """Records the outcome of a run and flushes the metrics files."""
+    duration = round(time.time() - start, 2)
+    metrics.set_gauge("last_run_timestamp_seconds", round(time.time(), 3), source=source)
+    metrics.set_gauge("last_run_success", 0 if error else 1, source=source)
+    metrics.set_gauge("last_run_duration_seconds", duration, source=source)
+    metrics.event(
+        "run", source=source, seconds=duration,
+        status="error" if error else "success", error=str(error) if error else None,
+    )
+
+    metrics.configure(jsonl_path=metrics_log_file(), prom_path=metrics_textfile)
+    try:
+        metrics.flush()
+    except OSError as e:
+        print(f"Metrics not written: {e}")
 
 
 def has_internet(host="8.8.8.8", port=53, timeout=3):
@@ -35,37 +89,60 @@ def has_internet(host="8.8.8.8", port=53, timeout=3):
         return False
 
 
-if __name__ == "__main__":
-
-    if not has_internet():
-        print("No internet connection — skipping pipeline.")
-        write_log(binance_log_file, "Skip due to no internet connection.")
-        write_log(bcb_log_file, "Skip due to no internet connection.")
-        exit(0)
-
-    pipeline_start = time.time()
-
+def connectivity_probe():
+    """
+    (host, port) checked before a one-shot run: a public DNS server, or
+    the Binance endpoint itself when BINANCE_P2P_URL points elsewhere
+    (e.g. the local stand-in server on an offline machine).
+    """
+    if "BINANCE_P2P_URL" in os.environ:
+        url = urlparse(P2P_SEARCH_URL)
+        return url.hostname, url.port or (443 if url.scheme == "https" else 80)
+    return "8.8.8.8", 53
+
+
+def run_binance(stream=False, export_legacy=False):
+    """
+    One Binance run. With export_legacy=True the single compatibility
+    files (historical_fiat/, daily_snapshots/, p2p_master.parquet) are
+    rebuilt from the master dataset afterwards, so the copies the CI job
+    commits stay current.
+    """
     print("=== Running Binance Pipeline ===")
+    log_file = binance_log_file()
     start = time.time()
-    write_log(binance_log_file, "\nRunning Binance Pipeline")
-    write_log(binance_log_file, f"Start (UTC): {datetime.now(UTC)}")
+    mark = metrics.get_metrics().mark()
+    lines = ["\nRunning Binance Pipeline", f"Start (UTC): {datetime.now(UTC)}"]
+    error = None
 
     try:
-        update_binance()
+        update_binance(stream=stream)
+        if export_legacy:
+            with metrics.span("export_legacy", source="binance"):
+                export_legacy_files()
         end = time.time()
         duration = round(end - start, 2)
 
-        write_log(binance_log_file, f"End (UTC): {datetime.now(UTC)}")
-        write_log(binance_log_file, f"Duration: {duration} seconds")
-        write_log(binance_log_file, "Status: success")
+        lines.append(f"End (UTC): {datetime.now(UTC)}")
+        lines.append(f"Duration: {duration} seconds")
+        lines.append(stages_line("binance", mark))
+        lines.append("Status: success")
 
     except Exception as e:
-        write_log(binance_log_file, f"Error: {str(e)}")
+        error = e
+        lines.append(f"Error: {str(e)}")
+
+    write_log(log_file, *lines)
+    finish_run("binance", start, error)
+
 
+def run_bcb():
     print("=== Running BCB Pipeline ===")
+    log_file = bcb_log_file()
     start = time.time()
-    write_log(bcb_log_file, "\nRunning BCB Pipeline")
-    write_log(bcb_log_file, f"Start (UTC): {datetime.now(UTC)}")
+    mark = metrics.get_metrics().mark()
+    lines = ["\nRunning BCB Pipeline", f"Start (UTC): {datetime.now(UTC)}"]
+    error = None
 
     try:
         df_fx = update_bcb()
@@ -73,22 +150,94 @@ if __name__ == "__main__":
         end = time.time()
         duration = round(end - start, 2)
 
-        write_log(bcb_log_file, f"End (UTC): {datetime.now(UTC)}")
-        write_log(bcb_log_file, f"Duration: {duration} seconds")
+        lines.append(f"End (UTC): {datetime.now(UTC)}")
+        lines.append(f"Duration: {duration} seconds")
+        lines.append(stages_line("bcb", mark))
 
-        from bcb.scrape_bcb import get_bcb_date
-        extracted_date = get_bcb_date()
-        write_log(bcb_log_file, f"Extracted date: {extracted_date}")
+        # Date of the page update_bcb fetched in this run (no second
+        # download); update_bcb resets it first, so it is never a previous run's
+        page = last_bcb_page()
+        extracted_date = page.date if page is not None else None
+        lines.append(f"Extracted date: {extracted_date}")
 
         if df_fx is None:
-            write_log(bcb_log_file, "Skip: true")
+            lines.append("Skip: true")
         else:
-            write_log(bcb_log_file, "Skip: false")
+            lines.append("Skip: false")
 
-        write_log(bcb_log_file, "Status: success")
+        lines.append("Status: success")
 
     except Exception as e:
-        write_log(bcb_log_file, f"Error: {str(e)}")
+        error = e
+        lines.append(f"Error: {str(e)}")
+
+    write_log(log_file, *lines)
+    finish_run("bcb", start, error)
+
+
+def run_once(stream=False, export_legacy=True):
+    if not has_internet(*connectivity_probe()):
+        print("No internet connection — skipping pipeline.")
+        write_log(binance_log_file(), "Skip due to no internet connection.")
+        write_log(bcb_log_file(), "Skip due to no internet connection.")
+        return
+
+    pipeline_start = time.time()
+
+    run_binance(stream=stream, export_legacy=export_legacy)
+    run_bcb()
 
     total_time = round(time.time() - pipeline_start, 2)
-    print(f"Total pipeline runtime: {total_time} seconds")
\ No newline at end of file
+    print(f"Total pipeline runtime: {total_time} seconds")
+
+
+def run_daemon(binance_every=BINANCE_EVERY, bcb_at=BCB_AT_UTC, bcb_every=None,
+               stream=False):
+    """
+    Long-running mode: one process schedules both sources, keeping the
+    imported modules and the pooled HTTP connections warm between runs.
+    Runs of the same source never overlap (a run still in progress skips
+    its next slot) and SIGTERM/SIGINT stop after the running jobs finish.
+    No connectivity probe is made: a failed run is logged like any error,
+    and the compatibility files are not exported (see run_binance).
+    With stream=True Binance runs use the streaming ingest of update_binance.
+    """
+    scheduler = Scheduler()
+    scheduler.add("binance", lambda: run_binance(stream=stream), every=binance_every)
+    if bcb_every:
+        scheduler.add("bcb", run_bcb, every=bcb_every)
+    else:
+        scheduler.add("bcb", run_bcb, at=bcb_at)
+    scheduler.install_signal_handlers()
+
+    bcb_cadence = f"every {bcb_every}s" if bcb_every else f"at {', '.join(bcb_at)} UTC"
+    print(f"Pipeline daemon started: Binance every {binance_every}s, BCB {bcb_cadence}")
+    scheduler.run()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Binance P2P and BCB data pipeline")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run continuously with the in-process scheduler")
+    parser.add_argument("--binance-every", type=float, default=BINANCE_EVERY,
+                        help="seconds between Binance runs (daemon)")
+    parser.add_argument("--bcb-at", default=",".join(BCB_AT_UTC),
+                        help="comma-separated UTC times of day for BCB runs (daemon)")
+    parser.add_argument("--bcb-every", type=float, default=None,
+                        help="seconds between BCB runs, instead of --bcb-at (daemon)")
+    parser.add_argument("--stream", action="store_true",
+                        help="store Binance pages as they arrive (streaming ingest)")
+    parser.add_argument("--no-legacy-export", action="store_true",
+                        help="skip rebuilding historical_fiat/ and daily_snapshots/ (one-shot run)")
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_daemon(
+            binance_every=args.binance_every,
+            bcb_at=[t for t in args.bcb_at.split(",") if t.strip()],
+            bcb_every=args.bcb_every,
+            stream=args.stream,
+        )
+    else:
+        run_once(stream=args.stream, export_legacy=not args.no_legacy_export)
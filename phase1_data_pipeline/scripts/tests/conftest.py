@@ -0,0 +1,59 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from binance import base_scraper, paths_binance
+from binance import snapshot_and_master  # noqa: F401  (loads every store module)
+from binance.base_scraper import p2p_to_columns
+from binance.clean_standardize import clean_decoded
+from binance.multi_fetch import SIDES, to_frame
+from common.standin_server import StandinServer, StandinState
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Points the data paths of every loaded Phase 1 module at an empty directory."""
+    old = paths_binance.DATA_DIR
+    for name, module in list(sys.modules.items()):
+        if module is None or name.split(".")[0] not in ("binance", "bcb", "common"):
+            continue
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, str) and value.startswith(old):
+                monkeypatch.setattr(module, attr, str(tmp_path) + value[len(old):])
+    return tmp_path
+
+
+@pytest.fixture
+def standin():
+    """A stand-in Binance/BCB server without added latency."""
+    server = StandinServer(latency=0.0).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def binance_standin(standin, monkeypatch):
+    """Sends the Binance searches of the scrapers to the stand-in server."""
+    monkeypatch.setattr(base_scraper, "P2P_SEARCH_URL", standin.binance_url)
+    return standin
+
+
+def run_frame(run_index, timestamp="2025-12-07T10:00:00Z", fiats=("BOB", "ARS"), depth=10,
+              asset="USDT"):
+    """Cleaned rows of one run, decoded from stand-in server responses."""
+    book = StandinState(depth=depth, seed=run_index)
+    frames = []
+    for fiat in fiats:
+        parts = [
+            p2p_to_columns(book.search_page({"asset": asset, "fiat": fiat, "tradeType": side}),
+                           side, timestamp)
+            for side in SIDES
+        ]
+        frames.append(clean_decoded(to_frame(parts, run_index)))
+    return pd.concat(frames, ignore_index=True)
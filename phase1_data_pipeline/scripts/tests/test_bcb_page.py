@@ -0,0 +1,77 @@
+import os
+
+import pytest
+import requests
+
+from bcb import bcb_page
+from bcb.bcb_page import fetch_bcb_page, last_bcb_page, reset_bcb_page
+
+
+def test_unchanged_page_costs_a_304(data_dir, standin, monkeypatch):
+    monkeypatch.setattr(bcb_page, "BCB_RATES_URL", standin.bcb_url)
+
+    first = fetch_bcb_page()
+    second = fetch_bcb_page()
+
+    assert not first.not_modified and second.not_modified
+    assert standin.state.counts["bcb_not_modified"] == 1
+    assert second.date == first.date is not None
+    assert second.rates.equals(first.rates)
+    assert last_bcb_page() is second
+    assert os.path.dirname(bcb_page.PAGE_CACHE_HTML) == str(data_dir / "state" / "bcb")
+
+    reset_bcb_page()
+    assert last_bcb_page() is None
+
+
+def test_changed_page_is_downloaded_again(data_dir, standin, monkeypatch):
+    monkeypatch.setattr(bcb_page, "BCB_RATES_URL", standin.bcb_url)
+    standin.state.bcb_rotate = True
+
+    first = fetch_bcb_page()
+    second = fetch_bcb_page()
+
+    assert not second.not_modified
+    assert second.date > first.date
+
+
+def _response(status, text=""):
+    response = requests.Response()
+    response.status_code = status
+    response._content = text.encode("utf-8")
+    response.encoding = "utf-8"
+    return response
+
+
+class ScriptedClient:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.sent.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def test_304_without_a_cached_copy_falls_back_to_a_plain_get(data_dir, standin, monkeypatch):
+    html = requests.get(standin.bcb_url).text
+    client = ScriptedClient(_response(304), _response(200, html))
+    monkeypatch.setattr(bcb_page, "get_client", lambda: client)
+
+    page = fetch_bcb_page()
+
+    assert len(client.sent) == 2
+    assert "If-None-Match" not in client.sent[1]
+    assert not page.not_modified and page.date is not None
+
+
+def test_error_page_is_returned_but_not_cached(data_dir, monkeypatch):
+    client = ScriptedClient(_response(503, "<html>maintenance</html>"))
+    monkeypatch.setattr(bcb_page, "get_client", lambda: client)
+
+    page = fetch_bcb_page()
+
+    assert page.html == "<html>maintenance</html>"
+    assert not os.path.exists(bcb_page.PAGE_CACHE_HTML)
+    with pytest.raises(ValueError, match="rate table not found"):
+        page.rates
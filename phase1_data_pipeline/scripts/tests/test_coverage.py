@@ -0,0 +1,76 @@
+import json
+
+import pandas as pd
+import pytest
+
+from binance import paths_binance
+from binance.p2p_store import append_run
+from binance.read_processed import available_assets, available_currencies, read_master
+from binance.row_key import compute_row_keys
+from binance.snapshot_and_master import partition_by_asset, prepare_processed, store_processed
+from common.coverage import DEFAULT_ASSET, DEFAULT_FIATS, load_coverage
+from conftest import run_frame
+
+
+def write_coverage(tmp_path, config):
+    path = tmp_path / "coverage.json"
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_missing_file_gives_the_original_coverage(tmp_path):
+    coverage = load_coverage(str(tmp_path / "missing.json"))
+    assert coverage == {"assets": [DEFAULT_ASSET], "fiats": DEFAULT_FIATS}
+
+
+def test_codes_are_upper_cased_and_deduplicated(tmp_path):
+    path = write_coverage(tmp_path, {"assets": ["usdt", " USDC", "USDT"], "fiats": ["bob", "ARS"]})
+    assert load_coverage(path) == {"assets": ["USDT", "USDC"], "fiats": ["BOB", "ARS"]}
+
+
+@pytest.mark.parametrize("config", [
+    {"assets": "USDT"},
+    {"fiats": ["BOB", "AR S"]},
+    {"fiats": ["BOB", ""]},
+])
+def test_malformed_coverage_is_rejected(tmp_path, config):
+    with pytest.raises(ValueError):
+        load_coverage(write_coverage(tmp_path, config))
+
+
+def test_assets_are_stored_and_read_apart(data_dir):
+    usdt = run_frame(1, fiats=("BOB",))
+    usdc = run_frame(1, fiats=("BOB", "ARS"), asset="USDC")
+    store_processed(pd.concat([usdt, usdc], ignore_index=True))
+
+    assert available_assets() == ["USDC", "USDT"]
+    assert available_currencies(assets=["USDT"]) == ["BOB"]
+    assert available_currencies() == ["ARS", "BOB"]
+
+    rows = read_master(assets=["USDC"], columns=["asset", "currency"])
+    assert len(rows) == len(usdc)
+    assert set(rows["asset"]) == {"USDC"}
+
+
+def test_asset_is_part_of_the_row_key_except_for_the_default():
+    df = run_frame(1, fiats=("BOB",))
+    without_asset = df.drop(columns="asset")
+
+    # USDT rows keep the keys of the single-asset layout
+    assert (compute_row_keys(df) == compute_row_keys(without_asset)).all()
+    as_usdc = compute_row_keys(df.assign(asset="USDC"))
+    assert not (as_usdc == compute_row_keys(df)).any()
+
+
+def test_legacy_fragments_move_under_the_default_asset(data_dir):
+    df = prepare_processed(run_frame(1, fiats=("BOB",))).drop(columns="asset")
+    dataset_dir = paths_binance.MASTER_DATASET_DIR
+    append_run(df, dataset_dir, 1, ("currency", "date"))
+
+    assert partition_by_asset(dataset_dir) == 1
+    assert partition_by_asset(dataset_dir) == 0
+
+    assert available_assets() == [DEFAULT_ASSET]
+    rows = read_master(assets=[DEFAULT_ASSET], columns=["asset", "price"])
+    assert len(rows) == len(df)
+    assert set(rows["asset"]) == {DEFAULT_ASSET}
@@ -0,0 +1,64 @@
+import pytest
+import requests
+
+from common.http_client import HttpClient
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(backoff=0.0)
+    yield client
+    client.close()
+
+
+def test_success_is_recorded(standin, client):
+    response = client.get(standin.bcb_url, tags={"fiat": "BOB"})
+
+    assert response.status_code == 200
+    [entry] = client.stats
+    assert entry["ok"] and entry["retries"] == 0 and entry["fiat"] == "BOB"
+
+
+def test_retries_are_max_retries_plus_one_attempts(standin, client):
+    standin.state.error_rate = 1.0
+
+    with pytest.raises(requests.HTTPError):
+        client.get(standin.bcb_url, max_retries=2)
+
+    assert standin.state.counts["errors"] == 3
+    [entry] = client.stats
+    assert (entry["status"], entry["retries"], entry["ok"]) == (503, 2, False)
+
+
+def test_no_retries_still_sends_one_request(standin, client):
+    standin.state.error_rate = 1.0
+
+    with pytest.raises(requests.HTTPError):
+        client.get(standin.bcb_url, max_retries=0)
+
+    assert standin.state.counts["errors"] == 1
+    assert len(client.stats) == 1
+
+    with pytest.raises(ValueError):
+        client.get(standin.bcb_url, max_retries=-1)
+
+
+def test_client_errors_are_not_retried(standin, client):
+    with pytest.raises(requests.HTTPError):
+        client.get(standin.base_url + "/missing")
+
+    response = client.get(standin.base_url + "/missing", raise_for_status=False)
+    assert response.status_code == 404
+    assert [entry["retries"] for entry in client.stats] == [0, 0]
+    assert not any(entry["ok"] for entry in client.stats)
+
+
+def test_summary_since_mark_covers_later_requests_only(standin, client):
+    client.get(standin.bcb_url)
+    mark = client.mark()
+    client.get(standin.bcb_url)
+    client.get(standin.base_url + "/missing", raise_for_status=False)
+
+    [host] = client.summary(since=mark).values()
+    assert (host["requests"], host["failures"]) == (2, 1)
+    assert client.summary()[standin.base_url.split("//")[1]]["requests"] == 3
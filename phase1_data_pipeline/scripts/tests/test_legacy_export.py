@@ -0,0 +1,26 @@
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from binance.read_processed import export_legacy_files, read_historical_fiat
+from binance.schema import to_legacy_frame
+from binance.snapshot_and_master import store_processed
+from conftest import run_frame
+
+
+def test_exports_match_the_master_dataset(data_dir):
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    store_processed(run_frame(1, timestamp=now))
+
+    version = export_legacy_files()
+
+    binance_dir = os.path.join(data_dir, "processed", "binance")
+    for fiat in ("ARS", "BOB"):
+        exported = pd.read_parquet(os.path.join(binance_dir, "historical_fiat", f"{fiat}.parquet"))
+        expected = to_legacy_frame(read_historical_fiat(fiat, version=version))
+        pd.testing.assert_frame_equal(exported, expected.reset_index(drop=True))
+
+    [snapshot] = os.listdir(os.path.join(binance_dir, "daily_snapshots"))
+    assert len(pd.read_parquet(os.path.join(binance_dir, "daily_snapshots", snapshot))) == \
+        len(pd.read_parquet(os.path.join(binance_dir, "p2p_master.parquet")))
@@ -0,0 +1,113 @@
+import os
+import threading
+
+import pytest
+
+from binance import manifest
+
+
+def _write(dataset_dir, rel):
+    path = os.path.join(dataset_dir, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+    return rel
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "master")
+    os.makedirs(path)
+    return path
+
+
+def test_files_are_only_visible_once_committed(dataset):
+    manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/run_000001.parquet")])
+    _write(dataset, "date=2025-12-07/run_000002.parquet")
+
+    assert manifest.load_snapshot(dataset).files == ["date=2025-12-07/run_000001.parquet"]
+
+
+def test_failed_commit_publishes_nothing(dataset, monkeypatch):
+    manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/run_000001.parquet")])
+    before = manifest.current_version(dataset)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manifest.os, "link", fail)
+    with pytest.raises(OSError):
+        manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/run_000002.parquet")])
+
+    assert manifest.current_version(dataset) == before
+    assert manifest.load_snapshot(dataset).files == ["date=2025-12-07/run_000001.parquet"]
+    assert all(name.endswith(".json") for name in os.listdir(os.path.join(dataset, "_manifest")))
+
+
+def test_concurrent_commits_get_distinct_versions(dataset):
+    first = manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/run_000000.parquet")])
+    files = [_write(dataset, f"date=2025-12-07/run_{i:06d}.parquet") for i in range(1, 9)]
+    versions = []
+
+    def commit(rel):
+        versions.append(manifest.commit(dataset, add=[rel]))
+
+    threads = [threading.Thread(target=commit, args=(rel,)) for rel in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(versions) == list(range(first + 1, first + 9))
+    assert set(files) <= set(manifest.load_snapshot(dataset).files)
+
+
+def test_pinned_snapshot_ignores_later_commits(dataset):
+    old = _write(dataset, "date=2025-12-07/run_000001.parquet")
+    version = manifest.commit(dataset, add=[old])
+    new = _write(dataset, "date=2025-12-07/compacted.parquet")
+    manifest.commit(dataset, add=[new], remove=[old])
+
+    assert manifest.load_snapshot(dataset, version).files == [old]
+    assert manifest.load_snapshot(dataset).files == [new]
+    assert manifest.changes(dataset, version) == ({new}, {old})
+
+
+def test_vacuum_keeps_removed_files_within_retention(dataset):
+    old = _write(dataset, "date=2025-12-07/run_000001.parquet")
+    version = manifest.commit(dataset, add=[old])
+    manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/compacted.parquet")], remove=[old])
+
+    assert manifest.vacuum(dataset, retention=3600) == 0
+    assert os.path.exists(os.path.join(dataset, "date=2025-12-07", "run_000001.parquet"))
+    assert manifest.load_snapshot(dataset, version).files == [old]
+
+    # Every commit is now older than the retention window
+    assert manifest.vacuum(dataset, retention=-1) == 1
+    assert not os.path.exists(os.path.join(dataset, "date=2025-12-07", "run_000001.parquet"))
+    assert os.path.exists(os.path.join(dataset, "date=2025-12-07", "compacted.parquet"))
+
+
+def test_versions_before_the_last_old_checkpoint_expire(dataset, monkeypatch):
+    monkeypatch.setattr(manifest, "CHECKPOINT_EVERY", 2)
+    for i in range(1, 5):
+        manifest.commit(dataset, add=[_write(dataset, f"date=2025-12-07/run_{i:06d}.parquet")])
+
+    manifest.vacuum(dataset, retention=-1)
+
+    with pytest.raises(manifest.SnapshotExpired):
+        manifest.load_snapshot(dataset, 1)
+    with pytest.raises(manifest.SnapshotExpired):
+        manifest.changes(dataset, 1)
+    assert len(manifest.load_snapshot(dataset, 4).files) == 4
+
+
+def test_recreated_dataset_does_not_reuse_cached_snapshots(dataset):
+    manifest.commit(dataset, add=[_write(dataset, "date=2025-12-07/run_000001.parquet")])
+    assert manifest.load_snapshot(dataset, 1).files == ["date=2025-12-07/run_000001.parquet"]
+
+    os.replace(dataset, dataset + ".old")
+    os.makedirs(dataset)
+    manifest.commit(dataset, add=[_write(dataset, "date=2025-12-08/run_000002.parquet")])
+
+    assert manifest.load_snapshot(dataset, 1).files == ["date=2025-12-08/run_000002.parquet"]
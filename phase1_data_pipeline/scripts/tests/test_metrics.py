@@ -0,0 +1,85 @@
+import json
+
+import pytest
+import requests
+
+from common import metrics
+from common.http_client import HttpClient
+from common.metrics import Metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh registry behind the module-level functions."""
+    fresh = Metrics()
+    monkeypatch.setattr(metrics, "_metrics", fresh)
+    return fresh
+
+
+def test_flush_writes_events_and_textfile(registry, tmp_path):
+    jsonl, prom = tmp_path / "events.jsonl", tmp_path / "pipeline.prom"
+    metrics.configure(jsonl_path=str(jsonl), prom_path=str(prom))
+
+    with metrics.span("store", source="binance"):
+        pass
+    metrics.inc("rows_written_total", 40, source="binance", dataset="master")
+    metrics.set_gauge("last_run_success", 1, source="binance")
+    metrics.observe("http_request_seconds", 0.2, host="h")
+    metrics.flush()
+    metrics.event("run", source="binance")
+    metrics.flush()
+
+    events = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert [e["event"] for e in events] == ["span", "run"]
+    assert events[0]["name"] == "store" and events[0]["status"] == "ok"
+
+    text = prom.read_text()
+    assert "# HELP p2p_http_request_seconds HTTP latency of each attempt, waits excluded" in text
+    assert 'p2p_rows_written_total{dataset="master",source="binance"} 40' in text
+    assert 'p2p_last_run_success{source="binance"} 1' in text
+    assert 'p2p_http_request_seconds_bucket{host="h",le="0.1"} 0' in text
+    assert 'p2p_http_request_seconds_bucket{host="h",le="0.25"} 1' in text
+    assert 'p2p_http_request_seconds_count{host="h"} 1' in text
+
+
+def test_span_totals_survive_dropped_events(registry, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "RETAINED_EVENTS", 3)
+    metrics.configure(jsonl_path=str(tmp_path / "events.jsonl"))
+    for _ in range(10):
+        metrics.event("noise")
+    metrics.flush()
+
+    mark = registry.mark()
+    with metrics.span("fetch", source="bcb"):
+        pass
+    metrics.event("noise")
+    metrics.flush()
+
+    assert len(registry.events) == 3
+    assert set(registry.span_totals(since=mark, source="bcb")) == {"fetch"}
+    assert registry.span_totals(since=registry.mark()) == {}
+
+
+def test_http_attempts_and_waits_are_observed_apart(registry, standin):
+    standin.state.error_rate = 1.0
+    client = HttpClient(backoff=0.05)
+    try:
+        with pytest.raises(requests.HTTPError):
+            client.get(standin.bcb_url, max_retries=2, tags={"fiat": "BOB"})
+    finally:
+        client.close()
+
+    host = standin.base_url.split("//")[1]
+    [attempts] = [h for (n, _), h in registry.histograms.items() if n == "http_request_seconds"]
+    waits = {dict(key)["reason"]: h for (n, key), h in registry.histograms.items()
+             if n == "http_wait_seconds"}
+
+    assert attempts.count == 3
+    assert waits["rate_limit"].count == waits["backoff"].count == 1
+    # jittered backoff: at least half of 0.05 + 0.1
+    assert waits["backoff"].sum >= 0.075
+    assert attempts.sum < waits["backoff"].sum
+    assert registry.counters[("http_retries_total", (("host", host),))] == 2
+
+    [entry] = client.stats
+    assert entry["wait_s"] >= 0.075 and entry["latency_s"] < entry["wait_s"]
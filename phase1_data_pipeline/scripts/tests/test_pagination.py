@@ -0,0 +1,61 @@
+from binance import multi_fetch
+from binance.multi_fetch import ROWS_PER_PAGE, p2p_fetch_side
+from common.standin_server import StandinState
+
+
+def serve(monkeypatch, depth, bad=()):
+    """Answers p2p_query from a stand-in book; ads at positions `bad` lose their price."""
+    book = StandinState(depth=depth)
+    pages = []
+
+    def p2p_query(asset, fiat, side, page=1, rows=ROWS_PER_PAGE):
+        pages.append(page)
+        response = book.search_page({"asset": asset, "fiat": fiat, "tradeType": side,
+                                     "page": page, "rows": rows})
+        for i, item in enumerate(response["data"], start=(page - 1) * rows):
+            if i in bad:
+                item["adv"]["price"] = "n/a"
+        return response
+
+    monkeypatch.setattr(multi_fetch, "p2p_query", p2p_query)
+    return pages
+
+
+def test_walks_until_total_is_exhausted(monkeypatch):
+    pages = serve(monkeypatch, depth=2 * ROWS_PER_PAGE)
+
+    columns = p2p_fetch_side("USDT", "BOB", "BUY", {"max_ads": 1000})
+
+    assert pages == [1, 2]
+    assert len(columns["price"]) == 2 * ROWS_PER_PAGE
+
+
+def test_skipped_ads_do_not_stop_the_walk(monkeypatch):
+    pages = serve(monkeypatch, depth=3 * ROWS_PER_PAGE, bad={3, ROWS_PER_PAGE + 1})
+
+    columns = p2p_fetch_side("USDT", "BOB", "BUY", {"max_ads": 1000})
+
+    assert pages == [1, 2, 3]
+    assert len(columns["price"]) == 3 * ROWS_PER_PAGE - 2
+
+
+def test_stop_rule_and_max_pages(monkeypatch):
+    pages = serve(monkeypatch, depth=5 * ROWS_PER_PAGE)
+    columns = p2p_fetch_side("USDT", "BOB", "BUY", {"max_ads": ROWS_PER_PAGE + 5})
+    assert pages == [1, 2]
+    assert len(columns["price"]) == ROWS_PER_PAGE + 5
+
+    pages.clear()
+    p2p_fetch_side("USDT", "BOB", "BUY", {"max_price_distance": 1.0}, max_pages=3)
+    assert pages == [1, 2, 3]
+
+
+def test_streamed_pages_keep_only_stop_rule_columns(monkeypatch):
+    serve(monkeypatch, depth=ROWS_PER_PAGE + 3)
+    seen = []
+
+    columns = p2p_fetch_side("USDT", "BOB", "SELL", {"max_ads": 1000},
+                             on_page=lambda page, cols: seen.append((page, len(cols["price"]))))
+
+    assert seen == [(1, ROWS_PER_PAGE), (2, 3)]
+    assert set(columns) == {"price", "max_amount"}
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from common.rate_limiter import TokenBucket, configure_rate_limit, get_rate_limiter
+
+
+def test_burst_is_free_then_tokens_come_at_the_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
+
+
+def test_threads_share_one_budget():
+    bucket = TokenBucket(rate=100, burst=1)
+
+    def take():
+        for _ in range(5):
+            bucket.acquire()
+
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 20 tokens, one of them from the burst
+    assert time.monotonic() - start >= 19 / 100 * 0.9
+
+
+def test_one_bucket_per_host():
+    a = get_rate_limiter("https://limiter-a.test/x?page=1")
+    assert get_rate_limiter("https://limiter-a.test/y") is a
+    assert get_rate_limiter("limiter-a.test") is a
+    assert get_rate_limiter("https://limiter-b.test/x") is not a
+
+    b = configure_rate_limit("https://limiter-a.test", rate=2, burst=1)
+    assert get_rate_limiter("https://limiter-a.test/x") is b
+    assert (b.rate, b.burst) == (2.0, 1.0)
+
+
+def test_rate_must_be_positive():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
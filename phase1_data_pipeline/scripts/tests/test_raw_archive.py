@@ -0,0 +1,56 @@
+import threading
+
+from common.raw_archive import (
+    archive_response,
+    archive_run,
+    list_segments,
+    read_segment,
+    run_in_context,
+)
+
+
+def _bodies(path):
+    return [record["body"] for record in read_segment(path)[1]]
+
+
+def test_concurrent_runs_keep_their_own_segment(tmp_path):
+    opened = threading.Barrier(2)
+
+    def run(key):
+        with archive_run(str(tmp_path), "src", key, meta={"run": key}):
+            opened.wait()
+            for i in range(20):
+                archive_response("src", body=f"{key}:{i}")
+
+    threads = [threading.Thread(target=run, args=(key,)) for key in ("run_a", "run_b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    a, b = list_segments(str(tmp_path))
+    assert read_segment(a)[0] == {"run": "run_a", "run_key": "run_a"}
+    assert _bodies(a) == [f"run_a:{i}" for i in range(20)]
+    assert _bodies(b) == [f"run_b:{i}" for i in range(20)]
+
+
+def test_workers_see_the_segment_only_through_run_in_context(tmp_path):
+    with archive_run(str(tmp_path), "src", "run_000001"):
+        worker = threading.Thread(target=run_in_context(archive_response), args=("src",),
+                                  kwargs={"body": "worker"})
+        stray = threading.Thread(target=archive_response, args=("src",),
+                                 kwargs={"body": "stray"})
+        for thread in (worker, stray):
+            thread.start()
+            thread.join()
+        archive_response("other", body="other source")
+
+    [segment] = list_segments(str(tmp_path))
+    assert _bodies(segment) == ["worker"]
+
+
+def test_nothing_is_archived_outside_a_run(tmp_path):
+    archive_response("src", body="lost")
+    with archive_run(str(tmp_path), "src", "run_000001"):
+        pass
+    assert list_segments(str(tmp_path)) == []
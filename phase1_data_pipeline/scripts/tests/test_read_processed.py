@@ -0,0 +1,37 @@
+import pytest
+
+from binance import manifest, paths_binance
+from binance.read_processed import pin_version, read_master, read_runs_after
+from binance.snapshot_and_master import store_processed
+from conftest import run_frame
+
+
+def test_runs_after_a_version_read_only_the_new_files(data_dir):
+    store_processed(run_frame(1))
+    store_processed(run_frame(2))
+    seen = pin_version()
+
+    assert read_runs_after(2, since=seen, columns=["run_index"]).empty
+    assert len(read_runs_after(1, columns=["run_index"])) == len(run_frame(2))
+
+    new = run_frame(3, timestamp="2025-12-08T09:00:00Z")
+    store_processed(new)
+    rows = read_runs_after(0, since=seen, columns=["run_index", "price"])
+    assert set(rows["run_index"]) == {3}
+    assert len(rows) == len(new)
+
+    # The run_index bound still applies to the new files
+    assert read_runs_after(3, since=seen, columns=["run_index"]).empty
+
+
+def test_runs_after_a_vacuumed_version_expire(data_dir, monkeypatch):
+    monkeypatch.setattr(manifest, "CHECKPOINT_EVERY", 2)
+    store_processed(run_frame(1))
+    seen = pin_version()
+    store_processed(run_frame(2))
+    store_processed(run_frame(3))
+    manifest.vacuum(paths_binance.MASTER_DATASET_DIR, retention=-1)
+
+    with pytest.raises(manifest.SnapshotExpired):
+        read_runs_after(1, since=seen)
+    assert set(read_runs_after(1, columns=["run_index"])["run_index"]) == {2, 3}
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from binance import paths_binance
+from binance.read_processed import read_master
+from binance import replay
+from binance.row_key import KEY_COLUMNS
+from binance.snapshot_and_master import store_processed
+from binance.update_binance import update_binance
+from conftest import run_frame
+
+FIATS = ["BOB", "ARS"]
+
+
+def replay_binance(**kwargs):
+    # the default archive_dir is bound before data_dir repoints the paths
+    return replay.replay_binance(archive_dir=paths_binance.RAW_ARCHIVE_BINANCE, **kwargs)
+
+
+def _keys():
+    return read_master(columns=KEY_COLUMNS).sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def test_rebuild_reproduces_the_archived_runs(data_dir, binance_standin):
+    # The stream workers archive through the same per-run segment
+    for stream in (False, True):
+        update_binance(assets=["USDT"], fiats=FIATS, stream=stream)
+    before = _keys()
+
+    summary = replay_binance(rebuild=True)
+
+    assert summary["runs"] == 2
+    assert summary["stored_rows"] == len(before)
+    assert _keys().equals(before)
+    assert replay_binance()["stored_rows"] == 0
+
+
+def test_rebuild_refuses_to_drop_runs_without_a_segment(data_dir, binance_standin):
+    store_processed(run_frame(1000))
+    update_binance(assets=["USDT"], fiats=FIATS)
+
+    with pytest.raises(ValueError, match="1000"):
+        replay_binance(rebuild=True)
+
+    replay_binance(rebuild=True, allow_history_loss=True)
+    assert set(read_master(columns=["run_index"])["run_index"]) == {1}
+
+
+def test_rebuild_checks_every_run_not_only_the_oldest(data_dir, binance_standin):
+    for _ in range(3):
+        update_binance(assets=["USDT"], fiats=FIATS)
+    os.remove(os.path.join(paths_binance.RAW_ARCHIVE_BINANCE, "run_000002.jsonl.zst"))
+
+    with pytest.raises(ValueError, match=r"1 master run\(s\).*\(2\)"):
+        replay_binance(rebuild=True)
+    assert set(read_master(columns=["run_index"])["run_index"]) == {1, 2, 3}
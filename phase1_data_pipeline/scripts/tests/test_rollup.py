@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from binance import rollup
+from binance.read_processed import pin_version
+from binance.snapshot_and_master import prepare_processed, store_processed
+from conftest import run_frame
+
+
+@pytest.fixture
+def runs():
+    return [
+        run_frame(run, timestamp=ts)
+        for run, ts in [(1, "2025-12-07T10:00:00Z"), (2, "2025-12-07T10:30:00Z"),
+                        (3, "2025-12-07T11:00:00Z"), (4, "2025-12-08T09:00:00Z")]
+    ]
+
+
+def test_merge_rollup_equals_rebuild(runs):
+    runs = [prepare_processed(df) for df in runs]
+    rebuilt = rollup.rollup_rows(pd.concat(runs, ignore_index=True))
+
+    merged = rollup.rollup_rows(runs[0])
+    for df in runs[1:]:
+        merged = rollup.merge_rollup([merged, rollup.rollup_rows(df)])
+
+    pd.testing.assert_frame_equal(merged, rebuilt)
+
+
+def test_merge_merchants_equals_rebuild(runs):
+    runs = [prepare_processed(df) for df in runs]
+    rebuilt = rollup.merchant_rows(pd.concat(runs, ignore_index=True))
+
+    # Later runs first: the order of first appearance must not depend on it
+    merged = rollup.merchant_rows(runs[-1])
+    for df in reversed(runs[:-1]):
+        merged = rollup.merge_merchants([merged, rollup.merchant_rows(df)])
+
+    pd.testing.assert_frame_equal(merged, rebuilt, check_exact=False)
+
+
+def test_ingest_rollups_equal_rebuild(data_dir, runs):
+    first, *others = runs
+    store_processed(first.iloc[:15], part=0)
+    store_processed(first.iloc[15:], part=1)
+    for df in others:
+        store_processed(df)
+
+    version = pin_version()
+    hourly = rollup.read_rollup(version=version)
+    merchants = rollup.read_merchant_rollup(version=version)
+    rollup.rebuild_rollup()
+
+    pd.testing.assert_frame_equal(rollup.read_rollup(version=version), hourly)
+    pd.testing.assert_frame_equal(rollup.read_merchant_rollup(version=version), merchants,
+                                  check_exact=False)
+    assert hourly["count"].sum() == merchants["ads_count"].sum() == sum(map(len, runs))
+
+
+def test_rollup_of_another_version_is_not_returned(data_dir, runs):
+    store_processed(runs[0])
+    version = pin_version()
+    store_processed(runs[1])
+
+    assert rollup.read_rollup(version=version) is None
+    assert rollup.read_merchant_rollup(version=version) is None
+    assert rollup.read_rollup() is not None
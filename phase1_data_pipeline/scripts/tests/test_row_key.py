@@ -0,0 +1,39 @@
+import pandas as pd
+
+from binance.read_processed import read_master
+from binance.row_key import KEY_COLUMNS, compute_row_keys
+from binance.snapshot_and_master import store_processed
+from conftest import run_frame
+
+
+def test_rows_repeated_across_parts_are_stored_once(data_dir):
+    df = run_frame(1)
+    half = len(df) // 2
+
+    assert store_processed(df.iloc[: half + 5], part=0) == half + 5
+    assert store_processed(df.iloc[half - 5:], part=1) == len(df) - half - 5
+    assert store_processed(df, part=2) == 0
+
+    stored = read_master(columns=KEY_COLUMNS)
+    assert len(stored) == len(df)
+    assert not stored.duplicated().any()
+
+
+def test_same_ad_in_another_run_is_a_new_row(data_dir):
+    df = run_frame(1)
+    store_processed(df)
+
+    # row_key is computed at fetch, from the run index among others
+    again = df.drop(columns="row_key").assign(run_index=2)
+    assert store_processed(again) == len(df)
+    assert len(read_master(columns=["run_index"])) == 2 * len(df)
+
+
+def test_keys_ignore_int_or_float_amounts():
+    df = pd.DataFrame({
+        "run_index": [7], "side": ["BUY"], "currency": ["BOB"], "merchant_name": ["m"],
+        "price": [9.5], "min_amount": [100], "max_amount": [2000],
+    })
+    floats = df.astype({"min_amount": "float64", "max_amount": "float64"})
+
+    assert compute_row_keys(df)[0] == compute_row_keys(floats)[0]
@@ -0,0 +1,72 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.run_registry import RunRegistry
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "state" / "runs.sqlite"), str(tmp_path / "run_counter.json")
+
+
+def _counter(path):
+    with open(path) as f:
+        return int(f.read())
+
+
+def test_concurrent_starts_get_distinct_indices(paths):
+    registry = RunRegistry(paths[0])
+
+    with ThreadPoolExecutor(8) as pool:
+        indices = list(pool.map(lambda _: registry.start("binance"), range(40)))
+
+    assert sorted(indices) == list(range(1, 41))
+    assert len(registry.runs(status="running")) == 40
+
+
+def test_numbering_follows_the_counter_file_and_updates_it(paths):
+    path, counter = paths
+    with open(counter, "w") as f:
+        f.write("2270")
+
+    registry = RunRegistry(path, counter_path=counter)
+    assert registry.start("binance") == 2271
+    assert _counter(counter) == 2271
+
+    # The committed counter moved on elsewhere (another checkout's runs)
+    with open(counter, "w") as f:
+        f.write("2300")
+    assert registry.start("binance") == 2301
+    assert _counter(counter) == 2301
+
+    # A fresh registry (new machine) continues from the counter
+    fresh = RunRegistry(path + ".new", counter_path=counter)
+    assert fresh.start("binance") == 2302
+
+
+def test_run_block_records_outcome_and_counters(paths):
+    registry = RunRegistry(paths[0])
+
+    with registry.run("binance") as run:
+        run.record(raw_rows=10, stored_rows=8)
+    with pytest.raises(RuntimeError):
+        with registry.run("binance"):
+            raise RuntimeError("boom")
+
+    failed, ok = registry.runs()
+    assert (ok["status"], ok["raw_rows"], ok["stored_rows"]) == ("success", 10, 8)
+    assert failed["status"] == "failed" and "boom" in failed["error"]
+    assert ok["finished_at"] is not None
+
+
+def test_runs_of_dead_processes_are_abandoned(paths, monkeypatch):
+    registry = RunRegistry(paths[0])
+    stale = registry.start("binance")
+
+    monkeypatch.setattr(os, "getpid", lambda: 1 << 30)
+    monkeypatch.setattr("common.run_registry._pid_alive", lambda pid: False)
+    registry.start("binance")
+
+    assert registry.get(stale)["status"] == "abandoned"
@@ -0,0 +1,27 @@
+import pyarrow.parquet as pq
+
+from binance import paths_binance
+from binance.p2p_store import list_fragments
+from binance.schema import FILE_SCHEMA, SCHEMA_VERSION
+from binance.snapshot_and_master import dataset_schema_version, store_processed, upgrade_dataset
+from conftest import run_frame
+
+
+def test_new_dataset_records_its_schema_version(data_dir):
+    master = paths_binance.MASTER_DATASET_DIR
+    assert dataset_schema_version(master) == 1
+
+    store_processed(run_frame(1))
+
+    assert dataset_schema_version(master) == SCHEMA_VERSION
+    assert upgrade_dataset(master) == 0
+
+
+def test_fragments_follow_the_declared_schema(data_dir):
+    store_processed(run_frame(1))
+
+    fragments = list_fragments(paths_binance.MASTER_DATASET_DIR)
+    assert fragments
+    for path, values in fragments:
+        assert pq.read_schema(path).equals(FILE_SCHEMA)
+        assert set(values) == {"asset", "currency", "date"}
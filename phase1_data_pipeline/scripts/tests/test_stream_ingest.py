@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from binance import paths_binance, stream_ingest
+from binance.p2p_store import fragment_part, list_fragments
+from binance.read_processed import read_master
+from binance.stream_ingest import stream_binance
+
+MARKETS = [("USDT", "BOB"), ("USDT", "ARS")]
+
+
+def test_streamed_rows_are_stored_once_in_several_parts(data_dir, binance_standin):
+    summary = stream_binance(MARKETS, run_index=1, pages=10, stop_rule={"max_ads": 40},
+                             flush_rows=30)
+
+    depth = binance_standin.state.depth
+    assert summary["rows_by_market"] == {"USDT/BOB": 2 * depth, "USDT/ARS": 2 * depth}
+    assert summary["pages"] == 8
+    assert summary["stored_rows"] == summary["raw_rows"] == 4 * depth
+
+    stored = read_master(columns=["run_index", "currency", "side"])
+    assert len(stored) == 4 * depth
+    assert (stored["run_index"] == 1).all()
+    fragments = list_fragments(paths_binance.MASTER_DATASET_DIR)
+    assert len({fragment_part(path) for path, _ in fragments}) > 1
+    assert len(pd.read_parquet(summary["raw_path"])) == 4 * depth
+
+
+def test_a_failing_stage_stops_the_run(data_dir, binance_standin, monkeypatch):
+    def broken(frame):
+        raise RuntimeError("clean failed")
+
+    monkeypatch.setattr(stream_ingest, "clean_decoded", broken)
+
+    with pytest.raises(RuntimeError, match="clean failed"):
+        stream_binance(MARKETS, run_index=1, stop_rule={"max_ads": 40}, queue_depth=1)
+    assert read_master(columns=["run_index"]).empty
@@ -1,75 +1,126 @@
 from pathlib import Path
+import sys
 import time
 import pandas as pd
 
-from p2p_analytics import (
-    fiat_comparison,
-    intraday_profile,
-    p2p_spread,
-    official_premium,
-    order_imbalance,
-    p2p_summary,
-    price_volatility,
-    top_advertisers,
-)
-
 SCRIPT_DIR = Path(__file__).resolve().parent
 REPO_ROOT = SCRIPT_DIR.parent
 
 EXPORTS = SCRIPT_DIR / "exports"
 EXPORTS.mkdir(parents=True, exist_ok=True)
 
-PHASE1_ROOT = REPO_ROOT / "phase1_data_pipeline" / "data" / "processed"
-MASTER = PHASE1_ROOT / "binance" / "p2p_master.parquet"
+# Phase 1 reader API (partitioned processed datasets)
+PHASE1_SCRIPTS = REPO_ROOT / "phase1_data_pipeline" / "scripts"
+if str(PHASE1_SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(PHASE1_SCRIPTS))
+
+from binance.read_processed import available_assets, pin_version, version_ts
+from common.atomic_write import write_csv, write_parquet
+from common.coverage import DEFAULT_ASSET
+from extraction_engine import (
+    STATE_DIR,
+    ENGINE_VERSION,
+    EXPORT_SCHEMAS,
+    bcb_stamp,
+    build_tables,
+    export_frames,
+    load_bcb,
+    output_files,
+    output_watermarks,
+    typed_frame,
+    read_watermark,
+    refresh_state,
+    save_state,
+    stale_outputs,
+)
 
-if not MASTER.exists():
-    raise FileNotFoundError(f"Missing file: {MASTER}")
+# Other assets get the same exports in subfolders
+ASSET_EXPORTS = EXPORTS / "assets"
 
-CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CNY", "MXN", "ARS", "BOB"]
+# Assets and currencies are discovered from the master dataset, so
+# coverage grows with the pipeline configuration alone. Every asset is
+# read from one pinned version of the master dataset, so ingest may keep
+# writing meanwhile
+MASTER_VERSION = pin_version()
+MASTER_TS = None if MASTER_VERSION is None else version_ts(MASTER_VERSION)
+ASSETS = sorted(available_assets(version=MASTER_VERSION) or [DEFAULT_ASSET],
+                key=lambda asset: asset != DEFAULT_ASSET)
+
+# --full ignores the watermarks and recomputes every export from all rows;
+# --csv also writes a CSV copy next to each Parquet export, for humans
+FULL_REFRESH = "--full" in sys.argv[1:]
+WRITE_CSV = "--csv" in sys.argv[1:]
 
 _start = time.time()
 _files = 0
 
 
-def save_csv(df: pd.DataFrame, rel_path: str) -> None:
+def save_export(df: pd.DataFrame, name: str, out: Path) -> None:
+    """Writes one export as Parquet with its declared schema (see EXPORT_SCHEMAS)."""
     global _files
-    out = EXPORTS / rel_path
-    out.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(out, index=False)
+    write_parquet(typed_frame(df, name), out, schema=EXPORT_SCHEMAS[name], index=False)
     _files += 1
 
-daily = fiat_comparison(currencies=CURRENCIES, root=PHASE1_ROOT)
-save_csv(daily, "daily_fiat_comparison/fiat_comparison.csv")
-
-for ccy in CURRENCIES:
-    df = intraday_profile(currency=ccy, root=PHASE1_ROOT)
-    save_csv(df, f"intraday_profile_by_currency/{ccy}_intraday_profile.csv")
-
-for ccy in CURRENCIES:
-    df = p2p_spread(currency=ccy, by="hour", root=PHASE1_ROOT)
-    save_csv(df, f"p2p_spread_by_currency/{ccy}_p2p_spread.csv")
-
-for ccy in CURRENCIES:
-    df = official_premium(currency=ccy, by="day", root=PHASE1_ROOT)
-    save_csv(df, f"official_premium_by_currency/{ccy}_official_premium.csv")
-
-for ccy in CURRENCIES:
-    df = order_imbalance(currency=ccy, by="hour", root=PHASE1_ROOT)
-    save_csv(df, f"order_imbalance_by_currency/{ccy}_order_imbalance.csv")
-
-for ccy in CURRENCIES:
-    df = price_volatility(currency=ccy, by="day", window=7, root=PHASE1_ROOT)
-    save_csv(df, f"price_volatility_by_currency/{ccy}_price_volatility.csv")
-
-for ccy in CURRENCIES:
-    df = top_advertisers(currency=ccy, root=PHASE1_ROOT)
-    save_csv(df, f"top_advertisers_by_currency/{ccy}_top_advertisers.csv")
 
-summary = p2p_summary(currencies=CURRENCIES, root=PHASE1_ROOT)
-save_csv(summary, "p2p_summary.csv")
+def csv_outdated(out: Path) -> bool:
+    csv = out.with_suffix(".csv")
+    return not csv.exists() or csv.stat().st_mtime_ns < out.stat().st_mtime_ns
+
+
+def asset_exports(asset: str) -> Path:
+    return EXPORTS if asset == DEFAULT_ASSET else ASSET_EXPORTS / asset
+
+
+def extract_asset(asset: str, bcb: pd.DataFrame) -> tuple[list[str], str]:
+    """
+    Refreshes the bucket state of `asset` from the partitions committed
+    since its watermark (see extraction_engine.py), derives every table
+    from it and rewrites the exports that changed.
+    """
+    exports = asset_exports(asset)
+    state_dir = exports / STATE_DIR
+    watermark = None if FULL_REFRESH else read_watermark(state_dir)
+
+    hourly, merchants, changed = refresh_state(
+        asset, state_dir, version=MASTER_VERSION, full=FULL_REFRESH,
+    )
+    currencies = sorted(hourly["currency"].unique())
+
+    stamp = bcb_stamp()
+    bcb_changed = watermark is None or watermark.get("bcb") != stamp
+    stale = stale_outputs(currencies, changed, watermark, exports, bcb_changed)
+    files = output_files(currencies)
+    csv_stale = {p for p in files if WRITE_CSV and (p in stale or csv_outdated(exports / p))}
+    if stale or csv_stale:
+        frames = export_frames(build_tables(hourly, merchants, bcb), currencies)
+        for relative in sorted(stale):
+            save_export(frames[relative], files[relative][0], exports / relative)
+        for relative in sorted(csv_stale):
+            write_csv(frames[relative], (exports / relative).with_suffix(".csv"), index=False)
+
+    save_state(state_dir, hourly, merchants, {
+        "engine": ENGINE_VERSION,
+        "master_version": MASTER_VERSION,
+        "master_ts": MASTER_TS,
+        "bcb": stamp,
+        "outputs": output_watermarks(hourly, currencies),
+    }, changed)
+
+    if changed is None:
+        mode = "full refresh"
+    else:
+        mode = f"{len(changed)} currencies with new data"
+    return currencies, f"{mode}, {len(stale)} files written"
+
+
+bcb = load_bcb()
+for asset in ASSETS:
+    currencies, outcome = extract_asset(asset, bcb)
+    print(f"[Phase3] {asset}: {len(currencies)} currencies ({', '.join(currencies)}): {outcome}")
 
 runtime = time.time() - _start
 
 print("=== Phase 3 Extraction completed ===")
-print(f"[Phase3] CSV exports updated ({_files} files) — ready for Streamlit consumption.")
-print(f"[Phase3] Runtime: {runtime:.2f} seconds")
\ No newline at end of file
+print(f"[Phase3] Exports updated ({_files} Parquet files) — ready for Streamlit consumption.")
+print(f"[Phase3] Master dataset version: {MASTER_VERSION}")
+print(f"[Phase3] Runtime: {runtime:.2f} seconds")
@@ -1,3 +1,4 @@
+import sys
 from pathlib import Path
 
 # .../phase3_dashboard/streamlit_app/app/__init__.py
@@ -6,5 +7,18 @@ STREAMLIT_APP_DIR = APP_DIR.parent                     # streamlit_app
 PROJECT_ROOT = STREAMLIT_APP_DIR.parent                # phase3_dashboard
 EXPORTS_DIR = PROJECT_ROOT / "exports"
 
-# Default currency list (fallback)
+# Phase 1 reader API (partitioned processed datasets), as in data_extraction.py
+PHASE1_SCRIPTS = PROJECT_ROOT.parent / "phase1_data_pipeline" / "scripts"
+if str(PHASE1_SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(PHASE1_SCRIPTS))
+
+# Declared export schemas (extraction_engine.EXPORT_SCHEMAS)
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# Exports of the default asset sit at the top of EXPORTS_DIR, other
+# assets under EXPORTS_DIR/assets/<ASSET>/ (see data_extraction.py)
+DEFAULT_ASSET = "USDT"
+
+# Default currency list (fallback when no export is found)
 CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CNY", "MXN", "ARS", "BOB"]
@@ -2,8 +2,13 @@ from __future__ import annotations
 
 from pathlib import Path
 import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import streamlit as st
 
+from app import CURRENCIES, DEFAULT_ASSET
+from extraction_engine import EXPORT_SCHEMAS
+
 # ----------------------------------------------------
 # Export paths
 # ----------------------------------------------------
@@ -12,103 +17,181 @@ STREAMLIT_APP_DIR = APP_DIR.parent                     # streamlit_app
 PROJECT_ROOT = STREAMLIT_APP_DIR.parent                # phase3_dashboard
 EXPORTS_DIR = PROJECT_ROOT / "exports"
 
-PATH_LAST_UPDATE = EXPORTS_DIR / "_last_update.txt"
+# Export folders, relative to the exports of one asset (see exports_dir)
+DAILY_FIAT_DIR = "daily_fiat_comparison"
+INTRADAY_DIR = "intraday_profile_by_currency"
+PREMIUM_DIR = "official_premium_by_currency"
+ORDER_IMB_DIR = "order_imbalance_by_currency"
+P2P_HOUR_DIR = "p2p_spread_by_currency"
+VOL_DIR = "price_volatility_by_currency"
+TOP_ADS_DIR = "top_advertisers_by_currency"
+P2P_SUMMARY_FILE = "p2p_summary.parquet"
+
+ASSET_EXPORTS_DIR = EXPORTS_DIR / "assets"
+
+# Per-currency exports: <CCY>_<name>.parquet in each folder, `name` being
+# the export's key in EXPORT_SCHEMAS
+_CURRENCY_FILES = {
+    INTRADAY_DIR: "intraday_profile",
+    PREMIUM_DIR: "official_premium",
+    ORDER_IMB_DIR: "order_imbalance",
+    P2P_HOUR_DIR: "p2p_spread",
+    VOL_DIR: "price_volatility",
+    TOP_ADS_DIR: "top_advertisers",
+}
+
+# Exports shared by all currencies, relative to the exports of one asset
+_SHARED_FILES = {
+    DAILY_FIAT_DIR: f"{DAILY_FIAT_DIR}/fiat_comparison.parquet",
+    P2P_SUMMARY_FILE: P2P_SUMMARY_FILE,
+}
+
+# Extensions of the exports, in order of preference: extractions before
+# the Parquet exports (or run with --csv) left CSV files
+_EXPORT_SUFFIXES = (".parquet", ".csv")
+
+
+def exports_dir(asset: str = DEFAULT_ASSET) -> Path:
+    if asset == DEFAULT_ASSET:
+        return EXPORTS_DIR
+    return ASSET_EXPORTS_DIR / asset
+
+
+def export_path(table: str, currency: str | None = None, asset: str = DEFAULT_ASSET) -> Path:
+    """
+    Path of one export: `table` is a per-currency folder (INTRADAY_DIR,
+    P2P_HOUR_DIR, ...) with its `currency`, or DAILY_FIAT_DIR /
+    P2P_SUMMARY_FILE for the shared files.
+    """
+    if table in _CURRENCY_FILES:
+        return exports_dir(asset) / table / f"{currency}_{_CURRENCY_FILES[table]}.parquet"
+    return exports_dir(asset) / _SHARED_FILES[table]
+
+
+def export_name(table: str) -> str:
+    """Key of `table` in EXPORT_SCHEMAS."""
+    if table in _CURRENCY_FILES:
+        return _CURRENCY_FILES[table]
+    return Path(_SHARED_FILES[table]).stem
+
+
+def export_file(table: str, currency: str | None = None, asset: str = DEFAULT_ASSET) -> Path | None:
+    """
+    File holding one export: the Parquet file of export_path, else the
+    CSV next to it. None when neither exists.
+    """
+    path = export_path(table, currency, asset)
+    for suffix in _EXPORT_SUFFIXES:
+        if path.with_suffix(suffix).exists():
+            return path.with_suffix(suffix)
+    return None
+
+
+def available_assets() -> list[str]:
+    """Assets with exports: the default one, then the asset subfolders."""
+    others = []
+    if ASSET_EXPORTS_DIR.is_dir():
+        others = sorted(p.name for p in ASSET_EXPORTS_DIR.iterdir() if p.is_dir())
+    return [DEFAULT_ASSET] + [a for a in others if a != DEFAULT_ASSET]
+
+
+def available_currencies(asset: str = DEFAULT_ASSET) -> list[str]:
+    """
+    Currencies found in the per-currency exports of `asset`, so new
+    coverage shows up without code changes. Falls back to CURRENCIES.
+    """
+    found = set()
+    root = exports_dir(asset)
+    for folder, name in _CURRENCY_FILES.items():
+        for suffix in _EXPORT_SUFFIXES:
+            for path in (root / folder).glob(f"*_{name}{suffix}"):
+                found.add(path.name[: -len(f"_{name}{suffix}")])
+    return sorted(found) or list(CURRENCIES)
 
-PATH_DAILY_FIAT = EXPORTS_DIR / "daily_fiat_comparison"
-PATH_INTRADAY = EXPORTS_DIR / "intraday_profile_by_currency"
-PATH_PREMIUM = EXPORTS_DIR / "official_premium_by_currency"
-PATH_ORDER_IMB = EXPORTS_DIR / "order_imbalance_by_currency"
-PATH_P2P_HOUR = EXPORTS_DIR / "p2p_spread_by_currency"
-PATH_VOL = EXPORTS_DIR / "price_volatility_by_currency"
-PATH_TOP_ADS = EXPORTS_DIR / "top_advertisers_by_currency"
-PATH_P2P_SUMMARY = EXPORTS_DIR / "p2p_summary.csv"
 
-CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CNY", "MXN", "ARS", "BOB"]
+# ----------------------------------------------------
+# Caching
+#
+# Cached reads are keyed on the file generation (file_stamp): exports are
+# replaced atomically, so a new extraction changes the stamp and the next
+# rerun reads the new file, with no server restart. Entries of older
+# generations are dropped by the max_entries / ttl bounds.
+# ----------------------------------------------------
+CACHE_MAX_ENTRIES = 64
+CACHE_TTL = "6h"
 
 
-def _exports_stamp() -> str:
-    if PATH_LAST_UPDATE.exists():
-        return PATH_LAST_UPDATE.read_text().strip()
-    return "no_stamp"
+def file_stamp(path: Path) -> tuple[int, int] | None:
+    """Generation of a file: (mtime in ns, size), None when it is missing."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
 
-def _read_csv(path: Path, parse_date_cols: list[str] | None = None) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    if "Unnamed: 0" in df.columns:
-        df = df.drop(columns=["Unnamed: 0"])
-    if parse_date_cols:
-        for col in parse_date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col])
-    return df
+def read_export_table(path: Path, name: str, columns=None, filters=None):
+    """
+    One export as a pyarrow Table, projected to `columns` and filtered by
+    the pyarrow expression `filters`. Parquet exports carry their declared
+    schema (see extraction_engine.py); a CSV export is converted to
+    EXPORT_SCHEMAS[name] as it is read, so both come back with dates as
+    dates and numbers as numbers.
+    """
+    if path.suffix == ".parquet":
+        return pq.read_table(path, columns=columns, filters=filters)
 
+    convert = pacsv.ConvertOptions(column_types=EXPORT_SCHEMAS[name])
+    table = pacsv.read_csv(path, convert_options=convert)
+    if filters is not None:
+        table = table.filter(filters)
+    return table if columns is None else table.select(list(columns))
 
-@st.cache_data
-def _cached_read_csv(
-    path_str: str,
-    build_ts: str,
-    exports_stamp: str,
-    parse_date_cols: tuple[str, ...] = (),
-) -> pd.DataFrame:
-    return _read_csv(Path(path_str), parse_date_cols=list(parse_date_cols) if parse_date_cols else None)
 
+def _read_export(path: Path, name: str) -> pd.DataFrame:
+    return read_export_table(path, name).to_pandas(date_as_object=False)
 
-@st.cache_data
-def load_daily_fiat_comparison() -> pd.DataFrame:
-    path = PATH_DAILY_FIAT / "fiat_comparison.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
 
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_read_export(path_str: str, name: str, stamp: tuple[int, int]) -> pd.DataFrame:
+    return _read_export(Path(path_str), name)
 
-@st.cache_data
-def load_intraday(currency: str) -> pd.DataFrame:
-    path = PATH_INTRADAY / f"{currency}_intraday_profile.csv"
-    if not path.exists():
+
+def _load_export(table: str, currency: str | None = None, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    path = export_file(table, currency, asset)
+    stamp = None if path is None else file_stamp(path)
+    if stamp is None:
         return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp())
+    return _cached_read_export(str(path), export_name(table), stamp)
 
 
-@st.cache_data
-def load_spread_hour(currency: str) -> pd.DataFrame:
-    path = PATH_P2P_HOUR / f"{currency}_p2p_spread.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
+def load_daily_fiat_comparison(asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(DAILY_FIAT_DIR, asset=asset)
 
 
-@st.cache_data
-def load_official_premium(currency: str) -> pd.DataFrame:
-    path = PATH_PREMIUM / f"{currency}_official_premium.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
+def load_intraday(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(INTRADAY_DIR, currency, asset)
 
 
-@st.cache_data
-def load_price_volatility(currency: str) -> pd.DataFrame:
-    path = PATH_VOL / f"{currency}_price_volatility.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
+def load_spread_hour(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(P2P_HOUR_DIR, currency, asset)
 
 
-@st.cache_data
-def load_order_imbalance(currency: str) -> pd.DataFrame:
-    path = PATH_ORDER_IMB / f"{currency}_order_imbalance.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
+def load_official_premium(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(PREMIUM_DIR, currency, asset)
 
 
-@st.cache_data
-def load_top_advertisers(currency: str) -> pd.DataFrame:
-    path = PATH_TOP_ADS / f"{currency}_top_advertisers.csv"
-    if not path.exists():
-        return pd.DataFrame()
-    return _cached_read_csv(str(path), _exports_stamp(), ("date",))
+def load_price_volatility(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(VOL_DIR, currency, asset)
+
+
+def load_order_imbalance(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(ORDER_IMB_DIR, currency, asset)
+
+
+def load_top_advertisers(currency: str, asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(TOP_ADS_DIR, currency, asset)
 
 
-@st.cache_data
-def load_p2p_summary() -> pd.DataFrame:
-    return _cached_read_csv(str(PATH_P2P_SUMMARY), _exports_stamp(), ("date",))
\ No newline at end of file
+def load_p2p_summary(asset: str = DEFAULT_ASSET) -> pd.DataFrame:
+    return _load_export(P2P_SUMMARY_FILE, asset=asset)
\ No newline at end of file
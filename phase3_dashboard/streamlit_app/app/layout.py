@@ -1,17 +1,19 @@
 import pandas as pd
 import streamlit as st
 
-from app import CURRENCIES
+from app import DEFAULT_ASSET
 from app.data import (
-    load_daily_fiat_comparison,
-    load_intraday,
-    load_official_premium,
-    load_order_imbalance,
-    load_spread_hour,
-    load_price_volatility,
+    DAILY_FIAT_DIR,
+    ORDER_IMB_DIR,
+    P2P_HOUR_DIR,
+    P2P_SUMMARY_FILE,
+    PREMIUM_DIR,
+    VOL_DIR,
+    available_assets,
+    available_currencies,
     load_top_advertisers,
-    load_p2p_summary,
 )
+from app.query import ads_date_range, export_date_range, query_ads, query_export
 from app.viz import (
     overview_spreads_chart,
     intraday_profile_chart,
@@ -25,38 +27,27 @@ from app.viz import (
 )
 
 # ==============================================================================
-# Cached helper functions (pure transforms)
+# Helper functions (pure transforms)
 # ==============================================================================
 
-@st.cache_data
-def _normalize_date_col(df: pd.DataFrame, date_col: str = "date") -> pd.DataFrame:
-    df = df.copy()
-    if date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col]).dt.normalize()
-    return df
+# Export dates are typed (datetime64 at midnight, see app/data.py): the
+# helpers below format them without parsing. Date, currency and hour
+# filters are pushed into the reads (see app/query.py), which are cached
+# on their small parameters; these transforms run on the few rows shown
+# and are not cached, since hashing their input frame costs more.
 
-@st.cache_data
-def _filter_by_date(df: pd.DataFrame, start, end, date_col: str = "date") -> pd.DataFrame:
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col]).dt.normalize()
-    return df[(df[date_col] >= start) & (df[date_col] <= end)].copy()
-
-@st.cache_data
 def _format_preview(df: pd.DataFrame, date_col: str = "date", currency_last: bool = True) -> pd.DataFrame:
     preview = df.copy()
     if date_col in preview.columns:
-        preview[date_col] = pd.to_datetime(preview[date_col]).dt.date
+        preview[date_col] = preview[date_col].dt.date
 
     if currency_last and "currency" in preview.columns:
         preview = preview[[c for c in preview.columns if c != "currency"] + ["currency"]]
 
     return preview
 
-@st.cache_data
-def _intraday_to_long(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["hour"] = df["hour"].astype(int)
 
+def _intraday_to_long(df: pd.DataFrame) -> pd.DataFrame:
     df_long = df.melt(
         id_vars="hour",
         value_vars=["mean_buy_price", "mean_sell_price"],
@@ -85,11 +76,19 @@ else:
         st.altair_chart(chart, width='stretch')
 
 
+def select_asset() -> str:
+    """Sidebar asset picker, shown only when exports hold several assets."""
+    assets = available_assets()
+    if len(assets) == 1:
+        return DEFAULT_ASSET
+    return st.sidebar.selectbox("Select Asset", assets, key="asset_select")
+
+
 # ==============================================================================
 # Render functions
 # ==============================================================================
 
-def render_spread_overview() -> None:
+def render_spread_overview(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("1. Spread Overview by Currency")
     st.markdown(
         """
@@ -98,14 +97,12 @@ def render_spread_overview() -> None:
         """
     )
 
-    df = load_daily_fiat_comparison()
-    if df.empty:
+    bounds = export_date_range(DAILY_FIAT_DIR, asset=asset)
+    if bounds is None:
         st.info("No data to display.")
         return
 
-    df = _normalize_date_col(df, "date")
-
-    min_date, max_date = df["date"].min(), df["date"].max()
+    min_date, max_date = bounds
     date_range = st.slider(
         "Select Date range",
         min_value=min_date.to_pydatetime(),
@@ -113,9 +110,8 @@ def render_spread_overview() -> None:
         value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
         key="spread_overview_date_slider",
     )
-    df = _filter_by_date(df, date_range[0], date_range[1], "date")
 
-    all_currencies = sorted(df["currency"].dropna().unique())
+    all_currencies = available_currencies(asset)
     selected = st.multiselect(
         "Select currencies to display",
         options=all_currencies,
@@ -126,18 +122,19 @@ def render_spread_overview() -> None:
         st.info("Please select at least one currency.")
         return
 
-    df = df[df["currency"].isin(selected)].copy()
+    df = query_export(DAILY_FIAT_DIR, asset=asset, start=date_range[0], end=date_range[1],
+                      currencies=selected)
     _show_chart(overview_spreads_chart(df))
 
     st.markdown("Preview of the underlying data:")
     preview = df.copy()
-    preview["date"] = pd.to_datetime(preview["date"]).dt.date
+    preview["date"] = preview["date"].dt.date
     num_cols = preview.select_dtypes(include="number").columns
     preview[num_cols] = preview[num_cols].round(4)
     st.dataframe(preview.tail(20).sort_index(ascending=False), width='stretch')
 
 
-def render_intraday_profile() -> None:
+def render_intraday_profile(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.1 Intraday Profile")
     st.markdown(
         """
@@ -149,23 +146,15 @@ def render_intraday_profile() -> None:
         """
     )
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="intraday_currency_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="intraday_currency_select")
 
-    df = load_spread_hour(currency)
-    if df.empty:
+    bounds = export_date_range(P2P_HOUR_DIR, currency, asset)
+    if bounds is None:
         st.info("No data to display.")
         return
 
-    needed = {"date", "hour", "avg_buy_price", "avg_sell_price"}
-    if not needed.issubset(df.columns):
-        st.info("Unexpected intraday columns. Showing raw data.")
-        st.dataframe(df.head(), width='stretch')
-        return
-
-    # Parse dates to get min/max for date picker
-    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-    df = df.dropna(subset=["date"])
-    min_d, max_d = df["date"].min(), df["date"].max()
+    # Calendar dates for the date picker
+    min_d, max_d = bounds[0].date(), bounds[1].date()
 
     # Default: last 7 days available
     default_start = max(min_d, max_d - pd.Timedelta(days=6))
@@ -179,6 +168,8 @@ def render_intraday_profile() -> None:
     )
 
     # Aggregate hourly curve over selected days
+    df = query_export(P2P_HOUR_DIR, currency, asset, start=start_d, end=end_d)
+    df["date"] = df["date"].dt.date
     df_hourly = intraday_mean_over_range(df, start_d, end_d)
     if df_hourly.empty:
         st.info("No observations in that date range.")
@@ -216,18 +207,17 @@ def render_intraday_profile() -> None:
     )
 
     st.markdown("**Raw data (selected window)**")
-    df_win = df[(df["date"] >= start_d) & (df["date"] <= end_d)].copy()
-    preview = df_win.copy()
+    preview = df.copy()
     num_cols = preview.select_dtypes(include="number").columns
     preview[num_cols] = preview[num_cols].round(4)
     st.dataframe(_format_preview(preview.tail(20).sort_index(ascending=False)), width='stretch', height=220)
 
 
-def render_official_premium() -> None:
+def render_official_premium(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.2 Official Premium")
     st.markdown("Difference between P2P rate and Official Exchange Rate (percentage or absolute).")
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="premium_currency_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="premium_currency_select")
     cur = currency.upper()
 
     if cur == "USD":
@@ -237,14 +227,12 @@ def render_official_premium() -> None:
         )
         return
 
-    prem = load_official_premium(cur)
-    if prem.empty:
+    bounds = export_date_range(PREMIUM_DIR, cur, asset)
+    if bounds is None:
         st.warning(f"No official premium data available for {cur}.")
         return
 
-    prem = _normalize_date_col(prem, "date")
-
-    min_date, max_date = prem["date"].min(), prem["date"].max()
+    min_date, max_date = bounds
     date_range = st.slider(
         "Select Date range",
         min_value=min_date.to_pydatetime(),
@@ -252,7 +240,8 @@ def render_official_premium() -> None:
         value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
         key="render_official_premium_slider",
     )
-    prem = _filter_by_date(prem, date_range[0], date_range[1], "date").sort_values("date")
+    prem = query_export(PREMIUM_DIR, cur, asset, start=date_range[0], end=date_range[1])
+    prem = prem.sort_values("date")
 
     metric_label = st.radio(
         "Metric",
@@ -266,25 +255,23 @@ def render_official_premium() -> None:
 
     st.markdown("Preview of Official Premium data:")
     preview = prem.copy()
-    preview["date"] = pd.to_datetime(preview["date"]).dt.date
+    preview["date"] = preview["date"].dt.date
     num_cols = preview.select_dtypes(include="number").columns
     preview[num_cols] = preview[num_cols].round(4)
     st.dataframe(_format_preview(preview.tail(20).sort_index(ascending=False)), width='stretch')
 
 
-def render_order_imbalance() -> None:
+def render_order_imbalance(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.3 Order Imbalance")
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="order_imbalance_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="order_imbalance_select")
 
-    df_imbalance = load_order_imbalance(currency)
-    if df_imbalance.empty:
+    bounds = export_date_range(ORDER_IMB_DIR, currency, asset)
+    if bounds is None:
         st.info("No data to display for this currency.")
         return
 
-    df_imbalance = _normalize_date_col(df_imbalance, "date")
-
-    min_date, max_date = df_imbalance["date"].min(), df_imbalance["date"].max()
+    min_date, max_date = bounds
     date_range = st.slider(
         "Select Date range",
         min_value=min_date.to_pydatetime(),
@@ -292,7 +279,7 @@ def render_order_imbalance() -> None:
         value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
         key="render_order_imbalance_slider",
     )
-    df_imbalance = _filter_by_date(df_imbalance, date_range[0], date_range[1], "date")
+    df_imbalance = query_export(ORDER_IMB_DIR, currency, asset, start=date_range[0], end=date_range[1])
 
     _show_chart(order_imbalance_heatmap(df_imbalance))
 
@@ -307,19 +294,17 @@ def render_order_imbalance() -> None:
     },)
 
 
-def render_spread_heatmap() -> None:
+def render_spread_heatmap(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.4 P2P Spread (hour × day)")
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="p2p_spread_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="p2p_spread_select")
 
-    df_spread = load_spread_hour(currency)
-    if df_spread.empty:
+    bounds = export_date_range(P2P_HOUR_DIR, currency, asset)
+    if bounds is None:
         st.info("No data to display for this currency.")
         return
 
-    df_spread = _normalize_date_col(df_spread, "date")
-
-    min_date, max_date = df_spread["date"].min(), df_spread["date"].max()
+    min_date, max_date = bounds
     date_range = st.slider(
         "Select Date range",
         min_value=min_date.to_pydatetime(),
@@ -327,7 +312,7 @@ def render_spread_heatmap() -> None:
         value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
         key="render_spread_heatmap_slider",
     )
-    df_spread = _filter_by_date(df_spread, date_range[0], date_range[1], "date")
+    df_spread = query_export(P2P_HOUR_DIR, currency, asset, start=date_range[0], end=date_range[1])
 
     metric_label = st.radio(
         "Metric",
@@ -346,19 +331,17 @@ def render_spread_heatmap() -> None:
     st.dataframe(_format_preview(preview).tail(20).sort_index(ascending=False), width='stretch')
 
 
-def render_price_volatility() -> None:
+def render_price_volatility(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.5 Price Volatility (7 days window).")
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="price_volatility_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="price_volatility_select")
 
-    df_volatility = load_price_volatility(currency)
-    if df_volatility.empty:
+    bounds = export_date_range(VOL_DIR, currency, asset)
+    if bounds is None:
         st.info("No volatility data to display for this currency.")
         return
 
-    df_volatility = _normalize_date_col(df_volatility, "date")
-
-    min_date, max_date = df_volatility["date"].min(), df_volatility["date"].max()
+    min_date, max_date = bounds
     date_range = st.slider(
         "Select Data range",
         min_value=min_date.to_pydatetime(),
@@ -366,7 +349,7 @@ def render_price_volatility() -> None:
         value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
         key="render_price_volatility_slider",
     )
-    df_volatility = _filter_by_date(df_volatility, date_range[0], date_range[1], "date")
+    df_volatility = query_export(VOL_DIR, currency, asset, start=date_range[0], end=date_range[1])
 
     _show_chart(price_volatility_chart(df_volatility))
 
@@ -377,22 +360,17 @@ def render_price_volatility() -> None:
     st.dataframe(_format_preview(preview).tail(20).sort_index(ascending=False), width='stretch')
 
 
-def render_top_advertisers() -> None:
+def render_top_advertisers(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("2.6 Top Advertisers")
     st.markdown("Highlights the largest P2P advertisers by advertised amount.")
 
-    currency = st.selectbox("Select Currency", CURRENCIES, key="top_ads_currency_select")
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="top_ads_currency_select")
 
-    df_ads = load_top_advertisers(currency)
+    df_ads = load_top_advertisers(currency, asset)
     if df_ads.empty:
         st.info("No advertiser data available for this currency.")
         return
 
-    df_ads = df_ads.drop(
-        columns=[col for col in df_ads.columns if col.lower().startswith("unnamed")],
-        errors="ignore",
-    )
-
     required_cols = {"merchant_name", "ads_count", "total_volume"}
     if not required_cols.issubset(df_ads.columns):
         st.info("Expected columns not found. Showing raw data instead.")
@@ -432,43 +410,39 @@ def render_top_advertisers() -> None:
     },)
 
 
-def render_summary_table() -> None:
+def render_summary_table(asset: str = DEFAULT_ASSET) -> None:
     st.subheader("3. P2P Summary Table")
 
-    df = load_p2p_summary().copy()
+    bounds = export_date_range(P2P_SUMMARY_FILE, asset=asset)
     st.markdown("**High-level summary of P2P prices and spreads**")
 
-    if df.empty:
+    if bounds is None:
         st.info("No data to display.")
         return
 
-    df = _normalize_date_col(df, "date")
-
     # Currency selector
-    if "currency" in df.columns:
-        all_currencies = sorted(df["currency"].dropna().unique())
-        selected = st.multiselect(
-            "Select currencies",
-            options=all_currencies,
-            default=all_currencies,
-            key="summary_currency_multiselect",
-        )
-        if not selected:
-            st.info("Please select at least one currency.")
-            return
-        df = df[df["currency"].isin(selected)].copy()
+    all_currencies = available_currencies(asset)
+    selected = st.multiselect(
+        "Select currencies",
+        options=all_currencies,
+        default=all_currencies,
+        key="summary_currency_multiselect",
+    )
+    if not selected:
+        st.info("Please select at least one currency.")
+        return
 
     # Date range selector
-    if "date" in df.columns:
-        min_date, max_date = df["date"].min(), df["date"].max()
-        date_range = st.slider(
-            "Select Date range",
-            min_value=min_date.to_pydatetime(),
-            max_value=max_date.to_pydatetime(),
-            value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
-            key="summary_date_slider",
-        )
-        df = _filter_by_date(df, date_range[0], date_range[1], "date")
+    min_date, max_date = bounds
+    date_range = st.slider(
+        "Select Date range",
+        min_value=min_date.to_pydatetime(),
+        max_value=max_date.to_pydatetime(),
+        value=(min_date.to_pydatetime(), max_date.to_pydatetime()),
+        key="summary_date_slider",
+    )
+    df = query_export(P2P_SUMMARY_FILE, asset=asset, start=date_range[0], end=date_range[1],
+                      currencies=selected)
 
     preview = df.copy()
 
@@ -476,3 +450,57 @@ def render_summary_table() -> None:
     preview[num_cols] = preview[num_cols].round(4)
 
     st.dataframe(preview.tail(50).sort_index(ascending=False), width="stretch")
+
+
+def render_ads_explorer(asset: str = DEFAULT_ASSET) -> None:
+    st.subheader("2.7 Ads Explorer")
+    st.markdown(
+        """
+        Individual P2P ads as scraped, read directly from the processed Phase 1 data.
+        Narrow them down by **Date**, **UTC hour**, **Side** and **Merchant**.
+        """
+    )
+
+    currency = st.selectbox("Select Currency", available_currencies(asset), key="ads_explorer_currency_select")
+
+    bounds = ads_date_range(currency, asset)
+    if bounds is None:
+        st.info("No ads available for this currency.")
+        return
+
+    min_d, max_d = bounds[0].date(), bounds[1].date()
+    start_d, end_d = st.date_input(
+        "Select Date range",
+        value=(max_d, max_d),
+        min_value=min_d,
+        max_value=max_d,
+        key="ads_explorer_date_range",
+    )
+    hour_range = st.slider(
+        "Select hour range (UTC)",
+        min_value=0,
+        max_value=23,
+        value=(0, 23),
+        key="ads_explorer_hour_slider",
+    )
+    sides = st.multiselect("Side", ["BUY", "SELL"], default=["BUY", "SELL"], key="ads_explorer_sides")
+    merchant = st.text_input("Merchant name contains", key="ads_explorer_merchant")
+    if not sides:
+        st.info("Please select at least one side.")
+        return
+
+    df_ads = query_ads(
+        currency,
+        asset,
+        start=start_d,
+        end=end_d,
+        hours=None if hour_range == (0, 23) else hour_range,
+        sides=sides,
+        merchant=merchant.strip(),
+    )
+    if df_ads.empty:
+        st.info("No ads match these filters.")
+        return
+
+    st.caption(f"{len(df_ads):,} ads")
+    st.dataframe(df_ads, width='stretch', hide_index=True)
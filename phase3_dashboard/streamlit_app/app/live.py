@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from app import DEFAULT_ASSET
+from app.data import CACHE_MAX_ENTRIES, CACHE_TTL, file_stamp
+from bcb.paths_bcb import DATA_PROCESSED_BCB
+from binance.manifest import SnapshotExpired
+from binance.read_processed import available_dates, pin_version, read_master, read_runs_after
+
+# ----------------------------------------------------
+# Live tail
+#
+# Each session keeps the rows of the last LIVE_WINDOW_RUNS runs of one
+# asset, with the manifest version they were read at. A refresh reads
+# only the files committed after that version (read_runs_after), so it
+# costs time in proportion to the new rows, and nothing when no run was
+# stored in between. A new window starts from the latest date partition.
+# ----------------------------------------------------
+
+LIVE_REFRESH = "30s"
+LIVE_WINDOW_RUNS = 30
+LIVE_COLUMNS = ["run_index", "scrape_ts", "currency", "side", "price", "max_amount", "merchant_name"]
+
+BCB_MASTER_PATH = Path(DATA_PROCESSED_BCB) / "bcb_master.parquet"
+
+
+def _window(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the last LIVE_WINDOW_RUNS runs, categoricals as plain strings."""
+    df = df[LIVE_COLUMNS].copy()
+    for col in ["currency", "side", "merchant_name"]:
+        df[col] = df[col].astype(str)
+    if df.empty:
+        return df
+    first = df["run_index"].drop_duplicates().nlargest(LIVE_WINDOW_RUNS).min()
+    return df[df["run_index"] >= first].reset_index(drop=True)
+
+
+def refresh_window(state: dict, asset: str = DEFAULT_ASSET) -> int:
+    """
+    Brings a session window ({"asset", "version", "rows"}, empty at first)
+    up to the latest manifest version. Returns the number of rows read.
+    """
+    version = pin_version()
+    if state.get("asset") != asset or version is None:
+        dates = available_dates(assets=asset, version=version)
+        rows = read_master(start_date=dates[-1], end_date=dates[-1], columns=LIVE_COLUMNS,
+                           version=version, assets=asset) if dates else pd.DataFrame(columns=LIVE_COLUMNS)
+        state.update(asset=asset, version=version, rows=_window(rows))
+        return len(rows)
+
+    if version == state["version"]:
+        return 0
+
+    rows = state["rows"]
+    # From the oldest run kept: a run stored in several commits arrives in parts
+    after = rows["run_index"].min() - 1 if not rows.empty else -1
+    try:
+        new = read_runs_after(after, since=state["version"], version=version, assets=asset,
+                              columns=LIVE_COLUMNS)
+    except SnapshotExpired:
+        state.clear()
+        return refresh_window(state, asset)
+
+    if not new.empty:
+        # Files rewritten by compaction bring back rows already kept
+        rows = pd.concat([rows, _window(new)], ignore_index=True).drop_duplicates()
+    state.update(version=version, rows=_window(rows))
+    return len(new)
+
+
+def official_rates() -> pd.DataFrame:
+    """Latest BCB official rate of each currency (currency, official_date, official_exchange_rate)."""
+    stamp = file_stamp(BCB_MASTER_PATH)
+    if stamp is None:
+        return pd.DataFrame(columns=["currency", "official_date", "official_exchange_rate"])
+    return _cached_official_rates(str(BCB_MASTER_PATH), stamp)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_official_rates(path_str: str, stamp: tuple[int, int]) -> pd.DataFrame:
+    bcb = pd.read_parquet(path_str, columns=["date", "currency", "official_exchange_rate"])
+    latest = bcb.sort_values("date").groupby("currency").tail(1)
+    return latest.rename(columns={"date": "official_date"})[
+        ["currency", "official_date", "official_exchange_rate"]
+    ]
+
+
+def latest_quotes(rows: pd.DataFrame, official: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per currency, from its latest run in the window: best BUY (lowest) and
+    SELL (highest) ad prices, their spread, and the signed premium of
+    their mid price over the latest official rate.
+    """
+    latest = rows[rows["run_index"] == rows.groupby("currency")["run_index"].transform("max")]
+    by_currency = latest.groupby("currency")
+
+    quotes = by_currency.agg(run_index=("run_index", "max"), scrape_ts=("scrape_ts", "max"))
+    quotes["best_buy"] = latest[latest["side"] == "BUY"].groupby("currency")["price"].min()
+    quotes["best_sell"] = latest[latest["side"] == "SELL"].groupby("currency")["price"].max()
+    quotes = quotes.reset_index()
+
+    mid = (quotes["best_buy"] + quotes["best_sell"]) / 2
+    quotes["spread_abs"] = (quotes["best_buy"] - quotes["best_sell"]).abs()
+    quotes["spread_pct"] = quotes["spread_abs"] / mid * 100
+
+    quotes = quotes.merge(official, on="currency", how="left")
+    gap = mid - quotes["official_exchange_rate"]
+    quotes["premium_pct"] = gap / quotes["official_exchange_rate"] * 100
+    return quotes
+
+
+def render_live_tail(asset: str = DEFAULT_ASSET) -> None:
+    st.subheader("4. Live Tail")
+    st.markdown(
+        """
+        Latest **best BUY/SELL prices**, **spread** and **premium** over the official rate,
+        per currency, read from the processed Phase 1 data as runs are stored.
+        The table refreshes on its own every 30 seconds.
+        """
+    )
+    _live_quotes(asset)
+
+
+@st.fragment(run_every=LIVE_REFRESH)
+def _live_quotes(asset: str) -> None:
+    state = st.session_state.setdefault("live_tail", {})
+    read = refresh_window(state, asset)
+
+    rows = state["rows"]
+    if rows.empty:
+        st.info("No processed runs available yet.")
+        return
+
+    quotes = latest_quotes(rows, official_rates())
+    quotes["scrape_ts"] = quotes["scrape_ts"].dt.strftime("%Y-%m-%d %H:%M UTC")
+    st.caption(
+        f"Run {rows['run_index'].max()} · {rows['run_index'].nunique()} runs in memory · "
+        f"{read:,} rows read at this refresh"
+    )
+    st.dataframe(
+        quotes.round(4),
+        width='stretch',
+        hide_index=True,
+        column_config={
+            "scrape_ts": "Scraped",
+            "best_buy": "Best Buy",
+            "best_sell": "Best Sell",
+            "spread_abs": "Spread (abs)",
+            "spread_pct": "Spread (%)",
+            "official_date": "Official rate date",
+            "official_exchange_rate": "Official rate",
+            "premium_pct": "Premium (%)",
+        },
+    )
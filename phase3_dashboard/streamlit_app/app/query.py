@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import streamlit as st
+
+from app import DEFAULT_ASSET
+from app.data import (
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL,
+    export_file,
+    export_name,
+    file_stamp,
+    read_export_table,
+)
+from binance.read_processed import available_dates, pin_version, read_master
+from binance.schema import widen_rates
+
+# ----------------------------------------------------
+# Query layer
+#
+# Pages ask for the slice they display instead of loading a whole file
+# and narrowing it in pandas: the currency, date, hour and column filters
+# of the UI become a pyarrow expression evaluated in the Parquet scan, so
+# only the matching rows are decoded. Exports are queried by table (see
+# data.export_file); the individual ads come from the processed Phase 1
+# store, where the currency and date filters also prune partitions.
+# Results are cached per slice and per export file generation / manifest
+# version, within the cache bounds of app/data.py.
+# ----------------------------------------------------
+
+# Processed columns shown for individual ads
+ADS_COLUMNS = (
+    "scrape_datetime",
+    "side",
+    "price",
+    "min_amount",
+    "max_amount",
+    "merchant_name",
+    "finish_rate",
+    "positive_rate",
+)
+
+
+def _as_date(value):
+    return None if value is None else pd.Timestamp(value).date()
+
+
+def _all_of(conditions: list) -> pc.Expression | None:
+    where = None
+    for condition in conditions:
+        where = condition if where is None else where & condition
+    return where
+
+
+def _export_filter(start=None, end=None, hours=None, currencies=None) -> pc.Expression | None:
+    conditions = []
+    if start is not None:
+        conditions.append(pc.field("date") >= pa.scalar(start))
+    if end is not None:
+        conditions.append(pc.field("date") <= pa.scalar(end))
+    if hours is not None:
+        conditions.append((pc.field("hour") >= hours[0]) & (pc.field("hour") <= hours[1]))
+    if currencies is not None:
+        conditions.append(pc.field("currency").isin(list(currencies)))
+    return _all_of(conditions)
+
+
+def _ads_filter(hours=None, sides=None, merchant=None) -> pc.Expression | None:
+    conditions = []
+    if hours is not None:
+        hour = pc.hour(pc.field("scrape_ts"))
+        conditions.append((hour >= hours[0]) & (hour <= hours[1]))
+    if sides is not None:
+        conditions.append(pc.field("side").isin(list(sides)))
+    if merchant:
+        name = pc.field("merchant_name").cast(pa.string())
+        conditions.append(pc.match_substring(name, merchant, ignore_case=True))
+    return _all_of(conditions)
+
+
+def export_date_range(table: str, currency: str | None = None,
+                      asset: str = DEFAULT_ASSET) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """
+    First and last date of an export, from the Parquet statistics (no row
+    is read; a CSV export is scanned). None when the export is missing or
+    empty.
+    """
+    path = export_file(table, currency, asset)
+    stamp = None if path is None else file_stamp(path)
+    if stamp is None:
+        return None
+    return _cached_date_range(str(path), export_name(table), stamp)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_date_range(path_str: str, name: str, stamp: tuple[int, int]):
+    if not path_str.endswith(".parquet"):
+        dates = read_export_table(Path(path_str), name, columns=["date"]).column("date")
+        bounds = pc.min_max(dates)
+        if not bounds["min"].is_valid:
+            return None
+        return pd.Timestamp(bounds["min"].as_py()), pd.Timestamp(bounds["max"].as_py())
+
+    meta = pq.ParquetFile(path_str).metadata
+    column = meta.schema.names.index("date")
+    lows, highs = [], []
+    for i in range(meta.num_row_groups):
+        stats = meta.row_group(i).column(column).statistics
+        if stats is not None and stats.has_min_max:
+            lows.append(stats.min)
+            highs.append(stats.max)
+    if not lows:
+        return None
+    return pd.Timestamp(min(lows)), pd.Timestamp(max(highs))
+
+
+def query_export(table: str, currency: str | None = None, asset: str = DEFAULT_ASSET,
+                 start=None, end=None, hours=None, currencies=None, columns=None) -> pd.DataFrame:
+    """
+    Rows of one export within start..end (dates, inclusive), the hour
+    window hours=(first, last) and the given currencies, projected to
+    `columns`. Every argument left to None is not filtered on.
+    """
+    path = export_file(table, currency, asset)
+    stamp = None if path is None else file_stamp(path)
+    if stamp is None:
+        return pd.DataFrame()
+    return _cached_query_export(
+        str(path),
+        export_name(table),
+        stamp,
+        _as_date(start),
+        _as_date(end),
+        None if hours is None else tuple(hours),
+        None if currencies is None else tuple(currencies),
+        None if columns is None else tuple(columns),
+    )
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_query_export(path_str: str, name: str, stamp: tuple[int, int], start, end, hours,
+                         currencies, columns) -> pd.DataFrame:
+    table = read_export_table(
+        Path(path_str),
+        name,
+        columns=None if columns is None else list(columns),
+        filters=_export_filter(start, end, hours, currencies),
+    )
+    return table.to_pandas(date_as_object=False)
+
+
+def ads_date_range(currency: str, asset: str = DEFAULT_ASSET) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    """First and last date with processed ads for a currency (from the partition paths)."""
+    dates = _cached_ads_dates(currency, asset, pin_version())
+    if not dates:
+        return None
+    return pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_ads_dates(currency: str, asset: str, version) -> list[str]:
+    return available_dates(currencies=currency, assets=asset, version=version)
+
+
+def query_ads(currency: str, asset: str = DEFAULT_ASSET, start=None, end=None, hours=None,
+              sides=None, merchant: str | None = None, columns=ADS_COLUMNS) -> pd.DataFrame:
+    """
+    Individual processed ads of one currency, read from the Phase 1 store:
+    only the partitions of start..end are opened, and the UTC hour window
+    hours=(first, last), the sides and the merchant name (substring, any
+    case) are applied in the scan.
+    """
+    return _cached_query_ads(
+        currency,
+        asset,
+        None if start is None else str(_as_date(start)),
+        None if end is None else str(_as_date(end)),
+        None if hours is None else tuple(hours),
+        None if sides is None else tuple(sides),
+        merchant or None,
+        tuple(columns),
+        pin_version(),
+    )
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _cached_query_ads(currency: str, asset: str, start, end, hours, sides, merchant, columns,
+                      version) -> pd.DataFrame:
+    df = read_master(
+        currencies=currency,
+        start_date=start,
+        end_date=end,
+        columns=list(columns),
+        version=version,
+        assets=asset,
+        where=_ads_filter(hours, sides, merchant),
+    )
+    for col in ["finish_rate", "positive_rate"]:
+        if col in df.columns:
+            df[col] = widen_rates(df[col])
+    return df
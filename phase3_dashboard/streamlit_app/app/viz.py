@@ -1,10 +1,90 @@
 import altair as alt
+import numpy as np
 import pandas as pd
 
 # ------------------------------------------------------------------------------
-def overview_spreads_chart(df: pd.DataFrame) -> alt.Chart:
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"]).dt.normalize()  # midnight
+# Resolution policy
+#
+# Charts embed their rows in the Vega-Lite spec sent to the browser, so the
+# number of marks is bounded here, on the server, whatever the selected
+# range: hour x day heatmaps switch to week then month columns when the days
+# would not fit the chart width, and line series are reduced with LTTB
+# (largest triangle three buckets) to about one point per PX_PER_POINT px.
+# ------------------------------------------------------------------------------
+
+CHART_WIDTH = 900       # px, assumed for container-width charts
+PX_PER_POINT = 3        # line charts: at most one point per 3 px per series
+MIN_CELL_PX = 6         # heatmaps: narrowest column
+
+# Date columns of a heatmap, finest first:
+# (pandas period, Vega-Lite time unit, axis title, axis format)
+DATE_RESOLUTIONS = [
+    ("D", "yearmonthdate", "Day", "%b %d"),
+    ("W-SAT", "yearweek", "Week", "%b %d"),   # Sunday-based, as Vega-Lite weeks
+    ("M", "yearmonth", "Month", "%b %Y"),
+]
+
+
+def date_resolution(dates: pd.Series, width: int = CHART_WIDTH) -> tuple:
+    """Finest DATE_RESOLUTIONS entry whose columns fit in `width` px."""
+    max_columns = max(width // MIN_CELL_PX, 1)
+    for resolution in DATE_RESOLUTIONS:
+        if dates.dt.to_period(resolution[0]).nunique() <= max_columns:
+            return resolution
+    return DATE_RESOLUTIONS[-1]
+
+
+def bucket_dates(df: pd.DataFrame, freq: str, agg: dict) -> pd.DataFrame:
+    """
+    Rows of an hour x day table aggregated to (date bucket, hour) with
+    `agg` ({column: function}); `date` becomes the bucket start.
+    """
+    if freq == "D":
+        return df
+    df = df.assign(date=df["date"].dt.to_period(freq).dt.start_time)
+    return df.groupby(["date", "hour"], as_index=False).agg(agg)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the n_out points LTTB keeps from the series (x, y), x sorted."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = int(i * every) + 1, int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        # Point of this bucket forming the largest triangle with the last
+        # kept point and the average of the next bucket
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample_lines(df: pd.DataFrame, y: str, x: str = "date", by: str | None = "currency",
+                     width: int = CHART_WIDTH) -> pd.DataFrame:
+    """Rows of each `by` series kept by LTTB on (x, y), rows with missing y dropped."""
+    n_out = max(width // PX_PER_POINT, 3)
+    df = df.dropna(subset=[y]).sort_values([by, x] if by else [x])
+    groups = df.groupby(by, sort=False) if by else [(None, df)]
+
+    parts = []
+    for _, series in groups:
+        xs = series[x].to_numpy("datetime64[ns]").astype("int64").astype("float64")
+        parts.append(series.iloc[lttb_indices(xs, series[y].to_numpy("float64"), n_out)])
+    return pd.concat(parts) if parts else df
+
+# ------------------------------------------------------------------------------
+def overview_spreads_chart(df: pd.DataFrame, width: int = CHART_WIDTH) -> alt.Chart:
+    df = downsample_lines(df, "spread_pct", width=width)
 
     return (
         alt.Chart(df)
@@ -37,17 +117,8 @@ def intraday_mean_over_range(df: pd.DataFrame, start_d, end_d) -> pd.DataFrame:
     Output:
       hour, mean_buy_price, mean_sell_price
     """
-    df = df.copy()
-
-    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
-    df["hour"] = pd.to_numeric(df["hour"], errors="coerce").astype("Int64")
-    df["avg_buy_price"] = pd.to_numeric(df["avg_buy_price"], errors="coerce")
-    df["avg_sell_price"] = pd.to_numeric(df["avg_sell_price"], errors="coerce")
-
-    df = df.dropna(subset=["date", "hour", "avg_buy_price", "avg_sell_price"])
-    df["hour"] = df["hour"].astype(int)
-
-    df = df[(df["date"] >= start_d) & (df["date"] <= end_d)].copy()
+    df = df.dropna(subset=["avg_buy_price", "avg_sell_price"])
+    df = df[(df["date"] >= start_d) & (df["date"] <= end_d)]
 
     return (
         df.groupby("hour", as_index=False)[["avg_buy_price", "avg_sell_price"]]
@@ -60,10 +131,6 @@ def intraday_mean_over_range(df: pd.DataFrame, start_d, end_d) -> pd.DataFrame:
     )
 
 def intraday_profile_chart(df_long: pd.DataFrame) -> alt.Chart:
-    df_long = df_long.copy()
-    df_long["hour"] = pd.to_numeric(df_long["hour"], errors="coerce")
-    df_long["price"] = pd.to_numeric(df_long["price"], errors="coerce")
-
     ymin, ymax = df_long["price"].min(), df_long["price"].max()
     pad = (ymax - ymin) * 0.05 if pd.notna(ymin) and pd.notna(ymax) and ymax > ymin else 0.01
 
@@ -96,15 +163,9 @@ def intraday_profile_chart(df_long: pd.DataFrame) -> alt.Chart:
     )
 
 # ------------------------------------------------------------------------------
-def official_premium_chart(prem: pd.DataFrame, metric: str = "premium_pct") -> alt.Chart:
-    prem = prem.copy()
-    prem = prem.drop(columns=[c for c in ["Unnamed: 0"] if c in prem.columns])
-
-    prem["date"] = pd.to_datetime(prem["date"]).dt.normalize()
-
-    for c in ["p2p_avg_price", "official_exchange_rate", "premium_abs", "premium_pct"]:
-        if c in prem.columns:
-            prem[c] = pd.to_numeric(prem[c], errors="coerce")
+def official_premium_chart(prem: pd.DataFrame, metric: str = "premium_pct",
+                           width: int = CHART_WIDTH) -> alt.Chart:
+    prem = downsample_lines(prem, metric, by=None, width=width)
 
     # Metric-specific labels
     metric_title = "Premium (%)" if metric == "premium_pct" else "Premium (abs)"
@@ -139,20 +200,19 @@ def official_premium_chart(prem: pd.DataFrame, metric: str = "premium_pct") -> a
     )
 
 # ------------------------------------------------------------------------------
-def order_imbalance_heatmap(df: pd.DataFrame) -> alt.Chart:
-    df = df.copy()
-
-    # Clean columns + types
-    df = df.drop(columns=[c for c in ["Unnamed: 0"] if c in df.columns])
-    df["date"] = pd.to_datetime(df["date"]).dt.normalize()
-    df["hour"] = df["hour"].astype(int)
-    df["imbalance"] = pd.to_numeric(df["imbalance"], errors="coerce")
+def order_imbalance_heatmap(df: pd.DataFrame, width: int = CHART_WIDTH) -> alt.Chart:
+    freq, unit, period, fmt = date_resolution(df["date"], width)
+    if freq != "D":
+        # Imbalance of the bucket from its summed volumes
+        df = bucket_dates(df, freq, {"buy_volume": "sum", "sell_volume": "sum"})
+        total = df["buy_volume"] + df["sell_volume"]
+        df["imbalance"] = (df["buy_volume"] - df["sell_volume"]) / total.where(total != 0)
 
     return (
         alt.Chart(df)
         .mark_rect()
         .encode(
-            x=alt.X("yearmonthdate(date):T", title="Date", axis=alt.Axis(format="%b %d")),
+            x=alt.X(f"{unit}(date):T", title=period, axis=alt.Axis(format=fmt)),
             y=alt.Y("hour:O", title="Hour", sort="descending"),
             color=alt.Color(
                 "imbalance:Q",
@@ -160,39 +220,35 @@ def order_imbalance_heatmap(df: pd.DataFrame) -> alt.Chart:
                 scale=alt.Scale(domainMid=0),  # centers color around 0 (balanced)
             ),
             tooltip=[
-                alt.Tooltip("yearmonthdate(date):T", title="Date"),
+                alt.Tooltip(f"{unit}(date):T", title=period),
                 alt.Tooltip("hour:O", title="Hour"),
                 alt.Tooltip("imbalance:Q", title="Imbalance", format=".3f"),
                 alt.Tooltip("buy_volume:Q", title="Buy Volume", format=",.0f"),
                 alt.Tooltip("sell_volume:Q", title="Sell Volume", format=",.0f"),
             ],
         )
-        .properties(height=420, title="Order Imbalance per Hour and Day")
+        .properties(height=420, title=f"Order Imbalance per Hour and {period}")
     )
 
 # ------------------------------------------------------------------------------
-def p2p_spread_heatmap(df: pd.DataFrame, metric: str = "spread_pct") -> alt.Chart:
-    df = df.copy()
-    df = df.drop(columns=[c for c in ["Unnamed: 0"] if c in df.columns])
-
-    df["date"] = pd.to_datetime(df["date"]).dt.normalize()
-    df["hour"] = df["hour"].astype(int)
-
-    for c in ["avg_buy_price", "avg_sell_price", "spread_abs", "spread_pct"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
+def p2p_spread_heatmap(df: pd.DataFrame, metric: str = "spread_pct",
+                       width: int = CHART_WIDTH) -> alt.Chart:
     metric_title = "Spread (%)" if metric == "spread_pct" else "Spread (abs)"
 
+    freq, unit, period, fmt = date_resolution(df["date"], width)
+    # Mean hourly prices and spreads over the days of each bucket
+    means = ["avg_buy_price", "avg_sell_price", "spread_abs", "spread_pct"]
+    df = bucket_dates(df, freq, {**{c: "mean" for c in means}, "currency": "first"})
+
     return (
         alt.Chart(df)
         .mark_rect()
         .encode(
-            x=alt.X("yearmonthdate(date):T", title="Date", axis=alt.Axis(format="%b %d")),
+            x=alt.X(f"{unit}(date):T", title=period, axis=alt.Axis(format=fmt)),
             y=alt.Y("hour:O", title="Hour", sort="descending"),
             color=alt.Color(f"{metric}:Q", title=metric_title),
             tooltip=[
-                alt.Tooltip("yearmonthdate(date):T", title="Date"),
+                alt.Tooltip(f"{unit}(date):T", title=period),
                 alt.Tooltip("hour:O", title="Hour"),
                 alt.Tooltip("avg_buy_price:Q", title="Avg Buy", format=".2f"),
                 alt.Tooltip("avg_sell_price:Q", title="Avg Sell", format=".2f"),
@@ -201,20 +257,15 @@ def p2p_spread_heatmap(df: pd.DataFrame, metric: str = "spread_pct") -> alt.Char
                 alt.Tooltip("currency:N", title="Currency"),
             ],
         )
-        .properties(height=420, title=f"P2P Spread per Hour and day ({metric_title})")
+        .properties(height=420, title=f"P2P Spread per Hour and {period.lower()} ({metric_title})")
     )
 
 # ------------------------------------------------------------------------------
-def price_volatility_chart(df: pd.DataFrame, window: int = 7) -> alt.Chart:
-    df = df.copy()
-    df = df.drop(columns=[c for c in ["Unnamed: 0"] if c in df.columns])
-
-    df["date"] = pd.to_datetime(df["date"]).dt.normalize()
+def price_volatility_chart(df: pd.DataFrame, window: int = 7, width: int = CHART_WIDTH) -> alt.Chart:
     df = df.sort_values(["currency", "date"])
 
     # If volatility is missing / mostly NaN, compute rolling vol from log_return
     if "volatility" not in df.columns or df["volatility"].isna().all():
-        df["log_return"] = pd.to_numeric(df.get("log_return"), errors="coerce")
         df["volatility"] = (
             df.groupby("currency")["log_return"]
               .rolling(window=window, min_periods=window)
@@ -222,10 +273,8 @@ def price_volatility_chart(df: pd.DataFrame, window: int = 7) -> alt.Chart:
               .reset_index(level=0, drop=True)
         )
 
-    df["volatility"] = pd.to_numeric(df["volatility"], errors="coerce")
-
     return (
-        alt.Chart(df.dropna(subset=["volatility"]))
+        alt.Chart(downsample_lines(df, "volatility", width=width))
         .mark_line()
         .encode(
             x=alt.X("yearmonthdate(date):T", title="Date", axis=alt.Axis(format="%b %d")),
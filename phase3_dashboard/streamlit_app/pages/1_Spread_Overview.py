@@ -1,5 +1,5 @@
 import streamlit as st
-from app.layout import render_spread_overview
+from app.layout import render_spread_overview, select_asset
 
 st.set_page_config(page_title="Spread Overview", layout="wide")
-render_spread_overview()
\ No newline at end of file
+render_spread_overview(select_asset())
\ No newline at end of file
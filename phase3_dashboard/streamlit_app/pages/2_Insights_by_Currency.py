@@ -6,30 +6,37 @@ from app.layout import (
     render_spread_heatmap,
     render_price_volatility,
     render_top_advertisers,
+    render_ads_explorer,
+    select_asset,
     )
 
 st.set_page_config(page_title="P2P Market Insights by Currency", layout="wide")
 
 st.title("2. P2P Market Insights by Currency")
 
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
-    ["1) Intraday Profile", "2) P2P vs Official Premium", "3) Order Imbalance", "4) P2P Spread", "5) Price Volatility with a 7 Day Rolling Window","6) Top Advertisers by Ads and Volume"]
+asset = select_asset()
+
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+    ["1) Intraday Profile", "2) P2P vs Official Premium", "3) Order Imbalance", "4) P2P Spread", "5) Price Volatility with a 7 Day Rolling Window","6) Top Advertisers by Ads and Volume","7) Ads Explorer"]
 )
 
 with tab1:
-    render_intraday_profile()
+    render_intraday_profile(asset)
 
 with tab2:
-    render_official_premium()
+    render_official_premium(asset)
 
 with tab3:
-    render_order_imbalance()
+    render_order_imbalance(asset)
 
 with tab4:
-    render_spread_heatmap()
+    render_spread_heatmap(asset)
 
 with tab5:
-    render_price_volatility()
+    render_price_volatility(asset)
     
 with tab6:
-    render_top_advertisers()
\ No newline at end of file
+    render_top_advertisers(asset)
+
+with tab7:
+    render_ads_explorer(asset)
@@ -1,5 +1,5 @@
 import streamlit as st
-from app.layout import render_summary_table
+from app.layout import render_summary_table, select_asset
 
 st.set_page_config(page_title="Summary Table", layout="wide")
-render_summary_table()
+render_summary_table(select_asset())
@@ -0,0 +1,6 @@
+import streamlit as st
+from app.layout import select_asset
+from app.live import render_live_tail
+
+st.set_page_config(page_title="Live Tail", layout="wide")
+render_live_tail(select_asset())
@@ -0,0 +1,91 @@
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+STREAMLIT_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if STREAMLIT_APP_DIR not in sys.path:
+    sys.path.insert(0, STREAMLIT_APP_DIR)
+
+import app  # noqa: F401  (puts the Phase 1 scripts and phase3_dashboard on sys.path)
+from app import data
+from binance import paths_binance
+from binance.base_scraper import p2p_to_columns
+from binance.clean_standardize import clean_decoded
+from binance.multi_fetch import SIDES, to_frame
+from binance.snapshot_and_master import store_processed
+from common.atomic_write import write_parquet
+from common.standin_server import StandinState
+from extraction_engine import (
+    EXPORT_SCHEMAS, build_tables, export_frames, load_buckets, output_files, typed_frame,
+)
+
+DATA_MODULES = ("binance", "bcb", "common", "extraction_engine", "app")
+
+EXPORT_RUNS = ["2025-12-07T10:00:00Z", "2025-12-07T15:00:00Z", "2025-12-08T11:00:00Z"]
+EXPORT_BCB = pd.DataFrame({
+    "date": ["2025-12-07"], "currency": ["BOB"], "official_exchange_rate": [6.96],
+})
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Cached reads are keyed on file generations and versions, alike from one test to the next."""
+    st.cache_data.clear()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Points the Phase 1 data paths of every loaded module at an empty directory."""
+    old = paths_binance.DATA_DIR
+    for name, module in list(sys.modules.items()):
+        if module is None or name.split(".")[0] not in DATA_MODULES:
+            continue
+        for attr, value in list(vars(module).items()):
+            if isinstance(value, (str, Path)) and str(value).startswith(old):
+                moved = str(tmp_path) + str(value)[len(old):]
+                monkeypatch.setattr(module, attr, moved if isinstance(value, str) else Path(moved))
+    return tmp_path
+
+
+def run_frame(run_index, timestamp, fiats=("BOB", "ARS"), depth=10, asset="USDT"):
+    """Cleaned rows of one run, decoded from stand-in server responses."""
+    book = StandinState(depth=depth, seed=run_index)
+    frames = []
+    for fiat in fiats:
+        parts = [
+            p2p_to_columns(book.search_page({"asset": asset, "fiat": fiat, "tradeType": side}),
+                           side, timestamp)
+            for side in SIDES
+        ]
+        frames.append(clean_decoded(to_frame(parts, run_index)))
+    return pd.concat(frames, ignore_index=True)
+
+
+def store_runs(timestamps, first_run=1, **kwargs):
+    """Stores one run per timestamp in the master dataset; returns their rows."""
+    frames = []
+    for run_index, timestamp in enumerate(timestamps, start=first_run):
+        df = run_frame(run_index, timestamp, **kwargs)
+        store_processed(df)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def exports(data_dir, monkeypatch):
+    """Exports of EXPORT_RUNS, written as data_extraction.py writes them, read by the app."""
+    root = data_dir / "exports"
+    monkeypatch.setattr(data, "EXPORTS_DIR", root)
+    monkeypatch.setattr(data, "ASSET_EXPORTS_DIR", root / "assets")
+
+    store_runs(EXPORT_RUNS)
+    currencies = ["ARS", "BOB"]
+    frames = export_frames(build_tables(*load_buckets("USDT"), EXPORT_BCB), currencies)
+    for relative, (name, _) in output_files(currencies).items():
+        write_parquet(typed_frame(frames[relative], name), root / relative,
+                      schema=EXPORT_SCHEMAS[name], index=False)
+    return root
@@ -0,0 +1,76 @@
+import pandas as pd
+
+from app import data
+from app.query import query_ads, query_export
+from common.atomic_write import write_parquet
+from extraction_engine import EXPORT_SCHEMAS
+from conftest import store_runs
+
+
+def count_reads(monkeypatch):
+    reads = []
+    read_export = data._read_export
+
+    def counted(path, name):
+        reads.append(path)
+        return read_export(path, name)
+
+    monkeypatch.setattr(data, "_read_export", counted)
+    return reads
+
+
+def rewrite(path, df, name):
+    """Replaces an export the way data_extraction.py does (atomically)."""
+    write_parquet(df, path, schema=EXPORT_SCHEMAS[name], index=False)
+
+
+def ads_count(currency):
+    return len(query_ads(currency, columns=["price"]))
+
+
+def test_file_stamp_follows_the_file_generation(tmp_path):
+    path = tmp_path / "export.parquet"
+    assert data.file_stamp(path) is None
+
+    path.write_bytes(b"one")
+    first = data.file_stamp(path)
+    path.write_bytes(b"three")
+    assert data.file_stamp(path) not in (None, first)
+
+
+def test_reruns_hit_the_cache_until_the_export_is_replaced(exports, monkeypatch):
+    reads = count_reads(monkeypatch)
+    before = data.load_order_imbalance("BOB")
+    pd.testing.assert_frame_equal(data.load_order_imbalance("BOB"), before)
+    assert len(reads) == 1
+
+    # A new extraction is picked up on the next rerun, without a restart
+    rewrite(data.export_path(data.ORDER_IMB_DIR, "BOB"), before.iloc[:1], "order_imbalance")
+    assert len(data.load_order_imbalance("BOB")) == 1
+    assert len(reads) == 2
+
+    start = before["date"].min()
+    assert len(query_export(data.ORDER_IMB_DIR, "BOB", start=start)) == 1
+
+
+def test_ad_queries_follow_the_master_version(exports):
+    assert ads_count("BOB") == ads_count("BOB")
+    before = ads_count("BOB")
+
+    store_runs(["2025-12-09T10:00:00Z"], first_run=10, fiats=("BOB",))
+    assert ads_count("BOB") > before
+
+
+def test_caches_are_bounded(exports, monkeypatch):
+    reads = count_reads(monkeypatch)
+    path = str(data.export_path(data.P2P_HOUR_DIR, "BOB"))
+
+    # Older generations are evicted past CACHE_MAX_ENTRIES
+    for generation in range(data.CACHE_MAX_ENTRIES + 1):
+        data._cached_read_export(path, "p2p_spread", (generation, 0))
+    assert len(reads) == data.CACHE_MAX_ENTRIES + 1
+
+    data._cached_read_export(path, "p2p_spread", (data.CACHE_MAX_ENTRIES, 0))
+    assert len(reads) == data.CACHE_MAX_ENTRIES + 1
+    data._cached_read_export(path, "p2p_spread", (0, 0))
+    assert len(reads) == data.CACHE_MAX_ENTRIES + 2
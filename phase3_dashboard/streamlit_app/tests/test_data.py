@@ -0,0 +1,63 @@
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app import data
+from common.atomic_write import write_csv
+from extraction_engine import EXPORT_SCHEMAS
+
+
+def test_parquet_exports_carry_their_schema(exports):
+    path = data.export_file(data.P2P_HOUR_DIR, "BOB")
+    assert path == exports / "p2p_spread_by_currency" / "BOB_p2p_spread.parquet"
+    assert pq.read_schema(path).remove_metadata() == EXPORT_SCHEMAS["p2p_spread"]
+
+    df = data.load_spread_hour("BOB")
+    assert len(df) == 3
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])
+    assert df["hour"].dtype == "int8"
+    assert df["spread_pct"].dtype == "float64"
+
+
+def test_csv_exports_read_as_the_parquet_ones(exports):
+    parquet = data.export_path(data.DAILY_FIAT_DIR)
+    expected = data.load_daily_fiat_comparison()
+
+    # An extraction from before the Parquet exports left only the CSV
+    write_csv(pd.read_parquet(parquet), parquet.with_suffix(".csv"), index=False)
+    parquet.unlink()
+    assert data.export_file(data.DAILY_FIAT_DIR) == parquet.with_suffix(".csv")
+
+    table = data.read_export_table(parquet.with_suffix(".csv"), "fiat_comparison")
+    assert table.schema == EXPORT_SCHEMAS["fiat_comparison"]
+    pd.testing.assert_frame_equal(data.load_daily_fiat_comparison(), expected)
+
+
+def test_parquet_is_preferred_to_csv(exports):
+    parquet = data.export_path(data.INTRADAY_DIR, "ARS")
+    write_csv(pd.read_parquet(parquet).iloc[:1], parquet.with_suffix(".csv"), index=False)
+    assert data.export_file(data.INTRADAY_DIR, "ARS") == parquet
+
+
+def test_projection_and_filters_are_applied_in_the_read(exports):
+    path = data.export_file(data.P2P_HOUR_DIR, "BOB")
+    table = data.read_export_table(path, "p2p_spread", columns=["hour", "spread_pct"],
+                                   filters=pc.field("hour") == 11)
+    assert table.column_names == ["hour", "spread_pct"]
+    assert table.column("hour").to_pylist() == [11]
+
+
+def test_missing_exports_load_empty(exports):
+    assert data.export_file(data.P2P_HOUR_DIR, "USD") is None
+    assert data.load_spread_hour("USD").empty
+    assert data.load_p2p_summary(asset="USDC").empty
+
+
+def test_currencies_and_assets_are_found_on_disk(exports):
+    assert data.available_currencies() == ["ARS", "BOB"]
+    assert data.available_assets() == ["USDT"]
+
+    (exports / "assets" / "USDC" / data.VOL_DIR).mkdir(parents=True)
+    (exports / "assets" / "USDC" / data.VOL_DIR / "EUR_price_volatility.csv").touch()
+    assert data.available_assets() == ["USDT", "USDC"]
+    assert data.available_currencies("USDC") == ["EUR"]
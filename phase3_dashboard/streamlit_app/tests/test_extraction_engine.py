@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import extraction_engine
+from extraction_engine import (
+    MERCHANT_BUCKET_COLUMNS,
+    build_tables,
+    export_frames,
+    load_buckets,
+    output_files,
+    top_advertisers,
+)
+from conftest import store_runs
+
+TIMESTAMPS = ["2025-12-07T10:00:00Z", "2025-12-07T11:30:00Z", "2025-12-08T09:00:00Z"]
+
+
+def bcb_rates(rates):
+    return pd.DataFrame(
+        [(date, ccy, rate) for (date, ccy), rate in rates.items()],
+        columns=["date", "currency", "official_exchange_rate"],
+    )
+
+
+def from_rows(monkeypatch):
+    """load_buckets() as computed from the ads, without the ingest rollups."""
+    monkeypatch.setattr(extraction_engine, "read_rollup", lambda **kwargs: None)
+    return load_buckets("USDT")
+
+
+def test_rollup_buckets_equal_row_buckets(data_dir, monkeypatch):
+    store_runs(TIMESTAMPS)
+    hourly, merchants = load_buckets("USDT")
+    row_hourly, row_merchants = from_rows(monkeypatch)
+
+    pd.testing.assert_frame_equal(hourly, row_hourly, check_dtype=False)
+    keys = ["currency", "date", "merchant_name"]
+    pd.testing.assert_frame_equal(
+        merchants.sort_values(keys, ignore_index=True),
+        row_merchants.sort_values(keys, ignore_index=True),
+        check_dtype=False,
+    )
+
+
+def test_tables_follow_the_rows(data_dir, monkeypatch):
+    rows = store_runs(TIMESTAMPS)
+    rows["date"] = rows["timestamp_scraped"].str[:10]
+    rows["hour"] = rows["timestamp_scraped"].str[11:13].astype(int)
+    hourly, merchants = from_rows(monkeypatch)
+    tables = build_tables(hourly, merchants, bcb_rates({("2025-12-07", "BOB"): 6.96}))
+
+    means = rows.groupby(["date", "fiat", "side"])["price"].mean().unstack("side")
+    fiat = tables["fiat_comparison"].set_index(["date", "currency"])
+    assert np.allclose(fiat["avg_buy_price"], means.loc[fiat.index, "BUY"])
+    assert np.allclose(fiat["avg_sell_price"], means.loc[fiat.index, "SELL"])
+    assert np.allclose(fiat["spread_abs"], (means["BUY"] - means["SELL"]).abs().loc[fiat.index])
+
+    spread = tables["p2p_spread"]
+    assert len(spread) == rows.groupby(["fiat", "date", "hour"]).ngroups
+
+    # Only the days and currencies with an official rate get a premium
+    premium = tables["official_premium"]
+    assert list(zip(premium["date"], premium["currency"])) == [("2025-12-07", "BOB")]
+    mid = means.loc[("2025-12-07", "BOB")].mean()
+    assert premium["p2p_avg_price"].iloc[0] == pytest.approx(mid)
+    assert premium["premium_pct"].iloc[0] == pytest.approx((mid - 6.96) / 6.96 * 100)
+
+
+def test_top_advertisers_rank_by_volume_first_seen_wins_ties():
+    merchants = pd.DataFrame(
+        [
+            ("BOB", "2025-12-07", "a", 1, 10.0, 0.9, 1, 0.9, 1),
+            ("BOB", "2025-12-07", "b", 1, 30.0, 0.8, 1, 0.8, 1),
+            ("BOB", "2025-12-08", "c", 2, 20.0, 1.8, 2, 1.6, 2),
+            ("BOB", "2025-12-08", "a", 1, 20.0, 0.7, 1, 0.7, 1),
+            ("ARS", "2025-12-07", "d", 1, 5.0, 1.0, 1, 1.0, 1),
+        ],
+        columns=MERCHANT_BUCKET_COLUMNS,
+    )
+    top = top_advertisers(merchants, n=2)
+
+    # a and b both advertised 30: a was seen first
+    assert list(zip(top["currency"], top["merchant_name"])) == [
+        ("ARS", "d"), ("BOB", "a"), ("BOB", "b"),
+    ]
+    a = top[top["merchant_name"] == "a"].iloc[0]
+    assert (a["ads_count"], a["total_volume"]) == (2, 30)
+    assert a["avg_finish_rate"] == pytest.approx(0.8)
+
+
+def test_every_currency_gets_its_files(data_dir):
+    store_runs(TIMESTAMPS[:1])
+    hourly, merchants = load_buckets("USDT")
+    tables = build_tables(hourly, merchants, bcb_rates({("2025-12-07", "BOB"): 6.96}))
+
+    frames = export_frames(tables, ["ARS", "BOB", "USD"])
+    assert set(frames) == set(output_files(["ARS", "BOB", "USD"]))
+
+    # A currency without rows gets the header only
+    usd = frames["p2p_spread_by_currency/USD_p2p_spread.parquet"]
+    assert usd.empty and list(usd.columns) == list(tables["p2p_spread"].columns)
+    ars = frames["official_premium_by_currency/ARS_official_premium.parquet"]
+    assert ars.empty
+    bob = frames["p2p_spread_by_currency/BOB_p2p_spread.parquet"]
+    assert set(bob["currency"]) == {"BOB"}
+
+
+def test_no_rows_is_an_error(data_dir, monkeypatch):
+    with pytest.raises(ValueError):
+        from_rows(monkeypatch)
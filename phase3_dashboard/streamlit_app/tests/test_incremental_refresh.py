@@ -0,0 +1,133 @@
+import pandas as pd
+import pytest
+
+import extraction_engine
+from binance.read_processed import pin_version, version_ts
+from extraction_engine import (
+    ENGINE_VERSION,
+    build_tables,
+    output_watermarks,
+    read_watermark,
+    refresh_state,
+    save_state,
+    stale_outputs,
+)
+from conftest import store_runs
+
+BCB = pd.DataFrame({
+    "date": ["2025-12-03", "2025-12-10"],
+    "currency": ["BOB", "BOB"],
+    "official_exchange_rate": [6.96, 6.96],
+})
+# Ten days of history: longer than the 7-day volatility window
+HISTORY = [f"2025-12-{day:02d}T12:00:00Z" for day in range(1, 11)]
+
+
+@pytest.fixture(params=["rollup", "rows"])
+def buckets_from(request, monkeypatch):
+    """Runs each test on the ingest rollups and on the ads themselves."""
+    if request.param == "rows":
+        monkeypatch.setattr(extraction_engine, "read_rollup", lambda **kwargs: None)
+    return request.param
+
+
+def refresh(state_dir, full=False):
+    """One extraction of the state, as data_extraction.extract_asset() does it."""
+    version = pin_version()
+    hourly, merchants, changed = refresh_state("USDT", state_dir, version=version, full=full)
+    currencies = sorted(hourly["currency"].unique())
+    save_state(state_dir, hourly, merchants, {
+        "engine": ENGINE_VERSION,
+        "master_version": version,
+        "master_ts": version_ts(version),
+        "outputs": output_watermarks(hourly, currencies),
+    }, changed)
+    return hourly, merchants, changed
+
+
+def assert_same_tables(incremental, full):
+    a, b = build_tables(*incremental[:2], BCB), build_tables(*full[:2], BCB)
+    for name in a:
+        pd.testing.assert_frame_equal(
+            a[name].reset_index(drop=True), b[name].reset_index(drop=True), check_dtype=False,
+        )
+
+
+def test_incremental_refresh_equals_full_rebuild(data_dir, tmp_path, buckets_from):
+    state_dir = tmp_path / "exports" / "_state"
+    store_runs(HISTORY)
+    assert refresh(state_dir)[2] is None
+
+    # A new day for BOB, and a late run inside the last day of ARS
+    store_runs(["2025-12-11T08:00:00Z"], first_run=len(HISTORY) + 1, fiats=("BOB",))
+    store_runs(["2025-12-10T20:00:00Z"], first_run=len(HISTORY) + 2, fiats=("ARS",))
+    incremental = refresh(state_dir)
+    assert incremental[2] == {"ARS", "BOB"}
+
+    assert_same_tables(incremental, refresh(tmp_path / "full", full=True))
+
+    outputs = read_watermark(state_dir)["outputs"]
+    assert outputs["p2p_spread_by_currency/BOB_p2p_spread.parquet"] == {
+        "date": "2025-12-11", "hour": 8, "run_index": len(HISTORY) + 1,
+    }
+
+
+def test_refresh_reads_only_the_new_partitions(data_dir, tmp_path, buckets_from, monkeypatch):
+    state_dir = tmp_path / "_state"
+    store_runs(HISTORY)
+    refresh(state_dir)
+
+    reads = []
+    load_buckets = extraction_engine.load_buckets
+
+    def recorded(asset, **kwargs):
+        reads.append(kwargs)
+        return load_buckets(asset, **kwargs)
+
+    monkeypatch.setattr(extraction_engine, "load_buckets", recorded)
+
+    assert refresh(state_dir)[2] == set()
+    assert reads == []
+
+    store_runs(["2025-12-10T21:00:00Z"], first_run=len(HISTORY) + 1, fiats=("BOB",))
+    assert refresh(state_dir)[2] == {"BOB"}
+    assert [(r["currencies"], r["start_date"], r["end_date"]) for r in reads] == [
+        (["BOB"], "2025-12-10", "2025-12-10"),
+    ]
+
+
+def test_unusable_watermark_falls_back_to_a_full_rebuild(data_dir, tmp_path):
+    state_dir = tmp_path / "_state"
+    store_runs(HISTORY[:4])
+    refresh(state_dir)
+
+    watermark = read_watermark(state_dir)
+    save_state(state_dir, None, None, dict(watermark, engine=ENGINE_VERSION - 1), set())
+    assert refresh(state_dir)[2] is None
+
+
+def test_only_affected_files_are_stale(tmp_path):
+    currencies = ["ARS", "BOB"]
+    outputs = {path: {} for path in extraction_engine.output_files(currencies)}
+    for path in outputs:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).touch()
+    watermark = {"outputs": outputs}
+
+    assert stale_outputs(currencies, set(), watermark, tmp_path, bcb_changed=False) == set()
+
+    stale = stale_outputs(currencies, {"BOB"}, watermark, tmp_path, bcb_changed=False)
+    assert stale == {
+        path for path, (_, ccy) in extraction_engine.output_files(currencies).items()
+        if ccy in (None, "BOB")
+    }
+
+    stale = stale_outputs(currencies, set(), watermark, tmp_path, bcb_changed=True)
+    assert stale == {
+        "official_premium_by_currency/ARS_official_premium.parquet",
+        "official_premium_by_currency/BOB_official_premium.parquet",
+    }
+
+    # A file removed from disk is written again
+    (tmp_path / "p2p_summary.parquet").unlink()
+    assert stale_outputs(currencies, set(), watermark, tmp_path, False) == {"p2p_summary.parquet"}
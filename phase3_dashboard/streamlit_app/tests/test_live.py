@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from app import live
+from binance.manifest import SnapshotExpired
+from common.atomic_write import write_parquet
+from conftest import store_runs
+
+
+def test_refresh_reads_only_the_new_runs(data_dir):
+    store_runs(["2025-12-07T10:00:00Z", "2025-12-08T10:00:00Z"])
+    state = {}
+
+    # A new window starts from the latest date
+    first = live.refresh_window(state)
+    assert set(state["rows"]["run_index"]) == {2}
+    assert live.refresh_window(state) == 0
+
+    new = store_runs(["2025-12-08T10:30:00Z"], first_run=3, fiats=("BOB",))
+    assert live.refresh_window(state) == len(new)
+    assert len(state["rows"]) == first + len(new)
+    assert set(state["rows"]["run_index"]) == {2, 3}
+
+
+def test_window_keeps_the_last_runs(data_dir, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_WINDOW_RUNS", 2)
+    store_runs(["2025-12-08T10:00:00Z"])
+    state = {}
+    live.refresh_window(state)
+
+    store_runs(["2025-12-08T10:30:00Z", "2025-12-08T11:00:00Z"], first_run=2)
+    live.refresh_window(state)
+    assert set(state["rows"]["run_index"]) == {2, 3}
+    assert not state["rows"].duplicated().any()
+
+
+def test_expired_history_starts_a_new_window(data_dir, monkeypatch):
+    kept = store_runs(["2025-12-08T10:00:00Z"])
+    state = {}
+    live.refresh_window(state)
+    new = store_runs(["2025-12-08T10:30:00Z"], first_run=2)
+
+    calls = []
+
+    def expired(*args, **kwargs):
+        calls.append(args)
+        raise SnapshotExpired("vacuumed")
+
+    monkeypatch.setattr(live, "read_runs_after", expired)
+    # The whole latest date is read again
+    assert live.refresh_window(state) == len(kept) + len(new)
+    assert len(calls) == 1
+    assert set(state["rows"]["run_index"]) == {1, 2}
+
+
+def test_latest_quotes_from_the_last_run_of_each_currency():
+    ts = pd.Timestamp("2025-12-08 10:00", tz="UTC")
+    rows = pd.DataFrame(
+        [
+            (1, ts, "BOB", "BUY", 9.0, 100.0, "a"),
+            (2, ts, "BOB", "BUY", 9.7, 100.0, "a"),
+            (2, ts, "BOB", "BUY", 9.6, 100.0, "b"),
+            (2, ts, "BOB", "SELL", 9.4, 100.0, "c"),
+            (2, ts, "BOB", "SELL", 9.5, 100.0, "d"),
+            (1, ts, "ARS", "BUY", 1480.0, 100.0, "e"),
+            (1, ts, "ARS", "SELL", 1470.0, 100.0, "f"),
+        ],
+        columns=live.LIVE_COLUMNS,
+    )
+    official = pd.DataFrame({
+        "currency": ["BOB"], "official_date": ["2025-12-08"], "official_exchange_rate": [6.96],
+    })
+    quotes = live.latest_quotes(rows, official).set_index("currency")
+
+    bob = quotes.loc["BOB"]
+    assert (bob["run_index"], bob["best_buy"], bob["best_sell"]) == (2, 9.6, 9.5)
+    assert bob["spread_pct"] == pytest.approx(0.1 / 9.55 * 100)
+    assert bob["premium_pct"] == pytest.approx((9.55 - 6.96) / 6.96 * 100)
+    assert pd.isna(quotes.loc["ARS", "premium_pct"])
+
+
+def test_official_rates_are_the_latest_per_currency(data_dir):
+    assert live.official_rates().empty
+
+    write_parquet(pd.DataFrame({
+        "date": ["2025-12-05", "2025-12-08", "2025-12-08"],
+        "currency": ["BOB", "BOB", "USD"],
+        "official_exchange_rate": [6.95, 6.96, 1.0],
+    }), live.BCB_MASTER_PATH, index=False)
+    rates = live.official_rates().set_index("currency")
+    assert rates.loc["BOB", "official_exchange_rate"] == 6.96
+    assert rates.loc["BOB", "official_date"] == "2025-12-08"
+    assert list(rates.index) == ["BOB", "USD"]
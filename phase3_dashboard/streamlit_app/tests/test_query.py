@@ -0,0 +1,57 @@
+import pandas as pd
+import pyarrow.csv as pacsv
+
+from app import data
+from app.query import ads_date_range, export_date_range, query_ads, query_export
+from binance.read_processed import read_master
+
+
+def test_export_slices_match_the_whole_file(exports):
+    whole = data.load_spread_hour("BOB")
+
+    df = query_export(data.P2P_HOUR_DIR, "BOB", start="2025-12-07", end="2025-12-07",
+                      hours=(12, 23), columns=["date", "hour", "spread_pct"])
+    expected = whole[(whole["date"] == "2025-12-07") & whole["hour"].between(12, 23)]
+    assert list(df.columns) == ["date", "hour", "spread_pct"]
+    pd.testing.assert_frame_equal(df, expected[list(df.columns)].reset_index(drop=True))
+
+    df = query_export(data.DAILY_FIAT_DIR, start="2025-12-08", currencies=["ARS"])
+    assert list(zip(df["date"].astype(str), df["currency"])) == [("2025-12-08", "ARS")]
+
+
+def test_export_date_range_from_statistics_and_csv(exports):
+    bounds = (pd.Timestamp("2025-12-07"), pd.Timestamp("2025-12-08"))
+    assert export_date_range(data.VOL_DIR, "ARS") == bounds
+
+    path = data.export_path(data.VOL_DIR, "ARS")
+    pacsv.write_csv(data.read_export_table(path, "price_volatility"), path.with_suffix(".csv"))
+    path.unlink()
+    assert export_date_range(data.VOL_DIR, "ARS") == bounds
+
+    assert export_date_range(data.VOL_DIR, "USD") is None
+    assert query_export(data.VOL_DIR, "USD").empty
+
+
+def test_ads_filters_are_applied_in_the_scan(exports):
+    columns = ["date", "time", "side", "price", "merchant_name"]
+    ads = read_master(currencies="BOB", columns=columns)
+    merchant = str(ads["merchant_name"].iloc[0])
+
+    df = query_ads("BOB", start="2025-12-07", end="2025-12-07", hours=(0, 12), sides=["SELL"],
+                   columns=columns)
+    expected = ads[
+        (ads["date"] == "2025-12-07") & (ads["time"] <= "12:59") & (ads["side"] == "SELL")
+    ]
+    assert len(df) == len(expected) > 0
+    assert set(df["side"]) == {"SELL"}
+    assert set(df["time"]) == {"10:00"}
+
+    df = query_ads("BOB", merchant=merchant.lower(), columns=columns)
+    assert len(df) == (ads["merchant_name"] == merchant).sum() > 0
+    assert set(df["merchant_name"]) == {merchant}
+
+
+def test_ads_date_range_from_the_partitions(exports):
+    assert ads_date_range("BOB") == (pd.Timestamp("2025-12-07"), pd.Timestamp("2025-12-08"))
+    assert ads_date_range("USD") is None
+    assert query_ads("USD").empty
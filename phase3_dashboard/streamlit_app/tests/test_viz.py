@@ -0,0 +1,40 @@
+import numpy as np
+
+from app.viz import lttb_indices
+
+
+def test_short_series_are_kept_whole():
+    x = np.arange(10, dtype="float64")
+    assert list(lttb_indices(x, x, 10)) == list(range(10))
+    assert list(lttb_indices(x, x, 50)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_keeps_n_out_ordered_points_with_both_ends():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000, dtype="float64")
+    keep = lttb_indices(x, rng.normal(size=1000), 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+
+
+def test_keeps_the_extreme_point_of_each_bucket():
+    x = np.arange(300, dtype="float64")
+    y = np.zeros(300)
+    spikes = [40, 151, 260]
+    y[spikes] = [5.0, -7.0, 3.0]
+
+    keep = lttb_indices(x, y, 30)
+
+    assert set(spikes) <= set(keep)
+
+
+def test_straight_line_keeps_one_point_per_bucket():
+    x = np.arange(101, dtype="float64")
+    keep = lttb_indices(x, 2 * x, 12)
+
+    every = (101 - 2) / 10
+    buckets = [(int(i * every) + 1, int((i + 1) * every) + 1) for i in range(10)]
+    assert all(start <= k < stop for k, (start, stop) in zip(keep[1:-1], buckets))